@@ -0,0 +1,208 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+
+from tokenizer import MorphemepieceTokenizer
+
+# operations, that can be requested, with the method of `_run_batch`
+OPERATIONS = ("tokenize", "encode")
+
+# tokenizer of a worker process of the process executor, set once by the initializer
+_worker_tokenizer = None
+
+
+def _warm_up(tokenizer: MorphemepieceTokenizer) -> None:
+    # builds the tries of the inventory, so the first batch does not pay for it
+    tokenizer.vocab.inventory.trie
+    tokenizer.vocab.inventory.reversed_trie
+
+
+def _init_worker(tokenizer: MorphemepieceTokenizer) -> None:
+    global _worker_tokenizer
+    _worker_tokenizer = tokenizer
+    _warm_up(tokenizer)
+
+
+def _run_batch(tokenizer: MorphemepieceTokenizer, operation: str, texts: List[str]) -> list:
+    """Tokenizes or encodes a batch of texts in one call of the tokenizer."""
+    if operation == "encode":
+        return tokenizer.batch_encode(texts, padding=False, return_tensors=None)["input_ids"]
+    return tokenizer.tokenize_batch(texts, num_workers=1)
+
+
+def _worker_run_batch(operation: str, texts: List[str]) -> list:
+    return _run_batch(_worker_tokenizer, operation, texts)
+
+
+class AsyncMorphemepieceTokenizer(object):
+    """Asyncio front end of a `MorphemepieceTokenizer`, that batches concurrent requests.
+
+        Requests are collected in a bounded queue. A batcher task takes up to `max_batch_size` of them, waiting at most
+        `max_wait` seconds after the first one, and runs the batch on an executor, so the event loop is not blocked.
+        When `max_pending` requests wait in the queue, further calls wait until there is space (backpressure). At most
+        one batch per worker runs at once. After `close`, the tokenizer can not be started again.
+
+        The thread executor uses a single thread, that owns the tokenizer. The process executor starts `num_workers`
+        processes, that receive the tokenizer once through the initializer.
+
+        Args:
+            tokenizer(`MorphemepieceTokenizer`, *optional*):
+                Tokenizer, that is used. The default tokenizer is created, if not set.
+            max_batch_size(`int`, *optional*, defaults to `64`):
+                Maximum number of texts of a batch.
+            max_wait(`float`, *optional*, defaults to `0.002`):
+                Maximum time (in seconds) a batch waits for more requests after its first one.
+            max_pending(`int`, *optional*, defaults to `1024`):
+                Maximum number of requests waiting in the queue.
+            executor(`str`, *optional*, defaults to `"thread"`):
+                `"thread"` or `"process"`.
+            num_workers(`int`, *optional*, defaults to `1`):
+                Number of worker processes of the process executor.
+    """
+
+    def __init__(self, tokenizer: Optional[MorphemepieceTokenizer] = None, max_batch_size: int = 64,
+                 max_wait: float = 0.002, max_pending: int = 1024, executor: str = "thread",
+                 num_workers: int = 1) -> None:
+        if executor not in ("thread", "process"):
+            raise ValueError("executor must be 'thread' or 'process', got %r" % executor)
+        if max_batch_size <= 0 or max_pending <= 0:
+            raise ValueError("max_batch_size and max_pending must be positive")
+        self.tokenizer = tokenizer if tokenizer is not None else MorphemepieceTokenizer()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.executor_type = executor
+        self.num_workers = num_workers if executor == "process" else 1
+        self.executor: Optional[Executor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._running_batches: Optional[asyncio.Semaphore] = None
+        self._batch_tasks = set()
+        self._closed = False
+        self.batches = 0
+        self.requests = 0
+
+    async def start(self) -> None:
+        """Starts the executor with a warm tokenizer and the batcher task, called by the first request."""
+        if self._closed:
+            raise RuntimeError("the tokenizer was closed")
+        if self._batcher is not None:
+            return
+        loop = asyncio.get_running_loop()
+        if self.executor_type == "process":
+            self.executor = ProcessPoolExecutor(self.num_workers, initializer=_init_worker,
+                                                initargs=(self.tokenizer,))
+        else:
+            self.executor = ThreadPoolExecutor(1)
+            await loop.run_in_executor(self.executor, _warm_up, self.tokenizer)
+        self._queue = asyncio.Queue(self.max_pending)
+        self._running_batches = asyncio.Semaphore(self.num_workers)
+        self._batcher = loop.create_task(self._batch_requests())
+
+    async def close(self) -> None:
+        """Finishes the running batches, fails the waiting requests and shuts the executor down."""
+        self._closed = True
+        if self._batcher is None:
+            return
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        queue = self._queue
+        while not queue.empty():
+            while not queue.empty():
+                _, _, future = queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("the tokenizer was closed"))
+            # requests, whose `put` waited for space, are woken by the gets above and enqueued now
+            await asyncio.sleep(0)
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+        self.executor = None
+        self._batcher = None
+
+    async def __aenter__(self) -> "AsyncMorphemepieceTokenizer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _request(self, operation: str, text: str):
+        if self._closed:
+            raise RuntimeError("the tokenizer was closed")
+        if self._batcher is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((operation, text, future))
+        return await future
+
+    async def atokenize(self, text: str) -> List[str]:
+        """Tokenizes a text like `tokenize` with the vocabulary and lookup of the tokenizer."""
+        return await self._request("tokenize", text)
+
+    async def aencode(self, text: str) -> List[int]:
+        """Encodes a text like `encode`."""
+        return await self._request("encode", text)
+
+    async def _batch_requests(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            # a batch only is taken, when a worker is free, until then the requests wait in the queue
+            await self._running_batches.acquire()
+            batch = []
+            try:
+                batch.append(await queue.get())
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    if queue.empty():
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        try:
+                            batch.append(await asyncio.wait_for(queue.get(), timeout))
+                        except asyncio.TimeoutError:
+                            break
+                    else:
+                        batch.append(queue.get_nowait())
+            except asyncio.CancelledError:
+                # closed while collecting, the requests already taken from the queue are never run
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("the tokenizer was closed"))
+                self._running_batches.release()
+                raise
+            task = loop.create_task(self._run(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run(self, batch: list) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            for operation in OPERATIONS:
+                requests = [(text, future) for request_operation, text, future in batch
+                            if request_operation == operation and not future.done()]
+                if not requests:
+                    continue
+                texts = [text for text, _ in requests]
+                try:
+                    if self.executor_type == "process":
+                        results = await loop.run_in_executor(self.executor, _worker_run_batch, operation, texts)
+                    else:
+                        results = await loop.run_in_executor(self.executor, _run_batch, self.tokenizer, operation,
+                                                             texts)
+                except Exception as error:
+                    for _, future in requests:
+                        if not future.done():
+                            future.set_exception(error)
+                    continue
+                for (_, future), result in zip(requests, results):
+                    if not future.done():
+                        future.set_result(result)
+                self.batches += 1
+                self.requests += len(requests)
+        finally:
+            self._running_batches.release()
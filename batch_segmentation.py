@@ -0,0 +1,376 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from trie import PREFIX, SUFFIX, WORD
+
+# multiplier of the rolling hashes, the arithmetic wraps around modulo 2**64
+_BASE = np.uint64(0x9E3779B97F4A7C15)
+# multiplier, that spreads the hashes of short strings over the high bits, which index the slots
+_MIX = np.uint64(0xD6E8FEB86659FD93)
+# bits of the allowed classes of the next morpheme, "#" is a word after a word with a compound marker
+_P, _W, _S, _COMPOUND = 1, 2, 4, 8
+# classes of a chosen morpheme
+_CLASS_P, _CLASS_W, _CLASS_S = 0, 1, 2
+# maximum number of characters (of the longest word times the number of words) of a group of words segmented at once,
+# bounds the size of the matrices
+_MAX_CHARS = 1 << 18
+
+
+def _codepoints(words: List[str], length: int) -> np.ndarray:
+    """Code points of words as an array of shape `(len(words), length)`, shorter words are padded with zeros."""
+    data = "".join(word.ljust(length, "\0") for word in words).encode("utf-32-le", "surrogatepass")
+    return np.frombuffer(data, dtype=np.uint32).reshape(len(words), length)
+
+
+def _prefix_hashes(codes: np.ndarray) -> np.ndarray:
+    """Rolling hashes of all prefixes of every row, column `k` is the hash of the first `k` characters."""
+    rows, length = codes.shape
+    hashes = np.zeros((rows, length + 1), dtype=np.uint64)
+    codes = codes.astype(np.uint64)
+    for k in range(length):
+        hashes[:, k + 1] = hashes[:, k] * _BASE + codes[:, k]
+    return hashes
+
+
+def _longest(found: np.ndarray) -> np.ndarray:
+    """Length of the longest match along the first axis, where `found[k - 1]` is a match of length `k`."""
+    last = found[::-1]
+    return np.where(last.any(axis=0), len(found) - np.argmax(last, axis=0), 0)
+
+
+class BatchSegmenter(object):
+    """Segmentation of many words at once with NumPy, with the results of `tokenize_word_bidirectional`.
+
+        Every beginning of a morpheme is stored in an open addressing hash table of its length, by its rolling hash,
+        with its last code point, the entry one character shorter and its class flags. The words are sorted by length
+        and segmented in groups of similar length. The greedy forward and backward searches advance all words of a
+        group together, one morpheme per step. In every step the rolling hashes of the substrings at the current
+        positions are looked up one length after the other, only substrings that begin a morpheme are extended.
+        Every hit is verified by its last code point and the entry of the substring one character shorter, so the
+        matches are exact. The backward search, which is only needed for words with three or more forward
+        morphemes, runs over the matrix of the morphemes of all substrings of these words.
+
+        Words, whose substrings hit two morphemes with the same hash, are segmented by the trie instead.
+
+        Args:
+            prefixes(`Iterable[str]`):
+                Prefixes of the vocabulary.
+            words(`Iterable[str]`):
+                Complete words of the vocabulary.
+            suffixes(`Iterable[str]`):
+                Suffixes of the vocabulary.
+    """
+
+    def __init__(self, prefixes: Iterable[str], words: Iterable[str], suffixes: Iterable[str]) -> None:
+        flags: Dict[str, int] = {}
+        for flag, morphemes in ((PREFIX, prefixes), (WORD, words), (SUFFIX, suffixes)):
+            for morpheme in morphemes:
+                # skip missing values of the vocabulary files
+                if isinstance(morpheme, str) and morpheme != "":
+                    flags[morpheme] = flags.get(morpheme, 0) | flag
+        # every prefix of a morpheme is an entry of the table of its length, with the flags of the morpheme (or 0)
+        prefix_flags: Dict[str, int] = {}
+        for morpheme, flag in flags.items():
+            for end in range(1, len(morpheme)):
+                prefix_flags.setdefault(morpheme[:end], 0)
+        prefix_flags.update(flags)
+        by_length = defaultdict(list)
+        for prefix in prefix_flags:
+            by_length[len(prefix)].append(prefix)
+
+        # length -> hashes of the entries, index of the entry one character shorter, last code point and flags
+        self.tables: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = {}
+        # length -> open addressing slots (index of an entry or -1) indexed by the high bits of the mixed hashes
+        self.slots: Dict[int, Tuple[np.ndarray, np.uint64]] = {}
+        # length -> hashes shared by several entries
+        self.collisions: Dict[int, np.ndarray] = {}
+        self.max_length = max(by_length, default=0)
+        # first global ID of the entries of every length, the tokens of an entry as prefix, word and suffix by its
+        # global ID
+        self.offsets = np.zeros(self.max_length + 2, dtype=np.int32)
+        forms: List[Tuple[str, str, str]] = []
+        index = {}
+        for length in range(1, self.max_length + 1):
+            entries = by_length[length]
+            self.offsets[length] = len(forms)
+            forms.extend((entry + "##", entry, "##" + entry) for entry in entries)
+            for i, entry in enumerate(entries):
+                index[entry] = i
+            codes = _codepoints(entries, length)
+            hashes = _prefix_hashes(codes)[:, length]
+            parents = np.array([index[entry[:-1]] if length > 1 else -1 for entry in entries], dtype=np.int32)
+            self.tables[length] = (hashes, parents, codes[:, -1].copy(),
+                                   np.array([prefix_flags[entry] for entry in entries], dtype=np.uint8))
+            # at most a quarter of the slots is used, so most lookups need a single probe
+            bits = max(10, (4 * len(entries)).bit_length())
+            shift = np.uint64(64 - bits)
+            slots = np.full(1 << bits, -1, dtype=np.int32)
+            mask = (1 << bits) - 1
+            for i, slot in enumerate(((hashes * _MIX) >> shift).tolist()):
+                while slots[slot] >= 0:
+                    slot = (slot + 1) & mask
+                slots[slot] = i
+            self.slots[length] = (slots, shift)
+            unique, counts = np.unique(hashes, return_counts=True)
+            if (counts > 1).any():
+                self.collisions[length] = unique[counts > 1]
+        self.offsets[self.max_length + 1] = len(forms)
+        self.token_forms = np.empty((3, len(forms)), dtype=object)
+        for i, form in enumerate(zip(*forms)):
+            self.token_forms[i] = form
+        self.powers = np.array([pow(int(_BASE), length, 2 ** 64) for length in range(self.max_length + 1)],
+                               dtype=np.uint64)
+
+    def _lookup(self, size: int, hashes: np.ndarray) -> np.ndarray:
+        """Index of the entry of the table of the length `size` with each hash, `-1` if there is none."""
+        slots, shift = self.slots[size]
+        table_hashes = self.tables[size][0]
+        mask = np.uint64(len(slots) - 1)
+        result = np.full(len(hashes), -1, dtype=np.int32)
+        positions = (hashes * _MIX) >> shift
+        pending = np.arange(len(hashes))
+        while len(pending):
+            candidates = slots[positions]
+            # linear probing, until the hash or an empty slot is reached
+            used = candidates >= 0
+            pending, positions, candidates = pending[used], positions[used], candidates[used]
+            found = table_hashes[candidates] == hashes[pending]
+            result[pending[found]] = candidates[found]
+            pending, positions = pending[~found], (positions[~found] + np.uint64(1)) & mask
+        return result
+
+    def _match(self, codes: np.ndarray, hashes: np.ndarray, lengths: np.ndarray, rows: np.ndarray,
+               starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Morphemes starting at the positions `starts` of the words `rows` of a group.
+
+            The substrings are extended one character per step, only those that are the beginning of a morpheme are
+            kept. A hit is verified by its shorter entry and its last character, so the matches are exact.
+
+            Args:
+                codes(`np.ndarray`):
+                    Code points of the words, of shape `(words, length)`.
+                hashes(`np.ndarray`):
+                    Rolling hashes of the prefixes of the words (`_prefix_hashes`).
+                lengths(`np.ndarray`):
+                    Length of every word.
+                rows(`np.ndarray`):
+                    Word of every position.
+                starts(`np.ndarray`):
+                    Start of every position.
+            Returns:
+                `Tuple[np.ndarray, np.ndarray, np.ndarray]`:
+                    The flags of the morpheme of length `k` at `[k - 1, i]` (`0` if it is none) and its global ID,
+                    both of shape `(max_length, len(rows))`, and the words, that have a substring with an ambiguous
+                    hash.
+        """
+        flags = np.zeros((self.max_length, len(rows)), dtype=np.uint8)
+        entries = np.zeros((self.max_length, len(rows)), dtype=np.int32)
+        ambiguous = []
+        # positions, whose substring is the beginning of a morpheme, with the index of its entry
+        pending = np.arange(len(rows))
+        hit_index = None
+        for size in range(1, min(codes.shape[1], self.max_length) + 1):
+            table_hashes, parents, last_codes, table_flags = self.tables[size]
+            keep = starts[pending] + size <= lengths[rows[pending]]
+            pending = pending[keep]
+            hit_rows, hit_starts = rows[pending], starts[pending]
+            substrings = hashes[hit_rows, hit_starts + size] - hashes[hit_rows, hit_starts] * self.powers[size]
+            index = self._lookup(size, substrings)
+            found = index >= 0
+            if size in self.collisions:
+                ambiguous.append(hit_rows[found][np.isin(substrings[found], self.collisions[size])])
+            # a hash is only a candidate, the shorter entry and the last character have to match, too
+            candidates = np.maximum(index, 0)
+            found &= last_codes[candidates] == codes[hit_rows, hit_starts + size - 1]
+            if hit_index is not None:
+                found &= parents[candidates] == hit_index[keep]
+            pending, hit_index = pending[found], index[found]
+            if not len(pending):
+                break
+            flags[size - 1, pending] = table_flags[hit_index]
+            entries[size - 1, pending] = hit_index + self.offsets[size]
+        return flags, entries, np.concatenate(ambiguous) if ambiguous else np.zeros(0, dtype=np.int64)
+
+    def match_matrix(self, codes: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Morphemes of all substrings of words.
+
+            Args:
+                codes(`np.ndarray`):
+                    Code points of the words, of shape `(rows, length)`.
+                lengths(`np.ndarray`):
+                    Length of every word.
+            Returns:
+                `Tuple[np.ndarray, np.ndarray, np.ndarray]`:
+                    The flags of the morpheme `word[i:i + k]` at `[k - 1, row, i]` (`0` if it is none) and its global
+                    ID, both of shape `(max_length, rows, length)`, and whether a word has a substring with an
+                    ambiguous hash.
+        """
+        rows, length = codes.shape
+        positions = np.divmod(np.arange(rows * length), length)
+        flags, entries, ambiguous_rows = self._match(codes, _prefix_hashes(codes), lengths, *positions)
+        ambiguous = np.zeros(rows, dtype=bool)
+        ambiguous[ambiguous_rows] = True
+        shape = (self.max_length, rows, length)
+        return flags.reshape(shape), entries.reshape(shape), ambiguous
+
+    def _search(self, lengths: np.ndarray, forward: bool, allow_compounds: bool,
+                candidates) -> Tuple[np.ndarray, np.ndarray, List[Tuple[np.ndarray, ...]]]:
+        """Greedy longest-match search of all words of a group, like `MorphemepieceTokenizer._search_word`.
+
+            `candidates(active, position)` returns the flags and global IDs of the morphemes starting (forward) or
+            ending (backward) at the positions of the active words, like `_match`.
+
+            Returns whether the search succeeded for every word, the number of morphemes and the chosen morphemes of
+            every step (rows, global IDs, classes and whether a compound marker is added).
+        """
+        rows = len(lengths)
+        compound = _COMPOUND if allow_compounds else 0
+        sizes = np.arange(1, self.max_length + 1)[:, None]
+        # allowed classes after a prefix, a word and a suffix
+        if forward:
+            rules = np.array([_P | _W | _S, _S | compound, _S], dtype=np.uint8)
+            allowed = np.full(rows, _P | _W, dtype=np.uint8)
+            position = np.zeros(rows, dtype=np.int64)
+        else:
+            rules = np.array([_P, _P | compound, _P | _W | _S], dtype=np.uint8)
+            allowed = np.full(rows, _S | _W, dtype=np.uint8)
+            position = lengths.astype(np.int64)
+
+        success = np.ones(rows, dtype=bool)
+        counts = np.zeros(rows, dtype=np.int64)
+        steps = []
+        active = np.arange(rows)
+        while len(active):
+            pos = position[active]
+            allow = allowed[active]
+            length = lengths[active]
+            flags, entries = candidates(active, pos)
+            if forward:
+                ends, starts = pos + sizes, pos
+            else:
+                ends, starts = pos, pos - sizes
+            # the longest allowed prefix (not at the end), suffix (not at the start) and word
+            prefix = _longest((flags & PREFIX > 0) & (ends < length) & (allow & _P > 0))
+            suffix = _longest((flags & SUFFIX > 0) & (starts > 0) & (allow & _S > 0))
+            word = _longest((flags & WORD > 0) & (allow & (_W | _COMPOUND) > 0))
+            # the longest allowed morpheme, a prefix before a suffix before a word of the same length
+            size = np.maximum(np.maximum(prefix, suffix), word)
+            has_match = size > 0
+            success[active[~has_match]] = False
+            if not has_match.all():
+                active, pos, allow, length = active[has_match], pos[has_match], allow[has_match], length[has_match]
+                entries = entries[:, has_match]
+                prefix, suffix, size = prefix[has_match], suffix[has_match], size[has_match]
+            classes = np.where(prefix == size, _CLASS_P, np.where(suffix == size, _CLASS_S, _CLASS_W))
+            marker = (classes == _CLASS_W) & (allow & _COMPOUND > 0)
+            if forward:
+                start, end = pos, pos + size
+                position[active] = end
+            else:
+                start, end = pos - size, pos
+                position[active] = start
+            steps.append((active, entries[size - 1, np.arange(len(active))], classes, marker))
+            counts[active] += 1
+            allowed[active] = rules[classes]
+            active = active[(end < length) if forward else (start > 0)]
+        return success, counts, steps
+
+    def _tokens(self, steps: List[Tuple[np.ndarray, ...]], selected: np.ndarray, forward: bool) -> List[List[str]]:
+        """Builds the tokens of the selected rows (in their order) from the steps of a search."""
+        rows, order, tokens = [], [], []
+        for step, (active, ids, classes, marker) in enumerate(steps):
+            keep = selected[active]
+            step_rows = active[keep]
+            rows.append(step_rows)
+            order.append(np.full(len(step_rows), 2 * step + 1))
+            tokens.append(self.token_forms[classes[keep], ids[keep]])
+            marker = marker[keep]
+            if marker.any():
+                # the compound marker is placed before the word in the order of the search
+                rows.append(step_rows[marker])
+                order.append(np.full(int(marker.sum()), 2 * step))
+                tokens.append(np.full(int(marker.sum()), "##", dtype=object))
+        rows, order, tokens = np.concatenate(rows), np.concatenate(order), np.concatenate(tokens)
+        # the backward search collects the tokens from back to front
+        flat = tokens[np.lexsort((order if forward else -order, rows))].tolist()
+        bounds = np.cumsum(np.bincount(rows, minlength=len(selected))[selected]).tolist()
+        return [flat[start:end] for start, end in zip([0] + bounds[:-1], bounds)]
+
+    def segment_group(self, words: List[str], allow_compounds: bool = True,
+                      unk_token: str = "[UNK]") -> List[Optional[List[str]]]:
+        """Segments non-empty words together, `None` for words that have to be segmented by the trie."""
+        lengths = np.array([len(word) for word in words])
+        length = int(lengths.max())
+        codes = _codepoints(words, length)
+        hashes = _prefix_hashes(codes)
+        ambiguous = np.zeros(len(words), dtype=bool)
+
+        def forward_candidates(active, position):
+            # the forward search visits few positions of a word, only their substrings are looked up
+            flags, entries, ambiguous_rows = self._match(codes, hashes, lengths, active, position)
+            ambiguous[ambiguous_rows] = True
+            return flags, entries
+
+        success, counts, steps = self._search(lengths, True, allow_compounds, forward_candidates)
+        results: List[Optional[List[str]]] = [None] * len(words)
+        if success.any():
+            for row, word_tokens in zip(np.nonzero(success)[0].tolist(), self._tokens(steps, success, True)):
+                results[row] = word_tokens
+        for row in np.nonzero(~success)[0].tolist():
+            results[row] = [unk_token]
+        # the backward result is only used, if it has fewer morphemes than the forward result, but more than one
+        subset = np.nonzero(success & (counts >= 3))[0]
+        if len(subset):
+            matches, entries, subset_ambiguous = self.match_matrix(codes[subset], lengths[subset])
+            ambiguous[subset[subset_ambiguous]] = True
+            # morphemes by their end
+            flags_by_end = np.zeros((self.max_length, len(subset), length + 1), dtype=np.uint8)
+            entries_by_end = np.zeros((self.max_length, len(subset), length + 1), dtype=np.int32)
+            for size in range(1, min(length, self.max_length) + 1):
+                flags_by_end[size - 1, :, size:] = matches[size - 1, :, :length - size + 1]
+                entries_by_end[size - 1, :, size:] = entries[size - 1, :, :length - size + 1]
+            b_success, b_counts, b_steps = self._search(
+                lengths[subset], False, allow_compounds,
+                lambda active, position: (flags_by_end[:, active, position], entries_by_end[:, active, position]))
+            use = b_success & (b_counts > 1) & (b_counts < counts[subset])
+            if use.any():
+                for row, word_tokens in zip(subset[use].tolist(), self._tokens(b_steps, use, False)):
+                    results[row] = word_tokens
+        for row in np.nonzero(ambiguous)[0].tolist():
+            results[row] = None
+        return results
+
+    def segment(self, words: Iterable[str], allow_compounds: bool = True, unk_token: str = "[UNK]",
+                max_chars: int = 100) -> List[Optional[List[str]]]:
+        """Segments many words, the results equal `tokenize_word_bidirectional` for every word.
+
+            Args:
+                words(`Iterable[str]`):
+                    Words that should be tokenized, duplicates are segmented once.
+                allow_compounds(`bool`, *optional*, defaults to `True`):
+                    Whether or not allow compounds in the tokenization process.
+                unk_token(`str`, *optional*, defaults to `"[UNK]"`):
+                    The unknown token.
+                max_chars(`int`, *optional*, defaults to `100`):
+                    The maximum length of a word, that can be tokenized.
+            Returns:
+                `List[Optional[List[str]]]`:
+                    Tokens of every word, in the order of the input. `None` for words with an ambiguous hash, which
+                    have to be segmented by the trie.
+        """
+        words = list(words)
+        distinct = sorted((word for word in dict.fromkeys(words) if 0 < len(word) <= max_chars), key=len)
+        lengths = [len(word) for word in distinct]
+        segments = {}
+        start = 0
+        while start < len(distinct):
+            # the words are sorted by length, so the last word of a group is the longest
+            end = start + 1
+            while end < len(distinct) and (end - start + 1) * lengths[end] <= _MAX_CHARS:
+                end += 1
+            group = distinct[start:end]
+            segments.update(zip(group, self.segment_group(group, allow_compounds, unk_token)))
+            start = end
+        return [segments[word] if word in segments else [unk_token] for word in words]
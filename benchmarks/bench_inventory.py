@@ -0,0 +1,137 @@
+import argparse
+import lzma
+import time
+
+from transformers import BasicTokenizer
+
+from tokenizer import MorphemepieceTokenizer
+
+
+def read_corpus_words(path, max_words):
+    opener = lzma.open if path.endswith(".xz") else open
+    basic_tokenizer = BasicTokenizer()
+    words = []
+    with opener(path, mode="rt", encoding="utf-8", errors="ignore") as fp:
+        for line in fp:
+            words.extend(basic_tokenizer.tokenize(line))
+            if len(words) >= max_words:
+                break
+    return words[:max_words]
+
+
+def list_tokenize_word(word, vocab_split, dir=1, allow_compounds=True, unk_token="[UNK]", max_chars=100):
+    """The greedy search of `tokenize_word` before the inventory existed, every candidate is looked up in the lists."""
+    if len(word) > max_chars or word == "":
+        return [unk_token]
+    prefixes, words, suffixes = vocab_split['prefixes'], vocab_split['words'], vocab_split['suffixes']
+    word_allowed = "#" if allow_compounds else "XXX"
+    if dir == 1:
+        allowed_next_rules = {'p': ["p", "w", "s"], 'w': ["s", word_allowed], 's': "s"}
+        allowed_next = ["p", "w"]
+    else:
+        allowed_next_rules = {'p': "p", 'w': ["p", word_allowed], 's': ["p", "w", "s"]}
+        allowed_next = ["s", "w"]
+    sub_tokens = []
+    word_len = len(word)
+    start, end = 1, word_len
+    keep_going = True
+    while keep_going:
+        if dir == 1:
+            end = word_len
+        else:
+            start = 1
+        cur_substring = ""
+        while start <= end:
+            sub_str = word[start - 1:end]
+            if "p" in allowed_next and end < word_len and sub_str in prefixes:
+                cur_substring = sub_str + "##"
+                allowed_next = allowed_next_rules['p']
+                break
+            elif "s" in allowed_next and start > 1 and sub_str in suffixes:
+                cur_substring = "##" + sub_str
+                allowed_next = allowed_next_rules['s']
+                break
+            elif ("w" in allowed_next or "#" in allowed_next) and sub_str in words:
+                cur_substring = sub_str
+                if "#" in allowed_next:
+                    if dir == 1:
+                        sub_tokens.append("##")
+                    else:
+                        sub_tokens.insert(0, "##")
+                allowed_next = allowed_next_rules['w']
+                break
+            if dir == 1:
+                end = end - 1
+            else:
+                start = start + 1
+        if cur_substring == "":
+            return [unk_token]
+        if dir == 1:
+            sub_tokens.append(cur_substring)
+            start = end + 1
+            keep_going = start <= word_len
+        else:
+            sub_tokens.insert(0, cur_substring)
+            end = start - 1
+            keep_going = end >= 1
+    return sub_tokens
+
+
+def list_tokenize_word_bidirectional(word, vocab_split, unk_token="[UNK]", max_chars=100):
+    """`tokenize_word_bidirectional` over the lists, the direction with fewer tokens wins."""
+    forwards_list = list_tokenize_word(word, vocab_split, 1, True, unk_token, max_chars)
+    backwards_list = list_tokenize_word(word, vocab_split, -1, True, unk_token, max_chars)
+    len_forward = len(forwards_list) - forwards_list.count("##")
+    len_backward = len(backwards_list) - backwards_list.count("##")
+    if 1 < len_backward < len_forward:
+        return backwards_list
+    return forwards_list
+
+
+def tokenize_with_lists(words, vocabulary, vocab_split, lookup):
+    """Reference path: membership tests against the plain lists, as before the inventory existed."""
+    result = []
+    for word in words:
+        if word in vocabulary:
+            result.append([word])
+        elif word in lookup:
+            result.append(lookup[word].split(" "))
+        else:
+            result.append(list_tokenize_word_bidirectional(word, vocab_split))
+    return result
+
+
+def tokenize_with_inventory(tokenizer, words, vocab, lookup):
+    return [tokenizer.tokenize_word_lookup(word, vocab, lookup, "[UNK]", 100) for word in words]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare list scans with the hash-indexed morpheme inventory.")
+    parser.add_argument("corpus", help="plain text or .xz corpus file, e.g. an OpenWebText shard")
+    parser.add_argument("--max-words", type=int, default=20000)
+    args = parser.parse_args()
+
+    tokenizer = MorphemepieceTokenizer()
+    vocab, lookup = tokenizer.vocab, tokenizer.lookup
+    vocab_split = {key: list(value) for key, value in vocab.vocab_split.items()}
+    vocabulary = list(vocab.vocabulary)
+
+    words = read_corpus_words(args.corpus, args.max_words)
+    print("words: %d (%d unique)" % (len(words), len(set(words))))
+
+    start = time.perf_counter()
+    expected = tokenize_with_lists(words, vocabulary, vocab_split, lookup)
+    list_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = tokenize_with_inventory(tokenizer, words, vocab, lookup)
+    inventory_time = time.perf_counter() - start
+
+    assert actual == expected, "inventory tokenization differs from the list based tokenization"
+    print("lists:     %.3fs (%.0f words/s)" % (list_time, len(words) / list_time))
+    print("inventory: %.3fs (%.0f words/s)" % (inventory_time, len(words) / inventory_time))
+    print("speedup:   %.1fx" % (list_time / inventory_time))
+
+
+if __name__ == '__main__':
+    main()
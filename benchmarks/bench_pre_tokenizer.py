@@ -0,0 +1,74 @@
+import argparse
+import random
+import time
+
+from transformers import BasicTokenizer
+
+from benchmarks.suite import build_workloads
+from pre_tokenizer import RegexPreTokenizer
+from tokenizer import MorphemepieceTokenizer
+
+# characters mixed into the fuzz texts: ASCII, whitespace and control characters, accents, combining marks, CJK,
+# compatibility characters and the special tokens
+FUZZ_ALPHABET = list("aZ9 .,;'\"-()[]\t\n\r\x00\x0b\x1f\x7f\x85\xa0éÉüßİıΣς\u0301\u0308\u200b\u2028\u3000\ufeff"
+                     "\ufffd日本語豈あﬁ…€«—\U0001F600") + ["[MASK]", "[PAD]", "[mask]"]
+
+
+def accented(texts):
+    """The texts with accented letters, so they take the path for non-ASCII texts."""
+    return [text.replace("e", "é").replace("a", "à") for text in texts]
+
+
+def throughput(tokenize, texts, repeats):
+    """Best words per second of `repeats` passes over the texts."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        words = sum(len(tokenize(text)) for text in texts)
+        best = min(best, time.perf_counter() - start)
+    return words / best
+
+
+def fuzz(basic, regex, count, seed):
+    """Compares the word lists of random texts, returns the first text with different words or `None`."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        text = "".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 30)))
+        if basic.tokenize(text) != regex.tokenize(text):
+            return text
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the BasicTokenizer and the RegexPreTokenizer.")
+    parser.add_argument("--corpus", help="plain, .xz or .gz corpus file for an additional workload")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--fuzz", type=int, default=100000, help="number of random texts compared")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tokenizer = MorphemepieceTokenizer()
+    never_split = [tokenizer.unk_token, tokenizer.sep_token, tokenizer.pad_token, tokenizer.cls_token,
+                   tokenizer.mask_token]
+    basic = BasicTokenizer(never_split=never_split)
+    regex = RegexPreTokenizer(never_split=never_split)
+
+    workloads = build_workloads(tokenizer, args.scale, args.seed, args.corpus)
+    workloads["accented"] = accented(workloads["short_sentences"])
+    workloads["special_tokens"] = [text.replace(" ", " [MASK] ", 1) for text in workloads["short_sentences"]]
+    for name, texts in workloads.items():
+        assert [basic.tokenize(text) for text in texts] == [regex.tokenize(text) for text in texts], name
+        basic_rate = throughput(basic.tokenize, texts, args.repeats)
+        regex_rate = throughput(regex.tokenize, texts, args.repeats)
+        print("%-16s basic %10.0f words/s  regex %10.0f words/s  speedup %5.1fx"
+              % (name, basic_rate, regex_rate, regex_rate / basic_rate))
+
+    different = fuzz(basic, regex, args.fuzz, args.seed)
+    if different is not None:
+        raise SystemExit("different words for %r" % different)
+    print("fuzz: %d random texts with the same words" % args.fuzz)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import random
+import time
+
+from tokenizer import MorphemepieceTokenizer
+
+LENGTH_BUCKETS = [(1, 5), (6, 10), (11, 20), (21, 40), (41, 100)]
+
+
+def sample_words(tokenizer, per_bucket, seed):
+    """Draws words of every length bucket from the lookup, long buckets are filled with concatenated words."""
+    rng = random.Random(seed)
+    candidates = [word for word in tokenizer.lookup if isinstance(word, str)]
+    samples = {}
+    for low, high in LENGTH_BUCKETS:
+        words = [word for word in candidates if low <= len(word) <= high]
+        while len(words) < per_bucket:
+            word = "".join(rng.choice(candidates) for _ in range(rng.randint(2, 8)))
+            if low <= len(word) <= high:
+                words.append(word)
+        samples[(low, high)] = rng.sample(words, per_bucket)
+    return samples
+
+
+def tokenize_unfused(tokenizer, word, inventory):
+    """Reference path: always runs both directions completely and compares the token counts."""
+    forwards_list = tokenizer.tokenize_word(word, inventory, dir=1)
+    backwards_list = tokenizer.tokenize_word(word, inventory, dir=-1)
+    len_forward = len([token for token in forwards_list if token != "##"])
+    len_backward = len([token for token in backwards_list if token != "##"])
+    if len_backward < len_forward and len_backward > 1:
+        return backwards_list
+    return forwards_list
+
+
+def second_pass_counts(tokenizer, words, inventory):
+    """Counts the words, for which the backward pass is skipped or cut short by the fused search."""
+    skipped = cut_short = 0
+    for word in words:
+        forwards_list = tokenizer.tokenize_word(word, inventory, dir=1)
+        len_forward = len(forwards_list) - forwards_list.count("##")
+        if len_forward < 3:
+            skipped += 1
+            continue
+        backwards_list = tokenizer.tokenize_word(word, inventory, dir=-1)
+        if len(backwards_list) - backwards_list.count("##") >= len_forward:
+            cut_short += 1
+    return skipped, cut_short
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-word latency of the bidirectional greedy segmentation.")
+    parser.add_argument("--per-bucket", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tokenizer = MorphemepieceTokenizer()
+    inventory = tokenizer.vocab.inventory
+    samples = sample_words(tokenizer, args.per_bucket, args.seed)
+    # build the tries before measuring
+    tokenizer.tokenize_word("warmup", inventory, dir=1)
+    tokenizer.tokenize_word("warmup", inventory, dir=-1)
+
+    for (low, high), words in samples.items():
+        start = time.perf_counter()
+        fused = [tokenizer.tokenize_word_bidirectional(word, inventory, "[UNK]", 100) for word in words]
+        elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        unfused = [tokenize_unfused(tokenizer, word, inventory) for word in words]
+        elapsed_unfused = time.perf_counter() - start
+        assert fused == unfused, "fused bidirectional search differs from running both directions"
+
+        skipped, cut_short = second_pass_counts(tokenizer, words, inventory)
+        print("length %3d-%-3d: %8.1f us/word (both directions: %8.1f us/word), "
+              "backward pass skipped %5.1f%%, cut short %5.1f%%"
+              % (low, high, elapsed / len(words) * 1e6, elapsed_unfused / len(words) * 1e6,
+                 100 * skipped / len(words), 100 * cut_short / len(words)))
+
+
+if __name__ == '__main__':
+    main()
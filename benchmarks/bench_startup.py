@@ -0,0 +1,65 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from compiled_vocab import load_compiled, save_compiled
+from rds import load_rds_vocab
+
+# imports and constructs the tokenizer in a fresh interpreter, missing files fall back to the next source:
+# compiled file, .rds files, csv files
+COLD_START = """
+import sys
+import time
+start = time.perf_counter()
+from tokenizer import MorphemepieceTokenizer
+MorphemepieceTokenizer.vocab_files_names = dict(MorphemepieceTokenizer.vocab_files_names, **{files!r})
+MorphemepieceTokenizer()
+print(time.perf_counter() - start, "pandas" in sys.modules)
+"""
+
+
+def cold_start(files: dict, repeats: int):
+    """Median time to import and construct the tokenizer and whether pandas has been imported."""
+    times = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", COLD_START.format(files=files)], capture_output=True,
+                                text=True, check=True).stdout.split()
+        times.append(float(output[-2]))
+    return statistics.median(times), output[-1] == "True"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of the csv, the .rds and the compiled vocabulary.")
+    parser.add_argument("--rds-vocab", default="./morphemepiece_vocab_30000.rds")
+    parser.add_argument("--rds-lookup", default="./morphemepiece_lookup_30000.rds")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    vocab, lookup = load_rds_vocab(args.rds_vocab, args.rds_lookup)
+    print("load_rds_vocab: %.3fs" % (time.perf_counter() - start))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        compiled_path = os.path.join(tmp_dir, "morphemepiece.mpv")
+        save_compiled(compiled_path, vocab, lookup)
+        print("compiled vocabulary: %d bytes" % os.path.getsize(compiled_path))
+
+        start = time.perf_counter()
+        load_compiled(compiled_path)
+        print("load_compiled: %.3fs" % (time.perf_counter() - start))
+
+        # the compiled file can not be written into a missing directory, so every start decodes the .rds files
+        missing = os.path.join(tmp_dir, "missing", "morphemepiece.mpv")
+        times = {"csv": cold_start({"compiled": missing, "rds_vocab": missing, "rds_lookup": missing}, args.repeats),
+                 "rds": cold_start({"compiled": missing}, args.repeats),
+                 "compiled": cold_start({"compiled": compiled_path}, args.repeats)}
+    for name, (seconds, pandas_imported) in times.items():
+        print("cold start, %-9s %.3fs (pandas imported: %s)" % (name + ":", seconds, pandas_imported))
+    print("speedup over csv: %.1fx" % (times["csv"][0] / times["compiled"][0]))
+
+if __name__ == '__main__':
+    main()
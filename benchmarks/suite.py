@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import string
+import subprocess
+import sys
+import time
+import tracemalloc
+from itertools import islice
+from typing import Callable, Dict, List
+
+from corpus import iter_chunks, open_corpus
+from tokenizer import MorphemepieceTokenizer
+
+# imports and constructs the default tokenizer in a fresh interpreter, prints the time and the peak RSS
+# (ru_maxrss is in KiB on Linux)
+COLD_START = """
+import resource
+import time
+start = time.perf_counter()
+from tokenizer import MorphemepieceTokenizer
+MorphemepieceTokenizer()
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+# metrics, where a higher value is better, all others are better when lower
+HIGHER_IS_BETTER = ("words_per_sec", "tokens_per_sec")
+
+
+def _sentences(rng: random.Random, pool: List[str], count: int, low: int, high: int) -> List[str]:
+    return [" ".join(rng.choice(pool) for _ in range(rng.randint(low, high))) for _ in range(count)]
+
+
+def build_workloads(tokenizer: MorphemepieceTokenizer, scale: float = 1.0, seed: int = 0,
+                    corpus_path: str = None) -> Dict[str, List[str]]:
+    """Texts of the synthetic workloads, drawn from the bundled vocabulary and lookup with a fixed seed."""
+    rng = random.Random(seed)
+    words = sorted(word for word in tokenizer.vocab.vocab_split['words'] if isinstance(word, str) and word.isalpha())
+    lookup_words = sorted(word for word in tokenizer.lookup if word.isalpha())
+    common = words + lookup_words
+
+    def count(n):
+        return max(1, int(n * scale))
+
+    workloads = {
+        "short_sentences": _sentences(rng, common, count(2000), 5, 15),
+        "long_documents": [" ".join(_sentences(rng, common, 150, 8, 20)) for _ in range(count(10))],
+        "compound_heavy": [" ".join(rng.choice(words) + rng.choice(words) for _ in range(rng.randint(5, 15)))
+                           for _ in range(count(500))],
+        "rare_word_heavy": [" ".join("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 16)))
+                                     for _ in range(rng.randint(5, 15))) for _ in range(count(300))],
+        "lookup_heavy": _sentences(rng, lookup_words, count(2000), 5, 15),
+    }
+    if corpus_path is not None:
+        with open_corpus(corpus_path) as fp:
+            lines = (line.strip() for line in fp)
+            workloads["corpus"] = list(islice((line for line in lines if line), count(5000)))
+    return workloads
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def measure(function: Callable, inputs: List, num_words: int, num_tokens: int, repeats: int) -> Dict[str, float]:
+    """Calls `function` on every input, `repeats` times, and summarizes the latencies of the calls."""
+    latencies = []
+    totals = []
+    for _ in range(repeats):
+        start_total = time.perf_counter()
+        for item in inputs:
+            start = time.perf_counter()
+            function(item)
+            latencies.append(time.perf_counter() - start)
+        totals.append(time.perf_counter() - start_total)
+    latencies.sort()
+    total = statistics.median(totals)
+    return {"calls": len(inputs),
+            "words_per_sec": num_words / total,
+            "tokens_per_sec": num_tokens / total,
+            "p50_ms": 1000 * _percentile(latencies, 0.5),
+            "p99_ms": 1000 * _percentile(latencies, 0.99)}
+
+
+def peak_memory(function: Callable, inputs: List) -> float:
+    """Peak of the memory (in KiB) allocated by Python and NumPy while `function` is called on every input once.
+
+        Only allocations after the start are traced, so the memory of a path is measured apart from the tokenizer and
+        the other paths, which `ru_maxrss` of the whole process can not show.
+    """
+    tracemalloc.start()
+    try:
+        for item in inputs:
+            function(item)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run_workload(tokenizer: MorphemepieceTokenizer, texts: List[str], repeats: int,
+                 batch_size: int) -> Dict[str, Dict[str, float]]:
+    vocab, lookup = tokenizer.vocab, tokenizer.lookup
+    # the first pass builds the tries and is not measured
+    tokens = [tokenizer.tokenize(text, vocab, lookup) for text in texts]
+    ids = [tokenizer.convert_tokens_to_ids(text_tokens) for text_tokens in tokens]
+    num_words = sum(len(tokenizer.pre_tokenize(text)) for text in texts)
+    num_tokens = sum(map(len, tokens))
+    batches = list(iter_chunks(texts, batch_size))
+    id_batches = list(iter_chunks(ids, batch_size))
+    operations = {
+        "tokenize": (lambda text: tokenizer.tokenize(text, vocab, lookup), texts),
+        "encode": (tokenizer.encode, texts),
+        "decode": (tokenizer.decode, ids),
+        "batch_encode": (lambda batch: tokenizer.batch_encode(batch, num_workers=1), batches),
+        "batch_decode": (tokenizer.batch_decode, id_batches),
+    }
+    results = {}
+    for operation, (function, inputs) in operations.items():
+        results[operation] = measure(function, inputs, num_words, num_tokens, repeats)
+        # traced apart from the timing, tracemalloc slows the allocations down
+        results[operation]["peak_alloc_kib"] = peak_memory(function, inputs)
+    return results
+
+
+def measure_startup(repeats: int) -> Dict[str, float]:
+    """Median time to import and construct the default tokenizer in a fresh interpreter and its peak RSS."""
+    times = []
+    rss = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", COLD_START], capture_output=True, text=True,
+                                check=True).stdout.split()
+        times.append(float(output[-2]))
+        rss.append(int(output[-1]) / 1024)
+    return {"seconds": statistics.median(times), "peak_rss_mb": max(rss)}
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Returns a line for every metric, that is worse than in the baseline by more than `tolerance`."""
+    regressions = []
+
+    def check(name, value, reference, higher_is_better):
+        if not reference:
+            return
+        change = (value - reference) / reference
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append("%s: %.4g -> %.4g (%+.1f%%)" % (name, reference, value, 100 * change))
+
+    for workload, operations in results["workloads"].items():
+        for operation, metrics in operations.items():
+            reference = baseline.get("workloads", {}).get(workload, {}).get(operation, {})
+            for metric, value in metrics.items():
+                if metric != "calls" and metric in reference:
+                    check("%s/%s/%s" % (workload, operation, metric), value, reference[metric],
+                          metric in HIGHER_IS_BETTER)
+    for metric, value in results["startup"].items():
+        check("startup/%s" % metric, value, baseline.get("startup", {}).get(metric), False)
+    check("peak_rss_mb", results["peak_rss_mb"], baseline.get("peak_rss_mb"), False)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput, latency, startup and memory benchmarks of the tokenizer.")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file the results are written to")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression, 0.1 = 10%%")
+    parser.add_argument("--corpus", help="plain, .xz or .gz corpus file for an additional workload")
+    parser.add_argument("--workloads", nargs="+", help="run only these workloads")
+    parser.add_argument("--scale", type=float, default=1.0, help="factor for the number of texts of the workloads")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pre-tokenizer", choices=("basic", "regex"), default="basic",
+                        help="pre-tokenizer of the tokenizer, see MorphemepieceTokenizer")
+    args = parser.parse_args()
+
+    # a missing compiled vocabulary is written by this tokenizer, so the startup measures loading it
+    tokenizer = MorphemepieceTokenizer(pre_tokenizer=args.pre_tokenizer)
+    startup = measure_startup(args.repeats)
+    workloads = build_workloads(tokenizer, args.scale, args.seed, args.corpus)
+    results = {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count(), "scale": args.scale, "repeats": args.repeats,
+                        "batch_size": args.batch_size, "seed": args.seed,
+                        "pre_tokenizer": args.pre_tokenizer},
+               "startup": startup,
+               "workloads": {}}
+    print("startup: %.3fs, peak RSS %.1f MiB" % (startup["seconds"], startup["peak_rss_mb"]))
+    for name, texts in workloads.items():
+        if args.workloads and name not in args.workloads:
+            continue
+        results["workloads"][name] = run_workload(tokenizer, texts, args.repeats, args.batch_size)
+        for operation, metrics in results["workloads"][name].items():
+            print("%-16s %-13s %10.0f words/s %10.0f tokens/s  p50 %8.3fms  p99 %8.3fms  peak %8.1f KiB"
+                  % (name, operation, metrics["words_per_sec"], metrics["tokens_per_sec"], metrics["p50_ms"],
+                     metrics["p99_ms"], metrics["peak_alloc_kib"]))
+    results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print("peak RSS of the process: %.1f MiB" % results["peak_rss_mb"])
+
+    with open(args.output, "w") as fp:
+        json.dump(results, fp, indent=2)
+    print("wrote %s" % args.output)
+
+    if args.baseline:
+        with open(args.baseline) as fp:
+            regressions = compare(results, json.load(fp), args.tolerance)
+        if regressions:
+            print("regressions against %s:" % args.baseline)
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("no regressions against %s" % args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+import argparse
+import csv
+import random
+import time
+from collections import Counter
+from typing import Dict, Iterable, Mapping, Optional
+
+from compiled_vocab import read_csv_columns
+from corpus import optional_pool, iter_chunks, iter_documents, open_corpus
+from tokenizer import MorphemepieceTokenizer
+
+
+def count_word_types(tokenizer: MorphemepieceTokenizer, texts: Iterable[str], num_workers: int = 1,
+                     buffer_size: int = 1000) -> Counter:
+    """Counts the words of a corpus, split by `MorphemepieceTokenizer.pre_tokenize`.
+
+        Args:
+            tokenizer(`MorphemepieceTokenizer`):
+                Tokenizer, that splits the texts into words.
+            texts(`Iterable[str]`):
+                Lines or documents of the corpus.
+            num_workers(`int`, *optional*, defaults to `1`):
+                Number of worker processes.
+            buffer_size(`int`, *optional*, defaults to `1000`):
+                Number of texts split at once.
+        Returns:
+            `Counter`:
+                Number of occurrences of every word type.
+    """
+    counts = Counter()
+    with optional_pool(tokenizer, num_workers) as pool:
+        for chunk in iter_chunks(texts, buffer_size):
+            for words in tokenizer.pre_tokenize_batch(chunk, num_workers=num_workers, pool=pool):
+                counts.update(words)
+    return counts
+
+
+def read_word_counts(path: str) -> Counter:
+    """Reads a frequency list with one word and its count per line, separated by a tab."""
+    counts = Counter()
+    with open_corpus(path) as fp:
+        for line in fp:
+            word, _, count = line.rstrip("\n").rpartition("\t")
+            if word:
+                counts[word] += int(count)
+    return counts
+
+
+def _is_covered(tokenizer: MorphemepieceTokenizer, word: str) -> bool:
+    return word in tokenizer.vocab.inventory.vocabulary or word in tokenizer.lookup
+
+
+def build_breakdown_index(tokenizer: MorphemepieceTokenizer, word_counts: Mapping[str, int], min_count: int = 1,
+                          num_workers: Optional[int] = None, chunksize: Optional[int] = None,
+                          unk_token: Optional[str] = None, max_chars=100) -> Dict[str, str]:
+    """Tokenizes every word type, that is neither in the vocabulary nor in the lookup, once.
+
+        Words longer than `max_chars` and words, whose tokens contain the unknown token, are left out, so the index
+        does not change the tokenization when it is added to the lookup.
+
+        Args:
+            tokenizer(`MorphemepieceTokenizer`):
+                Tokenizer with the vocabulary and lookup used for tokenization.
+            word_counts(`Mapping[str, int]`):
+                Number of occurrences of every word type, see `count_word_types`.
+            min_count(`int`, *optional*, defaults to `1`):
+                Minimal number of occurrences of a word in the index.
+            num_workers(`int`, *optional*, defaults to the number of CPUs):
+                Number of worker processes.
+            chunksize(`int`, *optional*):
+                Number of words sent to a worker at once.
+            unk_token(`str`, *optional*):
+                The unknown token, the unknown token of the tokenizer if not set.
+            max_chars(`int`, *optional*, defaults to `100`):
+                The maximum length of a word, that can be tokenized.
+        Returns:
+            `Dict[str, str]`:
+                Space separated tokens of every word, in the format of the lookup.
+    """
+    if unk_token is None:
+        unk_token = tokenizer.unk_token
+    words = [word for word, count in word_counts.items()
+             if count >= min_count and 0 < len(word) <= max_chars and not _is_covered(tokenizer, word)]
+    tokens = tokenizer.tokenize_words(words, num_workers=num_workers, chunksize=chunksize, unk_token=unk_token,
+                                      max_chars=max_chars)
+    return {word: " ".join(word_tokens) for word, word_tokens in zip(words, tokens) if unk_token not in word_tokens}
+
+
+def save_breakdown_index(path: str, index: Mapping[str, str]) -> None:
+    """Writes a breakdown index in the csv format of the lookup exported from R (columns `x` and `y`)."""
+    with open(path, "w", newline="", encoding="utf-8") as fp:
+        writer = csv.writer(fp, quoting=csv.QUOTE_ALL)
+        writer.writerow(["", "x", "y"])
+        for i, (word, breakdown) in enumerate(index.items()):
+            writer.writerow([i + 1, breakdown, word])
+
+
+def load_breakdown_index(path: str) -> Dict[str, str]:
+    """Reads a breakdown index (or lookup) written by `save_breakdown_index`, for `extend_lookup` of the tokenizer."""
+    words, breakdowns = read_csv_columns(path, "y", "x")
+    return dict(zip(words, breakdowns))
+
+
+def _time_per_word(tokenize_word, words) -> float:
+    start = time.perf_counter()
+    for word in words:
+        tokenize_word(word)
+    return (time.perf_counter() - start) / max(len(words), 1)
+
+
+def coverage_report(tokenizer: MorphemepieceTokenizer, word_counts: Mapping[str, int], index: Mapping[str, str],
+                    sample_size: int = 1000, unk_token: Optional[str] = None,
+                    max_chars=100) -> Dict[str, float]:
+    """Coverage of the corpus by the vocabulary and lookup before and after adding the index, and the time saved.
+
+        The time saved is estimated from a sample of the indexed words, which are segmented and looked up, for one
+        pass over the corpus without a word cache.
+
+        Args:
+            tokenizer(`MorphemepieceTokenizer`):
+                Tokenizer, whose lookup does not contain the index yet.
+            word_counts(`Mapping[str, int]`):
+                Number of occurrences of every word type.
+            index(`Mapping[str, str]`):
+                Breakdown index built by `build_breakdown_index`.
+            sample_size(`int`, *optional*, defaults to `1000`):
+                Number of indexed words used to measure the time per word.
+            unk_token(`str`, *optional*):
+                The unknown token, the unknown token of the tokenizer if not set.
+            max_chars(`int`, *optional*, defaults to `100`):
+                The maximum length of a word, that can be tokenized.
+        Returns:
+            `Dict[str, float]`:
+                Types and occurrences of the corpus, the covered fractions before and after, the time per word for
+                segmentation and lookup (in seconds) and the estimated seconds saved.
+    """
+    if unk_token is None:
+        unk_token = tokenizer.unk_token
+    types = len(word_counts)
+    occurrences = sum(word_counts.values())
+    covered_types = covered_occurrences = indexed_occurrences = 0
+    for word, count in word_counts.items():
+        if _is_covered(tokenizer, word):
+            covered_types += 1
+            covered_occurrences += count
+        elif word in index:
+            indexed_occurrences += count
+
+    sample = random.Random(0).sample(list(index), min(sample_size, len(index)))
+    inventory = tokenizer.vocab.inventory
+    segment_time = _time_per_word(
+        lambda word: tokenizer.tokenize_word_bidirectional(word, inventory, unk_token, max_chars), sample)
+    lookup_time = _time_per_word(
+        lambda word: tokenizer.tokenize_word_lookup(word, tokenizer.vocab, index, unk_token, max_chars), sample)
+    return {"types": types,
+            "occurrences": occurrences,
+            "indexed_types": len(index),
+            "type_coverage_before": covered_types / max(types, 1),
+            "type_coverage_after": (covered_types + len(index)) / max(types, 1),
+            "occurrence_coverage_before": covered_occurrences / max(occurrences, 1),
+            "occurrence_coverage_after": (covered_occurrences + indexed_occurrences) / max(occurrences, 1),
+            "segment_seconds_per_word": segment_time,
+            "lookup_seconds_per_word": lookup_time,
+            "seconds_saved_per_pass": (segment_time - lookup_time) * indexed_occurrences}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenize the word types of a corpus once into a breakdown index.")
+    parser.add_argument("input_files", nargs="+", help="plain, .xz or .gz corpus files")
+    parser.add_argument("--output", default="./data/breakdown_index.csv")
+    parser.add_argument("--counts", action="store_true",
+                        help="the input files are frequency lists with a word and its count per line")
+    parser.add_argument("--documents", action="store_true", help="count documents separated by blank lines")
+    parser.add_argument("--num-workers", type=int, default=None)
+    parser.add_argument("--min-count", type=int, default=1)
+    parser.add_argument("--max-chars", type=int, default=100)
+    args = parser.parse_args()
+
+    tokenizer = MorphemepieceTokenizer()
+    word_counts = Counter()
+    for path in args.input_files:
+        if args.counts:
+            word_counts.update(read_word_counts(path))
+        else:
+            with open_corpus(path) as fp:
+                texts = iter_documents(fp) if args.documents else (line.rstrip("\n") for line in fp)
+                word_counts.update(count_word_types(tokenizer, texts, num_workers=args.num_workers or 1))
+
+    start = time.perf_counter()
+    index = build_breakdown_index(tokenizer, word_counts, min_count=args.min_count, num_workers=args.num_workers,
+                                  max_chars=args.max_chars)
+    build_time = time.perf_counter() - start
+    save_breakdown_index(args.output, index)
+
+    report = coverage_report(tokenizer, word_counts, index, max_chars=args.max_chars)
+    print("wrote %d breakdowns to %s in %.1fs" % (len(index), args.output, build_time))
+    print("word types: %d, occurrences: %d" % (report["types"], report["occurrences"]))
+    print("type coverage:       %.1f%% -> %.1f%%" % (100 * report["type_coverage_before"],
+                                                     100 * report["type_coverage_after"]))
+    print("occurrence coverage: %.1f%% -> %.1f%%" % (100 * report["occurrence_coverage_before"],
+                                                     100 * report["occurrence_coverage_after"]))
+    print("segmentation %.1fus, lookup %.1fus per word, saves about %.1fs per pass over the corpus"
+          % (1e6 * report["segment_seconds_per_word"], 1e6 * report["lookup_seconds_per_word"],
+             report["seconds_saved_per_pass"]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import sys
+from typing import Dict, Mapping, Optional, Tuple
+
+
+class CompiledLookup(object):
+    """Breakdowns of a lookup as tuples of interned tokens and tuples of their IDs.
+
+        The lookup stores every breakdown as space separated tokens. A breakdown is split, its tokens are interned
+        (so all breakdowns share one string object per token) and mapped to IDs once, the first time its word is
+        requested. Later requests of the word are a single dictionary access, without splitting the breakdown or
+        searching the IDs again. The lookup itself is not copied, a `MappedLookup` stays shared between processes.
+
+        The compiled breakdowns are not checked against the lookup again, so the lookup must not be changed in place:
+        a changed breakdown of a compiled word is only used after `clear`.
+
+        Args:
+            lookup(`Mapping[str, str]`):
+                A dictionary that catches all specified special cases.
+            token_to_id(`Mapping[str, int]`):
+                IDs of the tokens of the vocabulary.
+            unk_id(`int`, *optional*):
+                ID of the tokens of a breakdown, that are not in the vocabulary.
+    """
+    __slots__ = ("lookup", "token_to_id", "unk_id", "_tokens", "_ids")
+
+    def __init__(self, lookup: Mapping[str, str], token_to_id: Mapping[str, int], unk_id: Optional[int]) -> None:
+        self.lookup = lookup
+        self.token_to_id = token_to_id
+        self.unk_id = unk_id
+        self._tokens: Dict[str, Tuple[str, ...]] = {}
+        self._ids: Dict[str, Tuple[int, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def __reduce__(self):
+        # the compiled breakdowns are rebuilt on first use after unpickling
+        return CompiledLookup, (self.lookup, self.token_to_id, self.unk_id)
+
+    def _compile(self, word: str) -> bool:
+        """Compiles the breakdown of a word, returns whether the word is in the lookup."""
+        breakdown = self.lookup.get(word)
+        if breakdown is None:
+            return False
+        tokens = tuple(map(sys.intern, breakdown.split(" ")))
+        token_to_id, unk_id = self.token_to_id, self.unk_id
+        self._tokens[word] = tokens
+        self._ids[word] = tuple([token_to_id.get(token, unk_id) for token in tokens])
+        return True
+
+    def tokens(self, word: str) -> Optional[Tuple[str, ...]]:
+        """Returns the tokens of the breakdown of a word, `None` if the word is not in the lookup."""
+        tokens = self._tokens.get(word)
+        if tokens is None and self._compile(word):
+            tokens = self._tokens[word]
+        return tokens
+
+    def ids(self, word: str) -> Optional[Tuple[int, ...]]:
+        """Returns the IDs of the tokens of the breakdown of a word, `None` if the word is not in the lookup."""
+        ids = self._ids.get(word)
+        if ids is None and self._compile(word):
+            ids = self._ids[word]
+        return ids
+
+    def clear(self) -> None:
+        """Removes all compiled breakdowns, after breakdowns of the lookup were changed."""
+        self._tokens.clear()
+        self._ids.clear()
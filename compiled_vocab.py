@@ -0,0 +1,106 @@
+import argparse
+import csv
+import os
+import struct
+from typing import Dict, List, Tuple
+
+from vocab import Vocab
+
+# file layout: magic, is_cased flag, then for every section the number of strings and the length of its
+# utf-8 encoded, newline separated strings, followed by the section data in the order of SECTIONS
+MAGIC = b"MPVOCAB1"
+SECTIONS = ("vocabulary", "prefixes", "words", "suffixes", "lookup_words", "lookup_breakdowns")
+_HEADER = struct.Struct("<8sB" + "II" * len(SECTIONS))
+
+
+def _encode_section(strings: List[str], name: str) -> bytes:
+    for string in strings:
+        if not isinstance(string, str) or "\n" in string:
+            raise ValueError("%s can not be compiled, it contains %r" % (name, string))
+    return "\n".join(strings).encode("utf-8")
+
+
+def _decode_section(data: bytes, count: int) -> List[str]:
+    if count == 0:
+        return []
+    return data.decode("utf-8").split("\n")
+
+
+def save_compiled(path: str, vocab: Vocab, lookup: Dict[str, str]) -> None:
+    """Writes the vocabulary, the vocabulary split and the lookup to one binary file.
+
+        Args:
+            path(`str`):
+                File the compiled vocabulary is written to.
+            vocab(`Vocab`):
+                Vocab object, that consists of the vocabulary and the splitted vocabulary.
+            lookup(`Dict[str, str]`):
+                A dictionary that catches all specified special cases.
+    """
+    sections = [list(vocab.vocabulary), list(vocab.vocab_split['prefixes']), list(vocab.vocab_split['words']),
+                list(vocab.vocab_split['suffixes']), list(lookup.keys()), list(lookup.values())]
+    data = [_encode_section(strings, name) for strings, name in zip(sections, SECTIONS)]
+    sizes = []
+    for strings, section in zip(sections, data):
+        sizes.extend((len(strings), len(section)))
+    with open(path, "wb") as fp:
+        fp.write(_HEADER.pack(MAGIC, int(vocab.is_cased), *sizes))
+        for section in data:
+            fp.write(section)
+
+
+def load_compiled(path: str) -> Tuple[Vocab, Dict[str, str]]:
+    """Loads a vocabulary and lookup written by `save_compiled`.
+
+        Args:
+            path(`str`):
+                File of the compiled vocabulary.
+        Returns:
+            `Tuple[Vocab, Dict[str, str]]`:
+                The Vocab object and the lookup.
+    """
+    with open(path, "rb") as fp:
+        data = fp.read()
+    magic, is_cased, *sizes = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("%s is not a compiled morphemepiece vocabulary" % path)
+    offset = _HEADER.size
+    sections = []
+    for i in range(len(SECTIONS)):
+        count, length = sizes[2 * i], sizes[2 * i + 1]
+        sections.append(_decode_section(data[offset:offset + length], count))
+        offset += length
+    vocabulary, prefixes, words, suffixes, lookup_words, lookup_breakdowns = sections
+    vocab_split = {'prefixes': prefixes, 'words': words, 'suffixes': suffixes}
+    return Vocab(vocabulary, vocab_split, bool(is_cased)), dict(zip(lookup_words, lookup_breakdowns))
+
+
+def read_csv_columns(path: str, *columns: str) -> List[List[str]]:
+    """Reads columns of a csv file of the vocabulary or the lookup exported from R as lists of strings."""
+    # values like "nan" or "null" are words of the vocabulary and have to stay strings
+    with open(path, newline="", encoding="utf-8") as fp:
+        rows = list(csv.DictReader(fp))
+    return [[row[column] for row in rows] for column in columns]
+
+
+def compile_csv(data_dir: str, path: str) -> None:
+    """Compiles the csv files of the vocabulary, the vocabulary split and the lookup in `data_dir`."""
+    vocabulary, = read_csv_columns(os.path.join(data_dir, "vocabulary.csv"), "x")
+    vocab_split = {name: read_csv_columns(os.path.join(data_dir, name + ".csv"), "x")[0]
+                   for name in ("prefixes", "words", "suffixes")}
+    lookup_words, lookup_breakdowns = read_csv_columns(os.path.join(data_dir, "lookup.csv"), "y", "x")
+    lookup = dict(zip(lookup_words, lookup_breakdowns))
+    save_compiled(path, Vocab(vocabulary, vocab_split, True), lookup)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the csv vocabulary and lookup to one binary file.")
+    parser.add_argument("--data-dir", default="./data")
+    parser.add_argument("--output", default="./data/morphemepiece.mpv")
+    args = parser.parse_args()
+    compile_csv(args.data_dir, args.output)
+    print("compiled %s to %s (%d bytes)" % (args.data_dir, args.output, os.path.getsize(args.output)))
+
+
+if __name__ == '__main__':
+    main()
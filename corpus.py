@@ -0,0 +1,199 @@
+import argparse
+import gzip
+import lzma
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from tokenizer import MorphemepieceTokenizer
+from word_cache import WordCache
+
+
+def open_corpus(path: str, mode: str = "rt") -> TextIO:
+    """Opens a plain, `.xz` or `.gz` compressed corpus file as a text stream."""
+    if path.endswith(".xz"):
+        return lzma.open(path, mode=mode, encoding="utf-8", errors="replace")
+    if path.endswith(".gz"):
+        return gzip.open(path, mode=mode, encoding="utf-8", errors="replace")
+    return open(path, mode=mode[0], encoding="utf-8", errors="replace")
+
+
+def iter_documents(lines: Iterable[str]) -> Iterator[str]:
+    """Joins the lines of a corpus to documents, that are separated by blank lines."""
+    document = []
+    for line in lines:
+        if line.strip():
+            document.append(line.rstrip("\n"))
+        elif document:
+            yield "\n".join(document)
+            document = []
+    if document:
+        yield "\n".join(document)
+
+
+def iter_chunks(texts: Iterable[str], buffer_size: int) -> Iterator[List[str]]:
+    """Groups a stream of texts to lists of at most `buffer_size` texts."""
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) >= buffer_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@contextmanager
+def optional_pool(tokenizer: MorphemepieceTokenizer, num_workers: int):
+    """Worker pool of the tokenizer with `num_workers` processes, `None` for a single worker."""
+    if num_workers > 1:
+        with tokenizer.worker_pool(num_workers) as pool:
+            yield pool
+    else:
+        yield None
+
+
+def _tokenize_chunk_deduplicated(tokenizer: MorphemepieceTokenizer, chunk: List[str], type_cache: WordCache,
+                                 num_workers: int, pool, return_ids: bool, unk_token, max_chars,
+                                 vectorized: bool = False) -> Iterator[List]:
+    """Tokenizes the words of a chunk, that are not in `type_cache`, once and joins the tokens of every text."""
+    word_lists = tokenizer.pre_tokenize_batch(chunk, num_workers=num_workers, pool=pool)
+    segments = {}
+    new_words = []
+    for words in word_lists:
+        for word in words:
+            if word not in segments:
+                segment = segments[word] = type_cache.get(word)
+                if segment is None:
+                    new_words.append(word)
+    new_segments = tokenizer.tokenize_words(new_words, num_workers=num_workers, unk_token=unk_token,
+                                            max_chars=max_chars, pool=pool, vectorized=vectorized)
+    for word, segment in zip(new_words, new_segments):
+        segment = tuple(tokenizer.convert_tokens_to_ids(segment) if return_ids else segment)
+        segments[word] = segment
+        type_cache.put(word, segment)
+    for words in word_lists:
+        yield [token for word in words for token in segments[word]]
+
+
+def tokenize_stream(tokenizer: MorphemepieceTokenizer, texts: Iterable[str], buffer_size: int = 1000,
+                    num_workers: int = 1, return_ids: bool = False, unk_token: Optional[str] = None,
+                    max_chars=100, deduplicate: bool = False, type_cache_size: int = 1000000,
+                    vectorized: bool = False) -> Iterator[List]:
+    """Tokenizes a stream of texts incrementally.
+
+        Only `buffer_size` texts are held in memory at once, so the memory use does not depend on the size of the
+        corpus. The worker processes are started once and reused for every chunk.
+
+        Args:
+            tokenizer(`MorphemepieceTokenizer`):
+                Tokenizer with the vocabulary and lookup used for tokenization.
+            texts(`Iterable[str]`):
+                Lines or documents of the corpus.
+            buffer_size(`int`, *optional*, defaults to `1000`):
+                Number of texts tokenized at once.
+            num_workers(`int`, *optional*, defaults to `1`):
+                Number of worker processes.
+            return_ids(`bool`, *optional*, defaults to `False`):
+                Whether to yield the IDs instead of the tokens.
+            unk_token(`str`, *optional*):
+                The unknown token, the unknown token of the tokenizer if not set.
+            max_chars(`int`, *optional*, defaults to `100`):
+                The maximum length of a word, that can be tokenized.
+            deduplicate(`bool`, *optional*, defaults to `False`):
+                Whether to split the texts into words first and to tokenize every distinct word only once. The
+                tokens of a word are kept for the following chunks, the output is the same.
+            type_cache_size(`int`, *optional*, defaults to `1000000`):
+                Number of distinct words, whose tokens are kept, if `deduplicate` is set.
+            vectorized(`bool`, *optional*, defaults to `False`):
+                Whether to segment the new words of a chunk together with NumPy, if `deduplicate` is set (see
+                `MorphemepieceTokenizer.tokenize_words`).
+        Returns:
+            `Iterator[List]`:
+                Tokens (or IDs) of every text, in the order of the input.
+    """
+    if unk_token is None:
+        unk_token = tokenizer.unk_token
+    type_cache = WordCache(type_cache_size)
+    with optional_pool(tokenizer, num_workers) as pool:
+        for chunk in iter_chunks(texts, buffer_size):
+            if deduplicate:
+                yield from _tokenize_chunk_deduplicated(tokenizer, chunk, type_cache, num_workers, pool, return_ids,
+                                                        unk_token, max_chars, vectorized)
+                continue
+            for tokens in tokenizer.tokenize_batch(chunk, num_workers=num_workers, unk_token=unk_token,
+                                                   max_chars=max_chars, pool=pool):
+                yield tokenizer.convert_tokens_to_ids(tokens) if return_ids else tokens
+
+
+def tokenize_file(tokenizer: MorphemepieceTokenizer, input_path: str, output_path: str, buffer_size: int = 1000,
+                  num_workers: int = 1, return_ids: bool = False, documents: bool = False,
+                  unk_token: Optional[str] = None, max_chars=100, deduplicate: bool = False,
+                  vectorized: bool = False) -> Dict[str, int]:
+    """Streams a (compressed) corpus file through the tokenizer into an output file.
+
+        Every line (or document) of the input is written as one line of space separated tokens (or IDs). The output
+        is compressed like the input, if its name ends with `.xz` or `.gz`.
+
+        Args:
+            tokenizer(`MorphemepieceTokenizer`):
+                Tokenizer with the vocabulary and lookup used for tokenization.
+            input_path(`str`):
+                Plain, `.xz` or `.gz` corpus file.
+            output_path(`str`):
+                File the tokenized corpus is written to.
+            buffer_size(`int`, *optional*, defaults to `1000`):
+                Number of lines (or documents) tokenized and written at once.
+            num_workers(`int`, *optional*, defaults to `1`):
+                Number of worker processes.
+            return_ids(`bool`, *optional*, defaults to `False`):
+                Whether to write the IDs instead of the tokens.
+            documents(`bool`, *optional*, defaults to `False`):
+                Whether to tokenize documents separated by blank lines instead of single lines.
+            unk_token(`str`, *optional*):
+                The unknown token, the unknown token of the tokenizer if not set.
+            max_chars(`int`, *optional*, defaults to `100`):
+                The maximum length of a word, that can be tokenized.
+            deduplicate(`bool`, *optional*, defaults to `False`):
+                Whether to tokenize every distinct word only once, see `tokenize_stream`.
+            vectorized(`bool`, *optional*, defaults to `False`):
+                Whether to segment the distinct words with NumPy, see `tokenize_stream`.
+        Returns:
+            `Dict[str, int]`:
+                Number of texts and tokens written.
+    """
+    num_texts = 0
+    num_tokens = 0
+    with open_corpus(input_path) as fp_in, open_corpus(output_path, mode="wt") as fp_out:
+        texts = iter_documents(fp_in) if documents else (line.rstrip("\n") for line in fp_in)
+        for tokens in tokenize_stream(tokenizer, texts, buffer_size, num_workers, return_ids, unk_token, max_chars,
+                                      deduplicate, vectorized=vectorized):
+            fp_out.write(" ".join(str(token) for token in tokens))
+            fp_out.write("\n")
+            num_texts += 1
+            num_tokens += len(tokens)
+    return {"texts": num_texts, "tokens": num_tokens}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenize a plain, .xz or .gz corpus file as a stream.")
+    parser.add_argument("input_file")
+    parser.add_argument("output_file")
+    parser.add_argument("--buffer-size", type=int, default=1000)
+    parser.add_argument("--num-workers", type=int, default=1)
+    parser.add_argument("--ids", action="store_true", help="write IDs instead of tokens")
+    parser.add_argument("--documents", action="store_true", help="tokenize documents separated by blank lines")
+    parser.add_argument("--max-chars", type=int, default=100)
+    parser.add_argument("--deduplicate", action="store_true", help="tokenize every distinct word only once")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="segment the distinct words with NumPy, with --deduplicate")
+    args = parser.parse_args()
+
+    tokenizer = MorphemepieceTokenizer()
+    stats = tokenize_file(tokenizer, args.input_file, args.output_file, buffer_size=args.buffer_size,
+                          num_workers=args.num_workers, return_ids=args.ids, documents=args.documents,
+                          max_chars=args.max_chars, deduplicate=args.deduplicate, vectorized=args.vectorized)
+    print("tokenized %d texts into %d tokens" % (stats["texts"], stats["tokens"]))
+
+
+if __name__ == '__main__':
+    main()
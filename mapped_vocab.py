@@ -0,0 +1,268 @@
+import argparse
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from compiled_vocab import load_compiled
+from vocab import MorphemeInventory, Vocab
+
+# file layout: header, then for every table a descriptor (count, position of the offsets, position of the string
+# data, position and size of the hash index), followed by the data of the tables. Offsets and hash slots are
+# 32 bit unsigned integers in the byte order given in the header, so they can be used from the map without copying.
+MAGIC = b"MPMMAP01"
+TABLES = ("vocabulary", "prefixes", "words", "suffixes", "lookup_words", "lookup_breakdowns")
+_HEADER = struct.Struct("<8sB7x")
+_DESCRIPTOR = struct.Struct("<QQQQQ")
+_BYTEORDERS = {"little": 0, "big": 1}
+
+
+def _hash_size(count: int) -> int:
+    """Number of slots of a hash index, a power of two with a load factor of at most one half."""
+    size = 1
+    while size < 2 * count:
+        size *= 2
+    return size
+
+
+class MappedStringTable(object):
+    """Read-only table of strings inside a memory map.
+
+        The strings are stored as utf-8 data with an array of offsets. An optional open addressing hash index maps a
+        string to the position of its first occurrence, so membership tests need one or two probes of the map.
+    """
+
+    def __init__(self, buffer: memoryview, count: int, offsets_pos: int, data_pos: int, hash_pos: int,
+                 hash_size: int) -> None:
+        self._count = count
+        self._offsets = buffer[offsets_pos:offsets_pos + 4 * (count + 1)].cast("I")
+        self._data = buffer[data_pos:]
+        self._slots = buffer[hash_pos:hash_pos + 4 * hash_size].cast("I") if hash_size else None
+        self._mask = hash_size - 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("string table index out of range")
+        return str(self._data[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self[i]
+
+    def index(self, string: str) -> int:
+        """Returns the position of the first occurrence of `string`, `-1` if it is not in the table."""
+        if not isinstance(string, str):
+            return -1
+        key = string.encode("utf-8")
+        slots, offsets, data, mask = self._slots, self._offsets, self._data, self._mask
+        slot = zlib.crc32(key) & mask
+        while True:
+            i = slots[slot]
+            if i == 0:
+                return -1
+            i -= 1
+            if data[offsets[i]:offsets[i + 1]] == key:
+                return i
+            slot = (slot + 1) & mask
+
+    def __contains__(self, string: str) -> bool:
+        return self.index(string) >= 0
+
+
+class MappedTokenIds(Mapping):
+    """Token to 1-based ID mapping over the mapped vocabulary."""
+
+    def __init__(self, vocabulary: MappedStringTable) -> None:
+        self._vocabulary = vocabulary
+
+    def __getitem__(self, token: str) -> int:
+        i = self._vocabulary.index(token)
+        if i < 0:
+            raise KeyError(token)
+        return i + 1
+
+    def __contains__(self, token) -> bool:
+        return token in self._vocabulary
+
+    def __iter__(self) -> Iterator[str]:
+        seen = set()
+        for token in self._vocabulary:
+            if token not in seen:
+                seen.add(token)
+                yield token
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class MappedLookup(Mapping):
+    """Read-only lookup over a memory map, the breakdowns are decoded on access.
+
+        Args:
+            path(`str`):
+                File written by `save_mapped`.
+    """
+
+    def __init__(self, path: str, _tables: Optional[Dict[str, MappedStringTable]] = None) -> None:
+        self.path = path
+        tables = _tables if _tables is not None else _open_tables(path)[0]
+        self._words = tables["lookup_words"]
+        self._breakdowns = tables["lookup_breakdowns"]
+
+    def __getitem__(self, word: str) -> str:
+        i = self._words.index(word)
+        if i < 0:
+            raise KeyError(word)
+        return self._breakdowns[i]
+
+    def __contains__(self, word) -> bool:
+        return word in self._words
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._words)
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def __reduce__(self):
+        # worker processes map the same file instead of receiving a copy
+        return MappedLookup, (self.path,)
+
+
+class MappedVocab(Vocab):
+    """`Vocab` backed by a memory map, that is shared by all processes using the same file.
+
+        The vocabulary, the vocabulary split and the ID mappings are read from the map without copying them into
+        Python objects. Only the tries of the inventory are built per process, on first use.
+
+        Args:
+            path(`str`):
+                File written by `save_mapped`.
+    """
+
+    def __init__(self, path: str, _tables: Optional[Dict[str, MappedStringTable]] = None,
+                 _is_cased: Optional[bool] = None) -> None:
+        self.path = path
+        if _tables is None:
+            _tables, _is_cased = _open_tables(path)
+        self.vocabulary = _tables["vocabulary"]
+        self.vocab_split = {'prefixes': _tables["prefixes"], 'words': _tables["words"],
+                            'suffixes': _tables["suffixes"]}
+        self.is_cased = _is_cased
+        self.inventory = MorphemeInventory.from_containers(_tables["prefixes"], _tables["words"], _tables["suffixes"],
+                                                           _tables["vocabulary"])
+        self.token_to_id = MappedTokenIds(_tables["vocabulary"])
+        self.id_to_token = _tables["vocabulary"]
+
+    def __reduce__(self):
+        return MappedVocab, (self.path,)
+
+
+def _write_table(fp, strings: List[str], with_hash: bool) -> Tuple[int, int, int, int, int]:
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = array("I", [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    offsets_pos = fp.tell()
+    fp.write(offsets.tobytes())
+    data_pos = fp.tell()
+    fp.write(b"".join(encoded))
+
+    hash_size = _hash_size(len(encoded)) if with_hash else 0
+    hash_pos = fp.tell()
+    if with_hash:
+        slots = array("I", bytes(4 * hash_size))
+        mask = hash_size - 1
+        seen = set()
+        for i, string in enumerate(encoded):
+            # only the first occurrence of a string is indexed
+            if string in seen:
+                continue
+            seen.add(string)
+            slot = zlib.crc32(string) & mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = i + 1
+        fp.write(slots.tobytes())
+    return len(encoded), offsets_pos, data_pos, hash_pos, hash_size
+
+
+def save_mapped(path: str, vocab: Vocab, lookup: Dict[str, str]) -> None:
+    """Writes the vocabulary, the vocabulary split and the lookup as hash indexed string tables for `load_mapped`.
+
+        Args:
+            path(`str`):
+                File the tables are written to.
+            vocab(`Vocab`):
+                Vocab object, that consists of the vocabulary and the splitted vocabulary.
+            lookup(`Dict[str, str]`):
+                A dictionary that catches all specified special cases.
+    """
+    tables = [(list(vocab.vocabulary), True), (list(vocab.vocab_split['prefixes']), True),
+              (list(vocab.vocab_split['words']), True), (list(vocab.vocab_split['suffixes']), True),
+              (list(lookup.keys()), True), (list(lookup.values()), False)]
+    for (strings, _), name in zip(tables, TABLES):
+        for string in strings:
+            if not isinstance(string, str):
+                raise ValueError("%s can not be mapped, it contains %r" % (name, string))
+    with open(path, "wb") as fp:
+        fp.write(_HEADER.pack(MAGIC, _BYTEORDERS[sys.byteorder] | (int(vocab.is_cased) << 1)))
+        descriptors_pos = fp.tell()
+        fp.write(bytes(_DESCRIPTOR.size * len(TABLES)))
+        descriptors = [_write_table(fp, strings, with_hash) for strings, with_hash in tables]
+        fp.seek(descriptors_pos)
+        for descriptor in descriptors:
+            fp.write(_DESCRIPTOR.pack(*descriptor))
+
+
+def _open_tables(path: str) -> Tuple[Dict[str, MappedStringTable], bool]:
+    """Maps the file into memory, returns its tables and whether the vocabulary is cased."""
+    with open(path, "rb") as fp:
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(mapped)
+    magic, flags = _HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("%s is not a mapped morphemepiece vocabulary" % path)
+    if flags & 1 != _BYTEORDERS[sys.byteorder]:
+        raise ValueError("%s was written with a different byte order" % path)
+    tables = {}
+    for i, name in enumerate(TABLES):
+        descriptor = _DESCRIPTOR.unpack_from(buffer, _HEADER.size + i * _DESCRIPTOR.size)
+        tables[name] = MappedStringTable(buffer, *descriptor)
+    return tables, bool(flags & 2)
+
+
+def load_mapped(path: str) -> Tuple[MappedVocab, MappedLookup]:
+    """Maps a file written by `save_mapped` into memory.
+
+        Args:
+            path(`str`):
+                File of the mapped vocabulary.
+        Returns:
+            `Tuple[MappedVocab, MappedLookup]`:
+                The Vocab object and the lookup, both read-only and backed by the same memory map.
+    """
+    tables, is_cased = _open_tables(path)
+    return MappedVocab(path, tables, is_cased), MappedLookup(path, tables)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a compiled vocabulary to the memory mapped format.")
+    parser.add_argument("--compiled", default="./data/morphemepiece.mpv")
+    parser.add_argument("--output", default="./data/morphemepiece.mpm")
+    args = parser.parse_args()
+    vocab, lookup = load_compiled(args.compiled)
+    save_mapped(args.output, vocab, lookup)
+    print("wrote %s" % args.output)
+
+
+if __name__ == '__main__':
+    main()
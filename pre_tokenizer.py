@@ -0,0 +1,209 @@
+import re
+import unicodedata
+from itertools import repeat
+from typing import Callable, Iterable, List, Optional, Tuple
+
+# control characters, that are removed by the basic tokenizer
+_ASCII_CONTROL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+# words of a cleaned ASCII text: runs of letters and digits and single punctuation characters (all other printable
+# ASCII characters)
+_ASCII_WORDS = re.compile(r"[A-Za-z0-9]+|[^\sA-Za-z0-9]")
+
+
+def _is_chinese_char(cp: int) -> bool:
+    """Whether the code point is in a CJK block, like `BasicTokenizer._is_chinese_char`."""
+    return (0x4E00 <= cp <= 0x9FFF or 0x3400 <= cp <= 0x4DBF or 0x20000 <= cp <= 0x2A6DF or 0x2A700 <= cp <= 0x2B73F
+            or 0x2B740 <= cp <= 0x2B81F or 0x2B820 <= cp <= 0x2CEAF or 0xF900 <= cp <= 0xFAFF
+            or 0x2F800 <= cp <= 0x2FA1F)
+
+
+def _is_punctuation(char: str) -> bool:
+    """All non-letter/number ASCII characters and the Unicode punctuation, like the basic tokenizer."""
+    cp = ord(char)
+    if 33 <= cp <= 47 or 58 <= cp <= 64 or 91 <= cp <= 96 or 123 <= cp <= 126:
+        return True
+    return unicodedata.category(char).startswith("P")
+
+
+def _clean_char(char: str, tokenize_chinese_chars: bool) -> Optional[str]:
+    """Replacement of a character by `BasicTokenizer._clean_text` and `_tokenize_chinese_chars`."""
+    if char in "\t\n\r" or unicodedata.category(char) == "Zs":
+        return " "
+    if char in "\x00\ufffd" or unicodedata.category(char).startswith("C"):
+        return None
+    if tokenize_chinese_chars and _is_chinese_char(ord(char)):
+        return " %s " % char
+    return char
+
+
+class _CharMap(dict):
+    """Translation table of `str.translate`, that computes the replacement of a character on its first use.
+
+        The texts only contain a small part of all code points, so the table is filled lazily instead of classifying
+        every code point up front.
+    """
+
+    def __init__(self, replacement: Callable[[str], Optional[str]]) -> None:
+        super().__init__()
+        self.replacement = replacement
+
+    def __missing__(self, cp: int) -> Optional[str]:
+        value = self[cp] = self.replacement(chr(cp))
+        return value
+
+
+# shared by all pre-tokenizers, the replacements do not depend on their settings
+_CLEAN = {True: _CharMap(lambda char: _clean_char(char, True)),
+          False: _CharMap(lambda char: _clean_char(char, False))}
+_STRIP_MARKS = _CharMap(lambda char: None if unicodedata.category(char) == "Mn" else char)
+_SPACE_PUNCTUATION = _CharMap(lambda char: " %s " % char if _is_punctuation(char) else char)
+
+
+class RegexPreTokenizer(object):
+    """Pre-tokenizer with the word lists of `transformers.BasicTokenizer` (version 4.33), without a Python loop over
+        the characters.
+
+        ASCII texts are cleaned with a precompiled regex and split into words by another one. Other texts are cleaned,
+        lowercased, stripped of accents and split at punctuation with `str.translate` over lazily filled tables of the
+        character classes. Texts containing a token of `never_split` are split at whitespace first, so these tokens
+        stay unchanged.
+
+        Args:
+            do_lower_case(`bool`, *optional*, defaults to `True`):
+                Whether or not to lowercase the input when tokenizing.
+            never_split(`Iterable[str]`, *optional*):
+                Tokens, that are never split, for example the special tokens.
+            tokenize_chinese_chars(`bool`, *optional*, defaults to `True`):
+                Whether or not to split Chinese characters.
+            strip_accents(`bool`, *optional*):
+                Whether or not to strip all accents, determined by `do_lower_case` if not set.
+    """
+
+    def __init__(self, do_lower_case: bool = True, never_split: Optional[Iterable[str]] = None,
+                 tokenize_chinese_chars: bool = True, strip_accents: Optional[bool] = None) -> None:
+        self.do_lower_case = do_lower_case
+        self.never_split = set(never_split) if never_split is not None else set()
+        self.tokenize_chinese_chars = tokenize_chinese_chars
+        self.strip_accents = strip_accents
+        self._strip = bool(strip_accents or (do_lower_case and strip_accents is not False))
+
+    def _normalize(self, text: str) -> str:
+        # lowercasing and stripping the whole text equals doing it per token, whitespace is neither cased nor a mark
+        if self.do_lower_case:
+            text = text.lower()
+        if self._strip and not text.isascii():
+            text = unicodedata.normalize("NFD", text).translate(_STRIP_MARKS)
+        return text
+
+    @staticmethod
+    def _split(text: str) -> List[str]:
+        if text.isascii():
+            return _ASCII_WORDS.findall(text)
+        return text.translate(_SPACE_PUNCTUATION).split()
+
+    def _contains_never_split(self, text: str) -> bool:
+        return any(token in text for token in self.never_split)
+
+    def tokenize(self, text: str) -> List[str]:
+        """Splits a text into words like `BasicTokenizer.tokenize`."""
+        if text.isascii():
+            if _ASCII_CONTROL.search(text):
+                text = _ASCII_CONTROL.sub("", text)
+        else:
+            text = unicodedata.normalize("NFC", text.translate(_CLEAN[self.tokenize_chinese_chars]))
+        normalized = self._normalize(text)
+        if not self.never_split or not (self._contains_never_split(text) or self._contains_never_split(normalized)):
+            return self._split(normalized)
+        # a token of `never_split` is kept before and after the normalization
+        words = []
+        for token in text.split():
+            if token not in self.never_split:
+                token = self._normalize(token)
+                if token not in self.never_split:
+                    words.extend(self._split(token))
+                    continue
+            words.append(token)
+        return words
+
+
+def tokenize_with_offsets(text: str, do_lower_case: bool = True, never_split: Iterable[str] = (),
+                          tokenize_chinese_chars: bool = True,
+                          strip_accents: Optional[bool] = None) -> Tuple[List[str], List[int], List[int]]:
+    """Splits a text into the words of `BasicTokenizer.tokenize` with the start and the end of every word in the text.
+
+        The text is cleaned and composed (NFC) character by character, so every character keeps the position it came
+        from; a character composed with the combining marks following it spans all of them. Every whitespace token is
+        lowercased as a whole (a final sigma stays one), stripped of accents and split at punctuation.
+
+        Args:
+            text(`str`):
+                Text that should be split.
+            do_lower_case, never_split, tokenize_chinese_chars, strip_accents:
+                Settings of the basic tokenizer, see `RegexPreTokenizer`.
+        Returns:
+            `Tuple[List[str], List[int], List[int]]`: The words, their starts and their ends.
+    """
+    never_split = set(never_split)
+    if text.isascii() and not _ASCII_CONTROL.search(text) and \
+            not any(token in text or token in text.lower() for token in never_split):
+        matches = list(_ASCII_WORDS.finditer(text))
+        words = [match.group().lower() if do_lower_case else match.group() for match in matches]
+        return words, [match.start() for match in matches], [match.end() for match in matches]
+    strip = bool(strip_accents or (do_lower_case and strip_accents is not False))
+    clean = _CLEAN[tokenize_chinese_chars]
+    kept = [(replaced, i) for i, char in enumerate(text) for replaced in (clean[ord(char)] or "")]
+    chars = []
+    starts = []
+    ends = []
+    k = 0
+    while k < len(kept):
+        # a character and the combining marks following it, that NFC may compose with it
+        first = k
+        k += 1
+        while k < len(kept) and unicodedata.combining(kept[k][0]):
+            k += 1
+        cluster = "".join(char for char, _ in kept[first:k])
+        if k - first > 1:
+            cluster = unicodedata.normalize("NFC", cluster)
+        chars.extend(cluster)
+        starts.extend(repeat(kept[first][1], len(cluster)))
+        ends.extend(repeat(kept[k - 1][1] + 1, len(cluster)))
+    spans = []
+    for match in re.finditer(r"\S+", "".join(chars)):
+        first, last = match.span()
+        token = match.group()
+        if token not in never_split:
+            pieces = chars[first:last]
+            if do_lower_case:
+                # lowercasing a character alone gives as many characters as it has in the lowercased token
+                lowered = token.lower()
+                position = 0
+                for j, char in enumerate(pieces):
+                    size = len(char.lower())
+                    pieces[j] = lowered[position:position + size]
+                    position += size
+            if strip:
+                pieces = [unicodedata.normalize("NFD", piece).translate(_STRIP_MARKS) for piece in pieces]
+            token = "".join(pieces)
+            if token not in never_split:
+                word = ""
+                for j, piece in enumerate(pieces, first):
+                    for char in piece:
+                        if not _is_punctuation(char):
+                            if not word:
+                                word_start = starts[j]
+                            word += char
+                            word_end = ends[j]
+                            continue
+                        if word:
+                            spans.append((word, word_start, word_end))
+                            word = ""
+                        spans.append((char, starts[j], ends[j]))
+                if word:
+                    spans.append((word, word_start, word_end))
+                continue
+        spans.append((token, starts[first], ends[last - 1]))
+    if not spans:
+        return [], [], []
+    words, word_starts, word_ends = map(list, zip(*spans))
+    return words, word_starts, word_ends
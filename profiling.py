@@ -0,0 +1,116 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+# stages of the tokenization, that are timed
+STAGES = ("pre_tokenize", "lookup", "segmentation", "id_conversion")
+# events, that are counted
+EVENTS = ("texts", "words", "cache_hits", "vocab_hits", "lookup_hits", "segmented_words", "forward_only",
+          "backward_used", "backward_rejected", "unks")
+# upper bounds of the word length buckets of the latency histograms, the last bucket has no bound
+WORD_LENGTH_BOUNDS = (4, 8, 12, 16, 24, 32, 64)
+# upper bounds (in seconds) of the latency buckets
+LATENCY_BOUNDS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+
+class LatencyHistogram(object):
+    """Histogram of latencies with fixed buckets, like a Prometheus histogram."""
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BOUNDS) -> None:
+        self.bounds = tuple(bounds)
+        # the last bucket counts the latencies above all bounds
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def as_dict(self) -> Dict:
+        return {"bounds": list(self.bounds), "counts": list(self.counts), "count": self.count, "sum": self.sum}
+
+
+def _word_length_label(index: int) -> str:
+    lower = WORD_LENGTH_BOUNDS[index - 1] + 1 if index > 0 else 1
+    if index == len(WORD_LENGTH_BOUNDS):
+        return "%d+" % lower
+    return "%d-%d" % (lower, WORD_LENGTH_BOUNDS[index])
+
+
+class TokenizerProfile(object):
+    """Timers, counters and latency histograms of the tokenization of a `MorphemepieceTokenizer`.
+
+        Created by `MorphemepieceTokenizer.enable_profiling`. Only the tokenization in the process of the tokenizer is
+        recorded, worker processes hold their own copy of the profile.
+
+        Stages (`STAGES`, seconds):
+            `pre_tokenize` splits the texts into words, `lookup` serves words from the word cache, the vocabulary or
+            the lookup, `segmentation` is the search of all other words and `id_conversion` maps tokens to IDs.
+        Events (`EVENTS`):
+            Texts and words seen, hits of the word cache, the vocabulary and the lookup, segmented words, whether the
+            forward result was used without a backward search (`forward_only`), the backward result was used
+            (`backward_used`) or rejected (`backward_rejected`), and words that contain the unknown token.
+        Histograms:
+            Segmentation latency of a word by word length (`WORD_LENGTH_BOUNDS`).
+    """
+
+    def __init__(self) -> None:
+        self.stage_seconds = OrderedDict((stage, 0.0) for stage in STAGES)
+        self.events = OrderedDict((event, 0) for event in EVENTS)
+        self.segmentation_histograms = [LatencyHistogram() for _ in range(len(WORD_LENGTH_BOUNDS) + 1)]
+
+    def reset(self) -> None:
+        self.__init__()
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        self.stage_seconds[stage] += seconds
+
+    def count(self, event: str, n: int = 1) -> None:
+        self.events[event] += n
+
+    def observe_segmentation(self, word_length: int, seconds: float) -> None:
+        self.segmentation_histograms[bisect_left(WORD_LENGTH_BOUNDS, word_length)].observe(seconds)
+
+    def as_dict(self) -> Dict:
+        """ Returns all timers, counters and histograms.
+            Returns:
+                `Dict`:
+                    `stage_seconds` and `events` by name, `segmentation_latency` by word length bucket.
+        """
+        return {"stage_seconds": dict(self.stage_seconds),
+                "events": dict(self.events),
+                "segmentation_latency": {_word_length_label(i): histogram.as_dict()
+                                         for i, histogram in enumerate(self.segmentation_histograms)}}
+
+    def to_prometheus(self, prefix: str = "morphemepiece", labels: Optional[Dict[str, str]] = None) -> str:
+        """Returns the profile in the text exposition format of Prometheus.
+
+            Args:
+                prefix(`str`, *optional*, defaults to `"morphemepiece"`):
+                    Prefix of the metric names.
+                labels(`Dict[str, str]`, *optional*):
+                    Labels added to every sample, for example the name of the tokenizer instance.
+        """
+        base = "".join('%s="%s",' % (key, value) for key, value in (labels or {}).items())
+        lines: List[str] = ["# HELP %s_stage_seconds_total Time spent in a stage of the tokenization." % prefix,
+                            "# TYPE %s_stage_seconds_total counter" % prefix]
+        for stage, seconds in self.stage_seconds.items():
+            lines.append('%s_stage_seconds_total{%sstage="%s"} %r' % (prefix, base, stage, seconds))
+        lines.append("# HELP %s_events_total Words and outcomes of the tokenization." % prefix)
+        lines.append("# TYPE %s_events_total counter" % prefix)
+        for event, count in self.events.items():
+            lines.append('%s_events_total{%sevent="%s"} %d' % (prefix, base, event, count))
+        lines.append("# HELP %s_segmentation_seconds Segmentation latency of a word by word length." % prefix)
+        lines.append("# TYPE %s_segmentation_seconds histogram" % prefix)
+        for i, histogram in enumerate(self.segmentation_histograms):
+            word_labels = '%sword_length="%s"' % (base, _word_length_label(i))
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append('%s_segmentation_seconds_bucket{%s,le="%s"} %d' % (prefix, word_labels, le, cumulative))
+            lines.append('%s_segmentation_seconds_sum{%s} %r' % (prefix, word_labels, histogram.sum))
+            lines.append('%s_segmentation_seconds_count{%s} %d' % (prefix, word_labels, histogram.count))
+        return "\n".join(lines) + "\n"
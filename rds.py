@@ -0,0 +1,213 @@
+import bz2
+import gzip
+import lzma
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+from vocab import Vocab
+
+# SEXP types of the R serialization format that occur in the morphemepiece data
+SYMSXP = 1
+LISTSXP = 2
+CHARSXP = 9
+LGLSXP = 10
+INTSXP = 13
+REALSXP = 14
+STRSXP = 16
+VECSXP = 19
+NILVALUE_SXP = 254
+REFSXP = 255
+
+# encoding flags of a CHARSXP (gp field)
+_LATIN1_MASK = 1 << 2
+_UTF8_MASK = 1 << 3
+_ASCII_MASK = 1 << 6
+
+_INT = struct.Struct(">i")
+_CHAR_HEADER = struct.Struct(">ii")
+
+
+class RObject(object):
+    """Value of a deserialized R object with its attributes."""
+
+    def __init__(self, value: Any, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.value = value
+        self.attributes = attributes if attributes is not None else {}
+
+
+def _decompress(data: bytes) -> bytes:
+    if data[:2] == b"\x1f\x8b":
+        return gzip.decompress(data)
+    if data[:3] == b"BZh":
+        return bz2.decompress(data)
+    if data[:6] == b"\xfd7zXZ\x00":
+        return lzma.decompress(data)
+    return data
+
+
+class _RdsReader(object):
+    """Reader of the XDR (big endian binary) serialization format of R, version 2 and 3."""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+        self.references: List[Any] = []
+        self.native_encoding = "latin-1"
+
+    def read_int(self) -> int:
+        value, = _INT.unpack_from(self.data, self.pos)
+        self.pos += 4
+        return value
+
+    def read_length(self) -> int:
+        length = self.read_int()
+        if length == -1:
+            upper, lower = self.read_int(), self.read_int()
+            length = (upper << 32) + lower
+        return length
+
+    def read_header(self) -> None:
+        if self.data[:2] != b"X\n":
+            raise ValueError("only the XDR format of .rds files is supported")
+        self.pos = 2
+        version = self.read_int()
+        self.read_int()  # R version of the writer
+        self.read_int()  # minimal R version of the reader
+        if version == 3:
+            length = self.read_int()
+            encoding = self.data[self.pos:self.pos + length].decode("ascii")
+            self.pos += length
+            self.native_encoding = "cp1252" if encoding.upper() == "CP1252" else encoding
+        elif version != 2:
+            raise ValueError("unsupported .rds format version %d" % version)
+
+    def _decode_char(self, flags: int, raw: bytes) -> str:
+        levels = flags >> 12
+        if levels & _UTF8_MASK:
+            return raw.decode("utf-8")
+        if levels & (_LATIN1_MASK | _ASCII_MASK):
+            return raw.decode("latin-1")
+        return raw.decode(self.native_encoding)
+
+    def read_char(self, flags: int) -> Optional[str]:
+        length = self.read_int()
+        if length == -1:
+            return None
+        raw = self.data[self.pos:self.pos + length]
+        self.pos += length
+        return self._decode_char(flags, raw)
+
+    def read_strings(self, length: int) -> List[Optional[str]]:
+        # hot loop for the large character vectors, every element is a CHARSXP
+        data, pos, unpack = self.data, self.pos, _CHAR_HEADER.unpack_from
+        decode = self._decode_char
+        strings = []
+        append = strings.append
+        for _ in range(length):
+            flags, size = unpack(data, pos)
+            pos += 8
+            if size == -1:
+                append(None)
+            else:
+                append(decode(flags, data[pos:pos + size]))
+                pos += size
+        self.pos = pos
+        return strings
+
+    def read_attributes(self, has_attributes: bool) -> Dict[str, Any]:
+        if not has_attributes:
+            return {}
+        attributes = self.read_item()
+        return dict(attributes.value) if attributes is not None else {}
+
+    def read_item(self) -> Any:
+        flags = self.read_int()
+        sexp_type = flags & 0xFF
+        has_attributes = bool(flags & (1 << 9))
+        has_tag = bool(flags & (1 << 10))
+
+        if sexp_type == NILVALUE_SXP:
+            return None
+        if sexp_type == REFSXP:
+            index = flags >> 8
+            if index == 0:
+                index = self.read_int()
+            return self.references[index - 1]
+        if sexp_type == SYMSXP:
+            symbol = self.read_item()
+            self.references.append(symbol)
+            return symbol
+        if sexp_type == CHARSXP:
+            return self.read_char(flags)
+        if sexp_type == LISTSXP:
+            # pairlist, read iteratively along the cdr
+            pairs = []
+            while True:
+                attributes = self.read_attributes(has_attributes)
+                tag = self.read_item() if has_tag else None
+                pairs.append((tag, self.read_item()))
+                flags = self.read_int()
+                if flags & 0xFF != LISTSXP:
+                    self.pos -= 4
+                    if self.read_item() is not None:
+                        raise ValueError("pairlists ending in a value are not supported")
+                    return RObject(pairs, attributes)
+                has_attributes = bool(flags & (1 << 9))
+                has_tag = bool(flags & (1 << 10))
+        if sexp_type == STRSXP:
+            value = self.read_strings(self.read_length())
+        elif sexp_type == VECSXP:
+            value = [self.read_item() for _ in range(self.read_length())]
+        elif sexp_type in (LGLSXP, INTSXP):
+            length = self.read_length()
+            value = list(struct.unpack_from(">%di" % length, self.data, self.pos))
+            self.pos += 4 * length
+            if sexp_type == LGLSXP:
+                value = [None if x == -2 ** 31 else bool(x) for x in value]
+        elif sexp_type == REALSXP:
+            length = self.read_length()
+            value = list(struct.unpack_from(">%dd" % length, self.data, self.pos))
+            self.pos += 8 * length
+        else:
+            raise NotImplementedError("R objects of type %d are not supported" % sexp_type)
+        return RObject(value, self.read_attributes(has_attributes))
+
+
+def read_rds(path: str) -> Any:
+    """Reads an .rds file without an R installation.
+
+        Supports the vectors, lists and attributes used by the morphemepiece data.
+
+        Args:
+            path(`str`):
+                Path of the (compressed) .rds file.
+        Returns:
+            `RObject`:
+                The deserialized object, character vectors are lists of `str` (`None` for `NA`).
+    """
+    with open(path, "rb") as fp:
+        reader = _RdsReader(_decompress(fp.read()))
+    reader.read_header()
+    return reader.read_item()
+
+
+def load_rds_vocab(vocab_path: str, lookup_path: str) -> Tuple[Vocab, Dict[str, str]]:
+    """Loads the vocabulary and the lookup from the .rds files of the R package morphemepiece.
+
+        Args:
+            vocab_path(`str`):
+                .rds file of the `morphemepiece_vocabulary`.
+            lookup_path(`str`):
+                .rds file of the lookup, a named character vector.
+        Returns:
+            `Tuple[Vocab, Dict[str, str]]`:
+                The Vocab object and the lookup.
+    """
+    vocabulary = read_rds(vocab_path)
+    split = vocabulary.attributes["vocab_split"]
+    vocab_split = dict(zip(split.attributes["names"].value, (part.value for part in split.value)))
+    is_cased = vocabulary.attributes.get("is_cased")
+    vocab = Vocab(vocabulary.value, vocab_split, bool(is_cased.value[0]) if is_cased is not None else False)
+
+    lookup = read_rds(lookup_path)
+    return vocab, dict(zip(lookup.attributes["names"].value, lookup.value))
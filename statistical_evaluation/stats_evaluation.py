@@ -24,6 +24,11 @@ def extract_word_sublists(tokens, word_boundary_mask):
     return result
 
 
+def extract_word_sublists_by_ids(tokens, word_ids):
+    # word_ids as returned by MorphemepieceTokenizer.tokenize(..., return_alignment=True), no need for the ## markers
+    return [[token for token, _ in group] for _, group in itertools.groupby(zip(tokens, word_ids), key=lambda x: x[1])]
+
+
 def word_boundary_mask(tokens):
     word_counter = 0
     result = []
@@ -45,10 +50,11 @@ def word_boundary_mask(tokens):
     return result
 
 
-def report_token_stats(morphemepiece, bert):
+def report_token_stats(morphemepiece, bert, morphemepiece_word_ids=None):
     max_count = 40
 
-    word_breakdowns_morphempiece = report_tokenizer_stats(max_count, morphemepiece, "morphemepiece")
+    word_breakdowns_morphempiece = report_tokenizer_stats(max_count, morphemepiece, "morphemepiece",
+                                                          morphemepiece_word_ids)
     word_breakdowns_bert = report_tokenizer_stats(max_count, bert, "bert")
 
     overlapping = word_breakdowns_morphempiece.intersection(word_breakdowns_bert)
@@ -59,7 +65,7 @@ def report_token_stats(morphemepiece, bert):
         len(word_breakdowns_bert), len(overlapping), len(overlapping) / len(word_breakdowns_bert)))
 
 
-def report_tokenizer_stats(max_count, df, tokenizer_name):
+def report_tokenizer_stats(max_count, df, tokenizer_name, word_ids=None):
     counter = count_tokens(df)
     most_common = counter.most_common(max_count)
     unique_tokens = len(set(counter))
@@ -71,7 +77,10 @@ def report_tokenizer_stats(max_count, df, tokenizer_name):
     mean_token_length = avg_sent_token_lengths.mean()
     sd_token_length = avg_sent_token_lengths.std()
 
-    word_boundaries = df.map(lambda tokens: extract_word_sublists(tokens, word_boundary_mask(tokens)))
+    if word_ids is not None:
+        word_boundaries = df.combine(word_ids, extract_word_sublists_by_ids)
+    else:
+        word_boundaries = df.map(lambda tokens: extract_word_sublists(tokens, word_boundary_mask(tokens)))
     word_breakdown_strings = word_boundaries.map(
         lambda token_breakdown_list: [" ".join(x) for x in token_breakdown_list])
     complex_word_breakdown_strings = word_breakdown_strings.map(lambda strings: [x for x in strings if "##" in x])
@@ -125,7 +134,11 @@ def main():
     morphemepiece = df['morphemepiece'].map(lambda x: x.split())
     bert = df['bert'].map(lambda x: x.split())
 
-    report_token_stats(morphemepiece, bert)
+    morphemepiece_word_ids = None
+    if 'morphemepiece_word_ids' in df:
+        morphemepiece_word_ids = df['morphemepiece_word_ids'].map(lambda x: [int(i) for i in x.split()])
+
+    report_token_stats(morphemepiece, bert, morphemepiece_word_ids)
 
 
 if __name__ == '__main__':
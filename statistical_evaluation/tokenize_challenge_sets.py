@@ -24,8 +24,11 @@ def main():
     bert = AutoTokenizer.from_pretrained("bert-base-uncased")
 
     print("morphemepiece tokenization")
-    df['morphemepiece'] = df['text'].map(
-        lambda x: " ".join(morpheme.tokenize(x, vocab=vocab, lookup=lookup, unk_token="[UNK]", max_chars=200)))
+    alignments = df['text'].map(
+        lambda x: morpheme.tokenize(x, vocab=vocab, lookup=lookup, unk_token="[UNK]", max_chars=200,
+                                    return_alignment=True))
+    df['morphemepiece'] = alignments.map(lambda x: " ".join(x.tokens))
+    df['morphemepiece_word_ids'] = alignments.map(lambda x: " ".join(str(i) for i in x.word_ids))
     print("bert-uncased tokenization")
     df['bert'] = df['text'].map(lambda x: " ".join(bert.tokenize(x)))
 
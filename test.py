@@ -1,12 +1,18 @@
 from tokenizer import MorphemepieceTokenizer
 from vocab import Vocab
+from rds import load_rds_vocab
+from async_tokenizer import AsyncMorphemepieceTokenizer
+from tokenizer_fast import MorphemepieceTokenizerFast
+import asyncio
+import os
 import pandas as pd
 import pytest
-from transformers import BatchEncoding
+from transformers import BatchEncoding, PreTrainedTokenizer
+from transformers.tokenization_utils_base import PaddingStrategy, TruncationStrategy
 
 # importing the data
 vocabulary = pd.read_csv("./data/vocabulary.csv")["x"].to_list()
-lookup = pd.read_csv("./data/lookup.csv").set_index("y").to_dict()["x"]
+_, lookup = load_rds_vocab("./morphemepiece_vocab_30000.rds", "./morphemepiece_lookup_30000.rds")
 prefixes = pd.read_csv("./data/prefixes.csv")["x"].to_list()
 words = pd.read_csv("./data/words.csv")["x"].to_list()
 suffixes = pd.read_csv("./data/suffixes.csv")["x"].to_list()
@@ -28,6 +34,42 @@ def test_call():
                               lookup=lookup) == expected
 
 
+def test_batch_encode_plus():
+    sentences = ["i use this sentence to check if everything works fine", "it is totally normal", ""]
+    kwargs = dict(padding=True, truncation=True, max_length=5, return_overflowing_tokens=True,
+                  return_special_tokens_mask=True, return_length=True)
+    encoding = tokenizer(sentences, **kwargs)
+    assert encoding["input_ids"][0] == [3034, 3118, 12515, 10862, 3056]
+    assert encoding["overflowing_tokens"][0] == [5449, 3093, 6919, 3025, 4421, 7162, 4035, 7155]
+    assert encoding["attention_mask"][2] == [0, 0, 0, 0, 0]
+    assert encoding == tokenizer(sentences, vocab=vocab, lookup=lookup, **kwargs)
+    # the generic implementation of transformers encodes every text separately
+    expected = PreTrainedTokenizer._batch_encode_plus(tokenizer, sentences, padding_strategy=PaddingStrategy.LONGEST,
+                                                      truncation_strategy=TruncationStrategy.LONGEST_FIRST,
+                                                      max_length=6, stride=2, return_overflowing_tokens=True,
+                                                      return_special_tokens_mask=True, return_length=True)
+    assert tokenizer(sentences, padding=True, truncation=True, max_length=6, stride=2, return_overflowing_tokens=True,
+                     return_special_tokens_mask=True, return_length=True) == expected
+    assert tokenizer(sentences[0])["input_ids"] == tokenizer.encode(sentences[0])
+
+def test_custom_unk_token():
+    small_vocab = Vocab(["[PAD]", "[UNK]", "<unk>", "fox", "##s"],
+                        {'prefixes': [], 'words': ["fox"], 'suffixes': ["s"]}, True)
+    small_tokenizer = MorphemepieceTokenizer(vocab=small_vocab, lookup={}, unk_token="<unk>")
+    assert small_tokenizer.tokenize("foxes qqq") == ["<unk>", "<unk>"]
+    assert small_tokenizer.encode("foxs qqq") == [4, 5, 3]
+    assert small_tokenizer(["foxs qqq"])["input_ids"] == [[4, 5, 3]]
+    assert small_tokenizer.tokenize_batch(["qqq"], num_workers=1) == [["<unk>"]]
+
+    from corpus import tokenize_stream
+    assert list(tokenize_stream(small_tokenizer, ["qqq", "foxs"])) == [["<unk>"], ["fox", "##s"]]
+    assert list(tokenize_stream(small_tokenizer, ["qqq foxs"], deduplicate=True)) == [["<unk>", "fox", "##s"]]
+
+    # words tokenized to the unknown token of the tokenizer are left out of the breakdown index
+    from breakdown_index import build_breakdown_index
+    assert build_breakdown_index(small_tokenizer, {"qqq": 2, "foxs": 2}, num_workers=1) == {"foxs": "fox ##s"}
+
+
 def test_tokenizer():
     sentence = "it is totally normal to be indistinguishable"
     expected = ['it', 'is', 'total', '##ly', 'normal', 'to', 'be', 'in##', 'distinguish', '##able']
@@ -54,11 +96,43 @@ def test_unknown_token():
     assert tokenizer.tokenize(sentence, vocab, lookup, max_chars=7) == expected
 
 
+def test_long_word_segmentation():
+    long_tokenizer = MorphemepieceTokenizer(vocab=vocab, lookup=lookup, segment_long_words=True)
+    assert long_tokenizer.tokenize("longfakewordxzz", vocab, lookup, max_chars=7) != ['[UNK]']
+    # words up to max_chars are not affected
+    assert long_tokenizer.tokenize("indistinguishable", vocab, lookup) == tokenizer.tokenize("indistinguishable",
+                                                                                           vocab, lookup)
+    assert long_tokenizer.tokenize_long_word("chairball", vocab.inventory) == ['chair', '##', 'ball']
+    tokens = long_tokenizer.tokenize("chairball" * 30, vocab, lookup)
+    assert len(tokens) == 119
+    assert long_tokenizer.convert_tokens_to_string(tokens) == "chairball" * 30
+
+
 def test_decode_irregular_plural():
     tokens = [3240, 4035]
     expected = "foxes"
     assert tokenizer.decode(tokens) == expected
 
+def test_convert_tokens_to_string():
+    tokens = ['chair', '##', 'ball', 'and', 'foot', '##', 'ball', 'are', 'un##', 'do', '##ing', 'im##', '##g']
+    assert tokenizer.convert_tokens_to_string(tokens) == "chairball and football are undoing img"
+    assert tokens[1] == '##' and len(tokens) == 13
+    # markers without a neighbouring token are kept
+    assert tokenizer.convert_tokens_to_string(['##s', 'fox', 'un##']) == "##s fox un##"
+    assert tokenizer.convert_tokens_to_string(["##", "x"]) == "## x"
+    assert tokenizer.convert_tokens_to_string(["x", "##"]) == "x ##"
+
+
+def test_batch_decode():
+    import numpy as np
+
+    sentences = ["chairball and football", "it is totally normal"]
+    encoded = tokenizer.batch_encode(sentences)
+    assert tokenizer.batch_decode(encoded["input_ids"], skip_special_tokens=True) == sentences
+    assert tokenizer.batch_decode(encoded["input_ids"].tolist(), skip_special_tokens=True) == sentences
+    assert tokenizer.batch_decode(np.array(encoded["input_ids"]))[1].endswith("[PAD] [PAD]")
+
+
 def test_compound():
     sentence = "chairball"
     expected = ['chair', '##', 'ball']
@@ -107,3 +181,422 @@ def test_relation_between_tokens_and_ids():
 
     assert tokenizer.decode(ids) == sentence
     assert tokenizer.encode(sentence) == ids
+
+
+def test_morpheme_inventory():
+    inventory = vocab.inventory
+    assert "un" in inventory.prefixes and "archer" in inventory.words and "ly" in inventory.suffixes
+    assert inventory["words"] is inventory.words
+    assert len(inventory.vocabulary) == len(set(vocabulary))
+    with pytest.raises(AttributeError):
+        inventory.words = frozenset()
+
+
+def test_token_id_maps():
+    assert tokenizer.convert_tokens_to_ids(["this", "notavocabtokenxyz"]) == [12515, tokenizer.unk_token_id]
+    assert tokenizer.convert_tokens_to_ids("notavocabtokenxyz") == 2
+    added_vocab = tokenizer.get_added_vocab()
+    assert added_vocab["cosh"] == 30000
+    added_vocab["cosh"] = 1
+    assert tokenizer.convert_tokens_to_ids("cosh") == 30000
+    assert tokenizer.convert_ids_to_tokens([1, 30000]) == ["[PAD]", "cosh"]
+
+
+def test_word_cache():
+    cached_tokenizer = MorphemepieceTokenizer(vocab=vocab, lookup=lookup, word_cache_size=3)
+    sentence = "the fox and the dog and the unarcher"
+    assert cached_tokenizer.tokenize(sentence, vocab, lookup) == tokenizer.tokenize(sentence, vocab, lookup)
+    stats = cached_tokenizer.word_cache.stats()
+    assert stats["hits"] == 3 and stats["misses"] == 5 and stats["evictions"] == 2 and stats["size"] == 3
+    cached_tokenizer.word_cache.clear()
+    assert len(cached_tokenizer.word_cache) == 0 and cached_tokenizer.word_cache.hits == 0
+
+    # the settings of the segmentation are part of the key, the cached tokens can not be changed by callers
+    long_word = "chair" * 30
+    assert cached_tokenizer.tokenize_words([long_word], num_workers=1) == [["[UNK]"]]
+    cached_tokenizer.segment_long_words = True
+    segmented = cached_tokenizer.tokenize_words([long_word], num_workers=1)
+    assert segmented == [["chair"] + ["##", "chair"] * 29]
+    segmented[0].append("changed")
+    assert cached_tokenizer.tokenize_words([long_word], num_workers=1) == [["chair"] + ["##", "chair"] * 29]
+
+    # a new lookup (or breakdowns added to it) clears the cached tokenizations
+    cached_tokenizer.lookup = {"qqq": "un## fox"}
+    assert len(cached_tokenizer.word_cache) == 0
+    assert cached_tokenizer.tokenize("qqq qqq") == ["un##", "fox"] * 2
+    cached_tokenizer.extend_lookup({"zzz": "fox"})
+    assert len(cached_tokenizer.word_cache) == 0 and cached_tokenizer.tokenize("zzz") == ["fox"]
+
+
+def test_profiling():
+    profiled_tokenizer = MorphemepieceTokenizer(vocab=vocab, lookup=lookup, word_cache_size=100)
+    sentence = "chairball and foxes and chairball qqqqzzz"
+    expected = tokenizer.tokenize(sentence, vocab, lookup)
+    profile = profiled_tokenizer.enable_profiling()
+    assert profiled_tokenizer.tokenize(sentence, vocab, lookup) == expected
+    profiled_tokenizer.convert_tokens_to_ids(expected)
+    events = profile.as_dict()["events"]
+    assert events["texts"] == 1 and events["words"] == 6
+    assert events["cache_hits"] == 2 and events["segmented_words"] == 2
+    assert events["cache_hits"] + events["vocab_hits"] + events["lookup_hits"] + events["segmented_words"] == 6
+    assert events["forward_only"] + events["backward_used"] + events["backward_rejected"] == 2
+    assert profile.as_dict()["segmentation_latency"]["9-12"]["count"] == 1
+    prometheus = profile.to_prometheus()
+    assert 'morphemepiece_events_total{event="words"} 6' in prometheus
+    assert 'morphemepiece_segmentation_seconds_count{word_length="5-8"} 1' in prometheus
+    assert profiled_tokenizer.disable_profiling() is profile and profiled_tokenizer.profile is None
+
+
+def test_basic_tokenizer_reused():
+    basic_tokenizer = tokenizer.basic_tokenizer
+    tokenizer.tokenize("some text", vocab, lookup)
+    assert tokenizer.basic_tokenizer is basic_tokenizer
+
+    custom_tokenizer = MorphemepieceTokenizer(vocab=vocab, lookup=lookup, never_split=["[FOO]"])
+    assert custom_tokenizer.basic_tokenizer.tokenize("[FOO] [BAR]") == ["[FOO]", "[", "bar", "]"]
+    custom_tokenizer.mask_token = "[BAR]"
+    assert custom_tokenizer.tokenize("[FOO] [BAR]", vocab, lookup) == ["[UNK]", "[UNK]"]
+    assert custom_tokenizer.basic_tokenizer.tokenize("[FOO] [BAR]") == ["[FOO]", "[BAR]"]
+
+
+def test_regex_pre_tokenizer():
+    import random
+    from transformers import BasicTokenizer
+    from pre_tokenizer import RegexPreTokenizer
+
+    regex_tokenizer = MorphemepieceTokenizer(vocab=vocab, lookup=lookup, pre_tokenizer="regex")
+    assert isinstance(regex_tokenizer.basic_tokenizer, RegexPreTokenizer)
+    sentences = [f"{tokenizer.cls_token} hopefully this {tokenizer.mask_token} works as intended to get "
+                 f"{tokenizer.mask_token} information {tokenizer.pad_token} {tokenizer.pad_token}",
+                 "Don't   split\tthe [MASK]. or [mask], but\x00 ca\x0bfé, naïve Ⅻ 日本語 İstanbul ΣΑΣ\u2028x\xa0y",
+                 "", "   ", "chairball and foxes!"]
+    for sentence in sentences:
+        assert regex_tokenizer.pre_tokenize(sentence) == tokenizer.pre_tokenize(sentence)
+        assert regex_tokenizer.tokenize(sentence, vocab, lookup) == tokenizer.tokenize(sentence, vocab, lookup)
+
+    rng = random.Random(0)
+    alphabet = list("aZ9 .,'-[]\t\n\x00\x0b\x85\xa0éÉßİΣ\u0301\u200b\u2028\u3000\ufffd日語\uf900ﬁ…") + ["[MASK]", "[PAD]"]
+    for settings in (dict(), dict(do_lower_case=False, strip_accents=True), dict(strip_accents=False)):
+        never_split = ["[MASK]", "[PAD]", "[foo]"]
+        basic = BasicTokenizer(never_split=never_split, **settings)
+        regex = RegexPreTokenizer(never_split=never_split, **settings)
+        for _ in range(2000):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+            assert regex.tokenize(text) == basic.tokenize(text)
+    with pytest.raises(ValueError):
+        MorphemepieceTokenizer(vocab=vocab, lookup=lookup, pre_tokenizer="spaces")
+
+
+def test_morpheme_trie():
+    from trie import PREFIX, WORD
+    matches = vocab.inventory.trie.matches_from("unarcher", 0)
+    assert (0, 2, PREFIX) in [(start, end, flags & PREFIX) for start, end, flags in matches]
+    assert [(start, end) for start, end, flags in vocab.inventory.reversed_trie.matches_until("unarcher", 8)
+            if flags & WORD][-1] == (2, 8)
+    assert tokenizer.tokenize_word("unarcher", vocab_split, dir=-1) == ["un##", "archer"]
+
+
+def test_bidirectional_matches_both_directions():
+    for word in ["unarcher", "chairball", "prenotebooks", "antidisestablishmentarianism", "xzqwv"]:
+        forwards_list = tokenizer.tokenize_word(word, vocab.inventory, dir=1)
+        backwards_list = tokenizer.tokenize_word(word, vocab.inventory, dir=-1)
+        len_forward = len([token for token in forwards_list if token != "##"])
+        len_backward = len([token for token in backwards_list if token != "##"])
+        expected = backwards_list if 1 < len_backward < len_forward else forwards_list
+        assert tokenizer.tokenize_word_bidirectional(word, vocab.inventory, "[UNK]", 100) == expected
+
+
+def test_vocab_split_dict_inventory():
+    # dictionaries of lists are converted to an inventory once, not for every word
+    assert tokenizer._inventory(vocab_split) is vocab.inventory
+    split_copy = {key: list(value) for key, value in vocab_split.items()}
+    inventory = tokenizer._inventory(split_copy)
+    assert tokenizer._inventory(split_copy) is inventory and tokenizer._inventory(inventory) is inventory
+    assert tokenizer.tokenize_word_bidirectional("chairball", split_copy, "[UNK]", 100) == \
+           tokenizer.tokenize_word_bidirectional("chairball", vocab.inventory, "[UNK]", 100)
+    split_copy["words"].append("chairball")
+    assert "chairball" in tokenizer._inventory(split_copy).words
+
+
+def test_tokenize_batch():
+    sentences = ["it is totally normal to be indistinguishable", "", "chairball", "foxes and running"]
+    expected = [tokenizer.tokenize(sentence, vocab, lookup) for sentence in sentences]
+    assert tokenizer.tokenize_batch(sentences, num_workers=1) == expected
+    assert tokenizer.tokenize_batch(sentences, num_workers=2, chunksize=1) == expected
+
+
+def test_batch_encode():
+    sentences = ["i use this sentence to check if everything works fine", "", "chairball and foxes"]
+    encoded = tokenizer.batch_encode(sentences)
+    assert encoded["input_ids"].dtype == "int32" and encoded["input_ids"].shape == (3, 13)
+    expected = tokenizer(sentences, padding=True, vocab=vocab, lookup=lookup)
+    assert {key: value.tolist() for key, value in encoded.items()} == dict(expected)
+
+    encoded = tokenizer.batch_encode(sentences, max_length=5, padding=False, truncation=True, return_tensors=None)
+    assert dict(encoded) == dict(tokenizer(sentences, max_length=5, truncation=True, vocab=vocab, lookup=lookup))
+    assert encoded["input_ids"][0] == [3034, 3118, 12515, 10862, 3056]
+    left_tokenizer = MorphemepieceTokenizer(vocab=vocab, lookup=lookup, truncation_side="left")
+    encoded = left_tokenizer.batch_encode(sentences, max_length=5, truncation=True, return_alignment=True)
+    expected = left_tokenizer(sentences, max_length=5, truncation=True, padding=True, vocab=vocab, lookup=lookup)
+    assert encoded["input_ids"].tolist() == expected["input_ids"]
+    assert encoded["word_ids"][0].tolist() == [7, 7, 8, 8, 9]
+    with pytest.raises(ValueError):
+        tokenizer.batch_encode(sentences, padding=False)
+
+
+def test_async_tokenizer():
+    sentences = ["it is totally normal to be indistinguishable", "foxes", "", "fine-grained testcase"] * 10
+
+    async def encode_all():
+        async with AsyncMorphemepieceTokenizer(tokenizer, max_batch_size=16, max_pending=8) as async_tokenizer:
+            ids = await asyncio.gather(*(async_tokenizer.aencode(sentence) for sentence in sentences))
+            tokens = await async_tokenizer.atokenize(sentences[0])
+            return ids, tokens, async_tokenizer.batches
+
+    ids, tokens, batches = asyncio.run(encode_all())
+    assert ids == [tokenizer.encode(sentence) for sentence in sentences]
+    assert tokens == tokenizer.tokenize(sentences[0], vocab, lookup)
+    assert batches < len(sentences)
+
+
+def test_async_tokenizer_close_partial_batch():
+    async def close_while_collecting():
+        async_tokenizer = AsyncMorphemepieceTokenizer(tokenizer, max_wait=1.0)
+        await async_tokenizer.start()
+        request = asyncio.ensure_future(async_tokenizer.aencode("foxes"))
+        # the batcher holds the request and waits for more
+        await asyncio.sleep(0.1)
+        await async_tokenizer.close()
+        return await asyncio.wait_for(request, 1.0)
+
+    with pytest.raises(RuntimeError, match="closed"):
+        asyncio.run(close_while_collecting())
+
+
+def test_async_tokenizer_close_blocked_requests():
+    async def close_while_blocked():
+        async_tokenizer = AsyncMorphemepieceTokenizer(tokenizer, max_batch_size=1, max_pending=1)
+        await async_tokenizer.start()
+        # one request runs, one waits in the full queue and the others wait for space in it
+        requests = [asyncio.ensure_future(async_tokenizer.aencode("foxes")) for _ in range(6)]
+        await asyncio.sleep(0)
+        await async_tokenizer.close()
+        results = await asyncio.wait_for(asyncio.gather(*requests, return_exceptions=True), 1.0)
+        with pytest.raises(RuntimeError, match="closed"):
+            await async_tokenizer.aencode("foxes")
+        return results
+
+    results = asyncio.run(close_while_blocked())
+    assert all(result == tokenizer.encode("foxes") or isinstance(result, RuntimeError) for result in results)
+    assert isinstance(results[-1], RuntimeError)
+
+
+def test_alignment():
+    text = "Chairball and FOXES, [MASK] naïve"
+    alignment = tokenizer.tokenize(text, vocab, lookup, return_alignment=True)
+    assert alignment.tokens == tokenizer.tokenize(text, vocab, lookup)
+    assert list(alignment.word_ids) == [0, 0, 0, 1, 2, 2, 3, 4, 5]
+    assert [text[start:end] for start, end in zip(alignment.starts, alignment.ends)] == \
+           ["Chairball"] * 3 + ["and", "FOXES", "FOXES", ",", "[MASK]", "naïve"]
+    assert tokenizer.tokenize_batch([text, ""], num_workers=2, return_alignment=True)[0] == alignment
+
+    encoded = tokenizer.batch_encode([text, "and"], return_alignment=True)
+    assert encoded["word_ids"][1].tolist() == [0] + [-1] * 8
+    assert encoded["offset_mapping"][0, 4].tolist() == [14, 19]
+
+    # the basic tokenizer composes decomposed accents (NFC), the spans cover the base character and its marks
+    cased_tokenizer = MorphemepieceTokenizer(vocab=vocab, lookup=lookup, do_lower_case=False)
+    decomposed = "Cafe\u0301 and nai\u0308ve"
+    alignment = cased_tokenizer.tokenize(decomposed, return_alignment=True)
+    assert -1 not in alignment.starts
+    assert {decomposed[start:end] for start, end in zip(alignment.starts, alignment.ends)} == \
+           {"Cafe\u0301", "and", "nai\u0308ve"}
+
+    # the words are lowercased as a whole, a final sigma is found as well
+    alignment = tokenizer.tokenize("ΣΑΣ ΑΣ", return_alignment=True)
+    assert set(zip(alignment.word_ids, alignment.starts, alignment.ends)) == {(0, 0, 3), (1, 4, 6)}
+
+
+def test_fast_tokenizer():
+    fast_tokenizer = MorphemepieceTokenizerFast(tokenizer=tokenizer)
+    sentences = ["it is totally normal to be indistinguishable",
+                 "let's test some compounds and punctuation here in this fine-grained testcase!?", "foxes", ""]
+    encodings = fast_tokenizer.encode_batch(sentences, add_special_tokens=False)
+    assert [encoding.ids for encoding in encodings] == [tokenizer.encode(sentence) for sentence in sentences]
+
+    # tokens are lowercased as a whole (final sigma) and special tokens are only kept between whitespace
+    for text in ["ΣΑΣ", "x[PAD]y", "a [MASK] b", "[pad].", "İstanbul ΑΣ'Α"]:
+        assert fast_tokenizer.encode(text, add_special_tokens=False).ids == tokenizer.encode(text)
+
+    encoding = fast_tokenizer.encode("Running foxes")
+    assert encoding.tokens == ['[CLS]', 'run', '##ing', 'fox', '##s', '[SEP]']
+    assert encoding.offsets[1:5] == [(0, 3), (3, 7), (8, 11), (11, 13)]
+    assert fast_tokenizer.decode(encoding.ids) == tokenizer.decode(encoding.ids[1:-1])
+
+    pretrained_fast = fast_tokenizer.to_pretrained_fast()
+    batch = pretrained_fast(["running foxes", "foxes"], padding=True)
+    assert batch["input_ids"][1] == encoding.ids[:1] + encoding.ids[3:] + [tokenizer.vocab.token_to_id["[PAD]"]] * 2
+
+
+def test_tokenize_file(tmp_path):
+    import gzip
+    from corpus import tokenize_file
+
+    lines = ["it is totally normal to be indistinguishable", "", "chairball and foxes"]
+    input_path = str(tmp_path / "corpus.txt.gz")
+    with gzip.open(input_path, "wt", encoding="utf-8") as fp:
+        fp.write("\n".join(lines) + "\n")
+
+    output_path = str(tmp_path / "tokens.txt")
+    stats = tokenize_file(tokenizer, input_path, output_path, buffer_size=2)
+    with open(output_path, encoding="utf-8") as fp:
+        assert fp.read().split("\n")[:-1] == [" ".join(tokenizer.tokenize(line, vocab, lookup)) for line in lines]
+    assert stats == {"texts": 3, "tokens": 16}
+
+    output_path = str(tmp_path / "ids.txt")
+    tokenize_file(tokenizer, input_path, output_path, buffer_size=1, num_workers=2, return_ids=True, documents=True)
+    with open(output_path, encoding="utf-8") as fp:
+        assert fp.read().split("\n")[:-1] == [" ".join(str(i) for i in tokenizer.encode(line))
+                                              for line in lines if line]
+
+
+def test_tokenize_stream_deduplicated():
+    from corpus import tokenize_stream
+
+    texts = ["chairball and foxes", "", "foxes and chairball", "it is totally normal to be indistinguishable"] * 3
+    expected = list(tokenize_stream(tokenizer, texts, buffer_size=2))
+    assert list(tokenize_stream(tokenizer, texts, buffer_size=2, deduplicate=True)) == expected
+    assert list(tokenize_stream(tokenizer, texts, buffer_size=5, num_workers=2, deduplicate=True)) == expected
+    assert list(tokenize_stream(tokenizer, texts, return_ids=True, deduplicate=True, type_cache_size=2)) == \
+           [tokenizer.convert_tokens_to_ids(tokens) for tokens in expected]
+
+
+def test_batch_segmentation():
+    from corpus import tokenize_stream
+
+    words = sorted(word for word in vocab.inventory.words if isinstance(word, str) and word.isalpha())[::50]
+    samples = [a + b for a, b in zip(words, reversed(words))] + [a + "xq" + b for a, b in zip(words, words[1:])]
+    samples += ["chairball", "undoing", "indistinguishable", "x" * 120, "chairball" * 12, "ä" + words[0], "qqq"]
+    inventory = vocab.inventory
+    expected = [tokenizer.tokenize_word_bidirectional(word, inventory, "[UNK]", 100) for word in samples]
+    assert tokenizer.segment_words(samples, inventory) == expected
+    assert tokenizer.segment_words(samples, inventory, allow_compounds=False) == \
+           [tokenizer.tokenize_word_bidirectional(word, inventory, "[UNK]", 100, False) for word in samples]
+    assert tokenizer.segment_words(["chairball"] * 3, inventory) == [['chair', '##', 'ball']] * 3
+    samples += ["foxes", "and", ""]
+    assert tokenizer.tokenize_words(samples, vectorized=True) == tokenizer.tokenize_words(samples, num_workers=1)
+
+    texts = ["chairball and foxes", "", "foxes and chairball", "it is totally normal to be indistinguishable"] * 3
+    assert list(tokenize_stream(tokenizer, texts, buffer_size=2, deduplicate=True, vectorized=True)) == \
+           list(tokenize_stream(tokenizer, texts, buffer_size=2))
+
+
+def test_breakdown_index(tmp_path):
+    from breakdown_index import build_breakdown_index, count_word_types, load_breakdown_index, save_breakdown_index
+
+    sentences = ["chairball and footballs", "the unfoxes and chairball", "x" * 120]
+    counts = count_word_types(tokenizer, sentences)
+    assert counts["chairball"] == 2 and counts["and"] == 2
+    index = build_breakdown_index(tokenizer, counts, num_workers=1)
+    assert index["chairball"] == "chair ## ball" and "and" not in index and "x" * 120 not in index
+
+    path = str(tmp_path / "index.csv")
+    save_breakdown_index(path, index)
+    assert load_breakdown_index(path) == index
+    extended_tokenizer = MorphemepieceTokenizer(vocab=vocab, lookup=dict(lookup))
+    extended_tokenizer.extend_lookup(index)
+    assert "chairball" in extended_tokenizer.lookup and "chairball" not in lookup
+    for sentence in sentences:
+        assert extended_tokenizer.tokenize(sentence, extended_tokenizer.vocab, extended_tokenizer.lookup) == \
+               tokenizer.tokenize(sentence, vocab, lookup)
+
+
+def test_compiled_vocab(tmp_path):
+    from compiled_vocab import load_compiled, save_compiled
+
+    small_vocab = Vocab(["[PAD]", "[UNK]", "fox", "##s", "nan"],
+                        {'prefixes': ["un"], 'words': ["fox", "nan"], 'suffixes': ["s"]}, True)
+    small_lookup = {"foxes": "fox ##s", "unfoxes": "un## fox ##s"}
+    path = str(tmp_path / "small.mpv")
+    save_compiled(path, small_vocab, small_lookup)
+    loaded_vocab, loaded_lookup = load_compiled(path)
+    assert loaded_vocab.vocabulary == small_vocab.vocabulary
+    assert loaded_vocab.vocab_split == small_vocab.vocab_split
+    assert loaded_vocab.is_cased and loaded_vocab.token_to_id["nan"] == 5
+    assert loaded_lookup == small_lookup
+
+
+def test_rds_vocab(tmp_path, monkeypatch):
+    rds_vocab, rds_lookup = load_rds_vocab("./morphemepiece_vocab_30000.rds", "./morphemepiece_lookup_30000.rds")
+    assert rds_vocab.vocabulary == pd.read_csv("./data/vocabulary.csv", keep_default_na=False)["x"].to_list()
+    assert rds_vocab.vocab_split['suffixes'] == pd.read_csv("./data/suffixes.csv", keep_default_na=False)["x"].to_list()
+    assert rds_lookup["foxes"] == "fox ##s" and len(rds_lookup) == 348264
+
+    # without a compiled vocabulary the .rds files are decoded once and cached
+    compiled = tmp_path / "morphemepiece.mpv"
+    monkeypatch.setattr(MorphemepieceTokenizer, "vocab_files_names",
+                        dict(MorphemepieceTokenizer.vocab_files_names, compiled=str(compiled)))
+    rds_tokenizer = MorphemepieceTokenizer()
+    assert compiled.exists()
+    assert rds_tokenizer.vocab.vocabulary == rds_vocab.vocabulary and rds_tokenizer.lookup == rds_lookup
+    assert MorphemepieceTokenizer().lookup == rds_lookup
+
+    # a compiled file older than the .rds files is stale and written again
+    from compiled_vocab import save_compiled
+    save_compiled(str(compiled), Vocab(["fox"], {'prefixes': [], 'words': ["fox"], 'suffixes': []}, True), {})
+    os.utime(compiled, (0, 0))
+    assert MorphemepieceTokenizer().lookup == rds_lookup
+    assert os.path.getmtime(compiled) > 0
+
+    # relative paths are resolved against the package, not the working directory
+    monkeypatch.chdir(tmp_path)
+    assert MorphemepieceTokenizer().lookup == rds_lookup
+
+
+def test_mapped_vocab(tmp_path):
+    import pickle
+    from mapped_vocab import load_mapped, save_mapped
+
+    small_vocab = Vocab(["[PAD]", "[UNK]", "fox", "##s", "un##", "fox"],
+                        {'prefixes': ["un"], 'words': ["fox"], 'suffixes': ["s"]}, True)
+    small_lookup = {"foxes": "fox ##s"}
+    path = str(tmp_path / "small.mpm")
+    save_mapped(path, small_vocab, small_lookup)
+    mapped_vocab, mapped_lookup = load_mapped(path)
+    assert list(mapped_vocab.vocabulary) == small_vocab.vocabulary and mapped_vocab.is_cased
+    assert dict(mapped_vocab.token_to_id) == small_vocab.token_to_id
+    assert mapped_vocab.id_to_token[2] == "fox" and "fox" in mapped_vocab.inventory.words
+    assert dict(mapped_lookup) == small_lookup and "fox" not in mapped_lookup
+
+    mapped_tokenizer = MorphemepieceTokenizer(vocab=mapped_vocab, lookup=mapped_lookup)
+    assert mapped_tokenizer.tokenize("foxes unfoxs", mapped_vocab, mapped_lookup) == ["fox", "##s", "un##", "fox", "##s"]
+    assert mapped_tokenizer.encode("foxes") == [3, 4]
+    assert dict(pickle.loads(pickle.dumps(mapped_lookup))) == small_lookup
+
+
+def test_compiled_lookup():
+    import pickle
+
+    small_vocab = Vocab(["[PAD]", "[UNK]", "fox", "##s", "un##"],
+                        {'prefixes': ["un"], 'words': ["fox"], 'suffixes': ["s"]}, True)
+    small_tokenizer = MorphemepieceTokenizer(vocab=small_vocab, lookup={"foxes": "fox ##s", "foxen": "fox ##en"})
+    compiled = small_tokenizer.compiled_lookup
+    assert compiled.tokens("foxes") == ("fox", "##s") and compiled.ids("foxes") == (3, 4)
+    # tokens of a breakdown, that are not in the vocabulary, get the ID of the unknown token
+    assert compiled.ids("foxen") == (3, 2) and compiled.ids("fox") is None
+    assert compiled.tokens("foxes")[0] is compiled.tokens("foxen")[0]
+    assert small_tokenizer.encode("foxes foxen unfoxs") == [3, 4, 3, 2, 5, 3, 4]
+    assert small_tokenizer.tokenize("foxes") == ["fox", "##s"]
+    assert len(pickle.loads(pickle.dumps(compiled))) == 0
+
+    small_tokenizer.extend_lookup({"unfox": "un## fox"})
+    assert small_tokenizer.compiled_lookup.ids("unfox") == (5, 3)
+    small_tokenizer.lookup = {"foxes": "un## fox"}
+    assert small_tokenizer.encode("foxes") == [5, 3] and small_tokenizer.compiled_lookup is not compiled
+    # a breakdown changed in place is used after clearing the cache
+    small_tokenizer.lookup["foxes"] = "fox ##s"
+    small_tokenizer.clear_cache()
+    assert small_tokenizer.encode("foxes") == [3, 4]
+    for sentence in ["i use this sentence to check if everything works fine", "the unfoxes and chairball [MASK]"]:
+        assert tokenizer.encode(sentence) == tokenizer.convert_tokens_to_ids(tokenizer.tokenize(sentence, vocab,
+                                                                                                 dict(lookup)))
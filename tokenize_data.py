@@ -1,29 +1,36 @@
-import lzma
 import os
 import datetime
+from corpus import tokenize_file
 from tokenizer import MorphemepieceTokenizer
 from multiprocessing import Pool
-from transformers import BertTokenizer
-def tokenize_text(data, tokenizer):
+
+# tokenizer of the worker process, passed once by the pool initializer
+tokenizer = None
+
+
+def init_worker(worker_tokenizer):
+    global tokenizer
+    tokenizer = worker_tokenizer
+
+
+def tokenize_text(data):
     cur_path=os.path.dirname(__file__)
     data_path=os.path.relpath('..\\openwebtext\\OpenWebText\\subsets\\openwebtext\\urlsf_subset00-'+str(data)+'_data.xz', cur_path)
     load_data=datetime.datetime.now().time()
     print("Loaded Data "+str(data)+ ": "+str(load_data))
-    text=lzma.open(data_path, mode='rt', encoding='utf-8').read()
-    tokenized_text=tokenizer.tokenize(text, tokenizer.vocab, tokenizer.lookup)
-    with open("C:\\Users\\janch\\OneDrive\\Desktop\\Uni\\BachelorThesis\\tokenized_files\\urlsf_subset00-"+str(data)+"_data_tokenized.txt", 'w', encoding='utf-8') as fp:
-        fp.write(" ".join(token for token in tokenized_text))
+    # the shard is streamed line by line, so the memory use does not depend on its size
+    tokenize_file(tokenizer, data_path, "C:\\Users\\janch\\OneDrive\\Desktop\\Uni\\BachelorThesis\\tokenized_files\\urlsf_subset00-"+str(data)+"_data_tokenized.txt")
     return data
 
-num_process=2
-start=datetime.datetime.now()
-tokenizer=BertTokenizer.from_pretrained("bert-base-uncased")
-print("Start: "+str(start))
+
 if __name__ == '__main__':
-    with Pool(num_process) as p:
-        p.map(tokenize_text, range(9,11), tokenizer)
-#for data in range(7, 9):
-    #tokenize_text(data)
-fininished=datetime.datetime.now()
-print("Finished: "+str(fininished))
-print("Total time: "+ str(fininished-start))
\ No newline at end of file
+    num_process=2
+    start=datetime.datetime.now()
+    print("Start: "+str(start))
+    with Pool(num_process, initializer=init_worker, initargs=(MorphemepieceTokenizer(),)) as p:
+        p.map(tokenize_text, range(9,11))
+    #for data in range(7, 9):
+        #tokenize_text(data)
+    fininished=datetime.datetime.now()
+    print("Finished: "+str(fininished))
+    print("Total time: "+ str(fininished-start))
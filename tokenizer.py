@@ -1,12 +1,57 @@
+import os
 import re
-from typing import Any, Dict, List, Union, Optional
-from vocab import Vocab
+from array import array
+from collections import ChainMap, namedtuple
+from collections.abc import Mapping, MutableMapping
+from itertools import chain, repeat
+from functools import partial
+from time import perf_counter
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, List, Tuple, Union, Optional
+import numpy as np
+from vocab import MorphemeInventory, Vocab
+from trie import PREFIX, SUFFIX, WORD
+from word_cache import WordCache
+from profiling import TokenizerProfile
 from transformers import PreTrainedTokenizer, BatchEncoding
 from transformers.utils import PaddingStrategy, TensorType
 from transformers.tokenization_utils_base import TruncationStrategy
 from transformers import BasicTokenizer
-import pandas as pd
+from compiled_lookup import CompiledLookup
+from compiled_vocab import load_compiled, save_compiled
+from pre_tokenizer import RegexPreTokenizer, tokenize_with_offsets
+from rds import load_rds_vocab
 
+# tokens of a text with the index of their word and the character span of the word in the text (for every token)
+Alignment = namedtuple("Alignment", ["tokens", "word_ids", "starts", "ends"])
+
+# relative paths of `vocab_files_names` are relative to this package, not to the working directory
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# maximum number of vocabulary split dictionaries, whose converted inventories are kept by a tokenizer
+_MAX_INVENTORIES = 8
+
+# tokenizer of a worker process of `MorphemepieceTokenizer.tokenize_batch`, set once by the pool initializer
+_worker_tokenizer = None
+
+
+def _init_worker(tokenizer):
+    global _worker_tokenizer
+    _worker_tokenizer = tokenizer
+
+
+def _worker_tokenize(text: str, unk_token, max_chars, return_alignment=False) -> List[str]:
+    return _worker_tokenizer.tokenize(text, _worker_tokenizer.vocab, _worker_tokenizer.lookup, unk_token, max_chars,
+                                      return_alignment)
+
+
+def _worker_tokenize_word(word: str, unk_token, max_chars) -> List[str]:
+    return _worker_tokenizer.tokenize_word_lookup(word, _worker_tokenizer.vocab, _worker_tokenizer.lookup, unk_token,
+                                                  max_chars)
+
+
+def _worker_pre_tokenize(text: str) -> List[str]:
+    return _worker_tokenizer.pre_tokenize(text)
 
 
 class MorphemepieceTokenizer(PreTrainedTokenizer):
@@ -22,7 +67,8 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
             vocab (`Vocab`, *optional*, defaults to `morphemepiece_vocabulary` from R):
                 Vocab object with the vocabulary.
             lookup (`Dict[str, List[str]]`, *optional*, defaults to 'morphemepiece_lookup' from R):
-                Lookup for the tokenization process.
+                Lookup for the tokenization process. Change it with `extend_lookup` or assign a new one, after changing
+                it in place `clear_cache` has to be called.
             do_lower_case (`bool`, *optional*, defaults to `True`):
                 Whether or not to lowercase the input when tokenizing.
             do_basic_tokenize (`bool`, *optional*, defaults to `True`):
@@ -47,34 +93,78 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
                 modeling. This is the token which the model will try to predict.
             tokenize_chinese_chars (`bool`, *optional*, defaults to `True`):
                 Whether or not to tokenize Chinese characters.
-            
+            strip_accents (`bool`, *optional*):
+                Whether or not to strip all accents. If this option is not specified, then it will be determined by the
+                value for `do_lower_case`.
+            word_cache_size (`int`, *optional*):
+                Maximum number of words held by the LRU cache of word tokenizations. The cache is disabled, if not set.
+            segment_long_words (`bool`, *optional*, defaults to `False`):
+                Whether words longer than `max_chars` are segmented by `tokenize_long_word`, instead of being replaced
+                by the unknown token.
+            pre_tokenizer (`str`, *optional*, defaults to `"basic"`):
+                Splits the texts into words, `"basic"` with the `BasicTokenizer` of transformers or `"regex"` with the
+                faster `RegexPreTokenizer`, which gives the same words.
 
     """
     vocab_files_names: Dict[str, str] = {"morphemepiece_vocab": "./data/vocabulary.csv",
                                         "suffixes":"./data/suffixes.csv",
                                         "prefixes":"./data/prefixes.csv",
                                         "words": "./data/words.csv",
-                                        "lookup": "./data/lookup.csv"}
+                                        "lookup": "./data/lookup.csv",
+                                        "compiled": "./data/morphemepiece.mpv",
+                                        "rds_vocab": "./morphemepiece_vocab_30000.rds",
+                                        "rds_lookup": "./morphemepiece_lookup_30000.rds"}
     pretrained_vocab_files_map: Dict[str, Dict[str, str]]
     max_model_input_sizes: Dict[str, Optional[int]]
     pretrained_init_configuration: Dict[str, Dict[str, Any]]
     model_input_names: List[str]
     padding_side: str
     truncation_side: str
+    # maximum length of a word, that is tokenized by default
+    MAX_CHARS = 100
     
+    def _data_file(self, name: str) -> str:
+        """Path of a file of `vocab_files_names`, relative paths are resolved against the directory of this package."""
+        return os.path.normpath(os.path.join(_PACKAGE_DIR, self.vocab_files_names[name]))
+
     def _prepare_vocab(self)->Vocab:
         """load and prepare vocabulary from morphemepiece_vocab"""
-        vocabulary = pd.read_csv(self.vocab_files_names["morphemepiece_vocab"])["x"].to_list()
-        prefixes = pd.read_csv(self.vocab_files_names["prefixes"])["x"].to_list()
-        words = pd.read_csv(self.vocab_files_names["words"])["x"].to_list()
-        suffixes = pd.read_csv(self.vocab_files_names["suffixes"])["x"].to_list()
+        import pandas as pd
+        vocabulary = pd.read_csv(self._data_file("morphemepiece_vocab"), keep_default_na=False)["x"].to_list()
+        prefixes = pd.read_csv(self._data_file("prefixes"), keep_default_na=False)["x"].to_list()
+        words = pd.read_csv(self._data_file("words"), keep_default_na=False)["x"].to_list()
+        suffixes = pd.read_csv(self._data_file("suffixes"), keep_default_na=False)["x"].to_list()
         vocab_split = {'prefixes': prefixes, 'words': words, 'suffixes': suffixes}
         vocab = Vocab(vocabulary, vocab_split, True)
         return vocab
 
     def _prepare_lookup(self)-> Dict[str,str]:
         """load and prepare lookup from morphemepiece_vocab"""
-        return pd.read_csv(self.vocab_files_names["lookup"]).set_index("y").to_dict()["x"]
+        import pandas as pd
+        return pd.read_csv(self._data_file("lookup"), keep_default_na=False).set_index("y").to_dict()["x"]
+
+    def _load_bundled(self) -> Tuple[Optional[Vocab], Optional[Dict[str, str]]]:
+        """load the compiled vocabulary, decode and compile the bundled .rds files if it does not exist yet or is older
+            than them"""
+        compiled = self._data_file("compiled")
+        rds_vocab, rds_lookup = self._data_file("rds_vocab"), self._data_file("rds_lookup")
+        has_rds = os.path.exists(rds_vocab) and os.path.exists(rds_lookup)
+        # the compiled vocabulary (see `compiled_vocab.py`) is loaded in milliseconds and without pandas, it is only
+        # used if the .rds files have not been updated since it was written
+        if os.path.exists(compiled) and (not has_rds or os.path.getmtime(compiled) >= max(
+                os.path.getmtime(rds_vocab), os.path.getmtime(rds_lookup))):
+            return load_compiled(compiled)
+        if has_rds:
+            vocab, lookup = load_rds_vocab(rds_vocab, rds_lookup)
+            try:
+                # written next to the target and renamed, so a concurrent start never reads a partial file
+                save_compiled(compiled + ".tmp", vocab, lookup)
+                os.replace(compiled + ".tmp", compiled)
+            except OSError:
+                # read-only installation, the .rds files are decoded again on the next start
+                pass
+            return vocab, lookup
+        return None, None
 
     def __init__(self,
                  vocab: Vocab = None,
@@ -89,7 +179,12 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
                  mask_token="[MASK]",
                  tokenize_chinese_chars=False,
                  strip_accents=None,
+                 word_cache_size: Optional[int] = None,
+                 segment_long_words: bool = False,
+                 pre_tokenizer: str = "basic",
                  **kwargs):
+        if pre_tokenizer not in ("basic", "regex"):
+            raise ValueError("pre_tokenizer must be 'basic' or 'regex', got %r" % pre_tokenizer)
 
         super().__init__(
             do_lower_case=do_lower_case,
@@ -103,15 +198,69 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
             tokenize_chinese_chars=tokenize_chinese_chars,
             strip_accents=strip_accents,
             **kwargs)
+        if vocab is None and lookup is None:
+            vocab, lookup = self._load_bundled()
         if vocab is None: 
             vocab=self._prepare_vocab()
         if lookup is None:
             lookup=self._prepare_lookup()
+        self.word_cache = WordCache(word_cache_size) if word_cache_size else None
+        self._compiled_lookup = None
         self.vocab = vocab
         self.lookup = lookup
+        self.segment_long_words = segment_long_words
+        self.do_lower_case = do_lower_case
+        self.strip_accents = strip_accents
+        self.never_split = list(never_split) if never_split is not None else []
+        self.pre_tokenizer = pre_tokenizer
+        self._basic_tokenizer_special_tokens = None
+        self.basic_tokenizer = self._get_basic_tokenizer()
+        self.profile = None
+        self._inventories: Dict[int, Tuple[Mapping, Tuple[int, ...], MorphemeInventory]] = {}
        
 
 
+    @property
+    def vocab(self) -> Vocab:
+        """Vocab object of this tokenizer, assigning a new one clears the cached tokenizations."""
+        return self._vocab
+
+    @vocab.setter
+    def vocab(self, vocab: Vocab) -> None:
+        self._vocab = vocab
+        self.clear_cache()
+
+    @property
+    def lookup(self) -> Mapping[str, str]:
+        """Lookup of this tokenizer, assigning a new one clears the cached tokenizations."""
+        return self._lookup
+
+    @lookup.setter
+    def lookup(self, lookup: Mapping[str, str]) -> None:
+        self._lookup = lookup
+        self.clear_cache()
+
+    def _inventory(self, vocab_split) -> MorphemeInventory:
+        """Returns the inventory of a vocabulary split, dictionaries are converted once and then reused.
+
+            The split of the own vocabulary maps to its inventory. Other dictionaries are converted on their first use,
+            a dictionary is converted again if the number of its prefixes, words or suffixes has changed.
+        """
+        if isinstance(vocab_split, MorphemeInventory):
+            return vocab_split
+        if vocab_split is self.vocab.vocab_split:
+            return self.vocab.inventory
+        sizes = tuple(len(vocab_split[key]) for key in ("prefixes", "words", "suffixes"))
+        # keyed by id, the entry holds a reference to the dictionary, so the id is not reused while it is cached
+        entry = self._inventories.get(id(vocab_split))
+        if entry is None or entry[0] is not vocab_split or entry[1] != sizes:
+            if len(self._inventories) >= _MAX_INVENTORIES:
+                self._inventories.clear()
+            entry = self._inventories[id(vocab_split)] = (
+                vocab_split, sizes,
+                MorphemeInventory(vocab_split['prefixes'], vocab_split['words'], vocab_split['suffixes'], ()))
+        return entry[2]
+
     def tokenize_word(self, word: str, vocab_split, dir=1, allow_compounds=True, unk_token="[UNK]", max_chars=100) -> List[str]:
         """Tokenize a single word based on morphemepiece tokenization,
             
@@ -120,8 +269,8 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
             Args:
                 word(`str`):
                     Word that should be tokenized.
-                vocab_split(`Dict[str, List[str]]`):
-                    Dictionary that consists of lists with prefixes, suffixes and words.
+                vocab_split(`MorphemeInventory` or `Dict[str, List[str]]`):
+                    Inventory (or dictionary) that consists of the prefixes, suffixes and words.
                 dir(`int`, *optional*, defaults to `1`):
                     Reading direction: `1` = forwards,  `-1`= backwards.
                 allow_compounds(`bool`, *optional*, defaults to `True`):
@@ -136,27 +285,32 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
                     List of tokens of the word
 
         """
-        if len(word) > max_chars:
+        if len(word) > max_chars or word == "":
+            return [unk_token]
+        # the tries of the inventory yield all morphemes of one position in a single walk
+        vocab_split = self._inventory(vocab_split)
+        sub_tokens = self._search_word(word, vocab_split, dir, allow_compounds)
+        if sub_tokens is None:
             return [unk_token]
+        return sub_tokens
+
+    def _search_word(self, word: str, inventory: MorphemeInventory, dir=1, allow_compounds=True,
+                     max_tokens=None) -> Optional[List[str]]:
+        """Greedy longest-match search of `tokenize_word` for a non-empty word.
+
+            Returns `None` if the word can not be tokenized, or as soon as `max_tokens` tokens (not counting the
+            compound marker) have been found.
+        """
         frag_pat = "##"
-        # load vocabulary
-        prefixes = vocab_split['prefixes']
-        words = vocab_split['words']
-        suffixes = vocab_split['suffixes']
-        is_bad = False
-        start = 1
         sub_tokens = []
+        num_tokens = 0
         word_len = len(word)
-        end = word_len
-        compound = False
 
         word_allowed = "XXX"
 
         if allow_compounds:
             word_allowed = "#"
 
-        allowed_next_rules = {}
-        allowed_next = []
         # set of rules for forward search
         if dir == 1:
             allowed_next_rules = {
@@ -165,6 +319,8 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
                 's': "s"
             }
             allowed_next = ["p", "w"]
+            trie = inventory.trie
+            pos = 0
         else:
             allowed_next_rules = {
                 'p': "p",
@@ -172,60 +328,55 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
                 's': ["p", "w", "s"]
             }
             allowed_next = ["s", "w"]
+            trie = inventory.reversed_trie
+            pos = word_len
         keep_going = True
 
         while keep_going:
-
+            # all morphemes starting (forward) or ending (backward) at the current position, longest first
             if dir == 1:
-                end = word_len
+                matches = trie.matches_from(word, pos)
             else:
-                start = 1
+                matches = trie.matches_until(word, pos)
 
             cur_substring = ""
-            while start <= end:
-                sub_str = word[start - 1:end]
+            for start, end, flags in reversed(matches):
                 # look for prefixes, if allowed
-                if "p" in allowed_next and end < word_len and sub_str in prefixes:
-                    cur_substring = sub_str + frag_pat
+                if "p" in allowed_next and end < word_len and flags & PREFIX:
+                    cur_substring = word[start:end] + frag_pat
                     allowed_next = allowed_next_rules['p']
                     break
 
                 # look for suffixes, if allowed
-                elif "s" in allowed_next and start > 1 and sub_str in suffixes:
-                    cur_substring = frag_pat + sub_str
+                elif "s" in allowed_next and start > 0 and flags & SUFFIX:
+                    cur_substring = frag_pat + word[start:end]
                     allowed_next = allowed_next_rules['s']
                     break
 
                 # look for complete words, if allowed
-                elif ("w" in allowed_next or "#" in allowed_next) and sub_str in words:
-                    cur_substring = sub_str
+                elif ("w" in allowed_next or "#" in allowed_next) and flags & WORD:
+                    cur_substring = word[start:end]
                     if "#" in allowed_next:
-                        if dir == 1:
-                            sub_tokens.append(frag_pat)
-                        else:
-                            sub_tokens.insert(0, frag_pat)
+                        sub_tokens.append(frag_pat)
                     allowed_next = allowed_next_rules['w']
                     break
-                if dir == 1:
-                    end = end - 1
-                else:
-                    start = start + 1
             if cur_substring == "":
-                is_bad = True
-                break
+                return None
 
+            sub_tokens.append(cur_substring)
+            num_tokens += 1
+            if num_tokens == max_tokens:
+                return None
             if dir == 1:
-                sub_tokens.append(cur_substring)
-                start = end + 1
-                keep_going = start <= word_len
+                pos = end
+                keep_going = pos < word_len
             else:
-                sub_tokens.insert(0, cur_substring)
-                end = start - 1
-                keep_going = end >= 1
-
-        if is_bad:
-            return [unk_token]
+                pos = start
+                keep_going = pos > 0
 
+        # the backward search collects the tokens from back to front
+        if dir != 1:
+            sub_tokens.reverse()
         return sub_tokens
 
     def tokenize_word_bidirectional(self, word: str, vocab_split, unk_token, max_chars, allow_compounds=True) -> List[str]:
@@ -235,8 +386,8 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
             Args:
                 word(`str`):
                     Word that should be tokenized.
-                vocab_split(`Dict[str, List[str]]`):
-                    Dictionary that consists of lists with prefixes, suffixes and words.
+                vocab_split(`MorphemeInventory` or `Dict[str, List[str]]`):
+                    Inventory (or dictionary) that consists of the prefixes, suffixes and words.
                 unk_token(`str`):
                     The unknown token. A token that is not in the vocabulary cannot be converted to an ID and is set to be this
                     token instead.  
@@ -249,17 +400,122 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
                     List of tokens of the word
 
         """
-
+        vocab_split = self._inventory(vocab_split)
+        if self.segment_long_words and len(word) > max_chars:
+            return self.tokenize_long_word(word, vocab_split, unk_token)
         forwards_list = self.tokenize_word(word, vocab_split=vocab_split, dir=1, allow_compounds=allow_compounds,
                                            unk_token=unk_token, max_chars=max_chars)
-        backwards_list = self.tokenize_word(word, vocab_split=vocab_split, dir=-1, allow_compounds=allow_compounds,
-                                            unk_token=unk_token, max_chars=max_chars)
-        len_forward = len([token for token in forwards_list if token != "##"])
-        len_backward = len([token for token in backwards_list if token != "##"])
-        if len_backward < len_forward and len_backward > 1:
-            return backwards_list
-        else:
+        len_forward = len(forwards_list) - forwards_list.count("##")
+        # the backward result is only used if it has fewer tokens than the forward result, but more than one.
+        # Thus it can not win against one or two forward tokens (including [UNK]) and is cut short, as soon
+        # as it reaches as many tokens as the forward result.
+        profile = self.profile
+        if len_forward < 3:
+            if profile is not None:
+                profile.count("forward_only")
             return forwards_list
+        backwards_list = self._search_word(word, vocab_split, dir=-1, allow_compounds=allow_compounds,
+                                           max_tokens=len_forward)
+        if backwards_list is not None and len(backwards_list) - backwards_list.count("##") > 1:
+            if profile is not None:
+                profile.count("backward_used")
+            return backwards_list
+        if profile is not None:
+            profile.count("backward_rejected")
+        return forwards_list
+
+    def tokenize_long_word(self, word: str, vocab_split, unk_token="[UNK]", window=32) -> List[str]:
+        """Tokenize a word of any length with a bounded cost per character.
+
+            A single forward walk takes the longest allowed morpheme at every position, like the forward search of
+            `tokenize_word`, but looks at most `window` characters ahead. Where no morpheme is allowed, a new compound
+            part is started; characters, at which no prefix or word starts, are joined to one unknown token. The
+            parts are joined by compound markers, so the tokens still decode to one word. The cost is linear in the
+            length of the word, there is no second (backward) pass.
+
+            Args:
+                word(`str`):
+                    Word that should be tokenized, for example a URL or an encoded blob.
+                vocab_split(`MorphemeInventory` or `Dict[str, List[str]]`):
+                    Inventory (or dictionary) that consists of the prefixes, suffixes and words.
+                unk_token(`str`, *optional*, defaults to `"[UNK]"`):
+                    The token for a run of characters, that can not be tokenized.
+                window(`int`, *optional*, defaults to `32`):
+                    Maximum length of a morpheme, that is looked for.
+            Returns:
+                `List[str]`:
+                    List of tokens of the word
+        """
+        vocab_split = self._inventory(vocab_split)
+        trie = vocab_split.trie
+        word_len = len(word)
+        tokens = []
+        # the rules of the forward search, "#" allows a word after a word with a compound marker
+        allowed_next_rules = {'p': ("p", "w", "s"), 'w': ("s", "#"), 's': ("s",)}
+        allowed_next = ("p", "w")
+        pos = 0
+        while pos < word_len:
+            token = None
+            for start, end, flags in reversed(trie.matches_from(word, pos, window)):
+                if "p" in allowed_next and end < word_len and flags & PREFIX:
+                    token, rule = word[start:end] + "##", 'p'
+                elif "s" in allowed_next and flags & SUFFIX:
+                    token, rule = "##" + word[start:end], 's'
+                elif ("w" in allowed_next or "#" in allowed_next) and flags & WORD:
+                    if "#" in allowed_next:
+                        tokens.append("##")
+                    token, rule = word[start:end], 'w'
+                else:
+                    continue
+                break
+            if token is not None:
+                tokens.append(token)
+                allowed_next = allowed_next_rules[rule]
+                pos = end
+                continue
+            # nothing can follow the previous token, a new compound part starts at this position
+            if tokens and not tokens[-1].endswith("##"):
+                tokens.append("##")
+            if allowed_next != ("p", "w"):
+                allowed_next = ("p", "w")
+                continue
+            # no prefix or word starts here, the characters up to the next one are unknown
+            pos += 1
+            while pos < word_len and not any(flags & WORD or (flags & PREFIX and end < word_len)
+                                             for _, end, flags in trie.matches_from(word, pos, window)):
+                pos += 1
+            tokens.append(unk_token)
+        return tokens
+
+    def segment_words(self, words: Iterable[str], vocab_split, unk_token="[UNK]", max_chars=100,
+                      allow_compounds=True) -> List[List[str]]:
+        """Tokenize many words bidirectional at once with the `BatchSegmenter` of the inventory.
+            The tokens of every word equal those of `tokenize_word_bidirectional`.
+
+            Args:
+                words(`Iterable[str]`):
+                    Words that should be tokenized, the distinct words are grouped by length and segmented together.
+                vocab_split(`MorphemeInventory` or `Dict[str, List[str]]`):
+                    Inventory (or dictionary) that consists of the prefixes, suffixes and words.
+                unk_token(`str`, *optional*, defaults to `"[UNK]"`):
+                    The unknown token.
+                max_chars(`int`, *optional*, defaults to `100`):
+                    The maximum length of a word, that can be tokenized.
+                allow_compounds(`bool`, *optional*, defaults to `True`):
+                    Whether or not allow compounds in the tokenization process.
+            Returns:
+                `List[List[str]]`:
+                    List of tokens for every word, in the order of the input.
+        """
+        vocab_split = self._inventory(vocab_split)
+        words = list(words)
+        segments = vocab_split.segmenter.segment(words, allow_compounds, unk_token, max_chars)
+        for i, word in enumerate(words):
+            # words with an ambiguous hash and long words of the bounded-cost mode are left to the trie
+            if segments[i] is None or (self.segment_long_words and len(word) > max_chars):
+                segments[i] = self.tokenize_word_bidirectional(word, vocab_split, unk_token, max_chars,
+                                                               allow_compounds)
+        return segments
 
     def tokenize_word_lookup(self, word: str, vocab: Vocab, lookup: dict, unk_token, max_chars, allow_compounds=True) -> List[str]:
         """Tokenize a single using the lookup, if possible. 
@@ -284,9 +540,9 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
                     List of tokens of the word
 
         """
-        vocab_split = vocab.vocab_split
+        vocab_split = vocab.inventory
         # check if it is in raw vocabulary
-        vocabulary = vocab.vocabulary
+        vocabulary = vocab_split.vocabulary
 
         if word == "":
             return 0
@@ -294,17 +550,91 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
         if word in vocabulary:
             return [word]
         token_list: list
-        if word in lookup.keys():
+        if lookup is self.lookup:
+            # the breakdowns of the own lookup are only split once
+            breakdown = self.compiled_lookup.tokens(word)
+            if breakdown is not None:
+                return list(breakdown)
+        elif word in lookup.keys():
             breakdown: str = lookup[word]
-            token_list = breakdown.split(" ")
-        else:
-            token_list = self.tokenize_word_bidirectional(word, vocab_split, unk_token, max_chars, allow_compounds)
+            return breakdown.split(" ")
+        token_list = self.tokenize_word_bidirectional(word, vocab_split, unk_token, max_chars, allow_compounds)
         return token_list
 
+    @property
+    def compiled_lookup(self) -> CompiledLookup:
+        """The lookup of this tokenizer as tuples of tokens and IDs, rebuilt if the lookup, the vocabulary or the
+            unknown token have changed (breakdowns changed in place are only seen after `clear_cache`)."""
+        compiled = self._compiled_lookup
+        token_to_id = self.vocab.token_to_id
+        unk_id = token_to_id.get(self.unk_token)
+        if (compiled is None or compiled.lookup is not self.lookup or compiled.token_to_id is not token_to_id
+                or compiled.unk_id != unk_id):
+            compiled = self._compiled_lookup = CompiledLookup(self.lookup, token_to_id, unk_id)
+        return compiled
+
+    def _word_cache_key(self, word: str, unk_token, max_chars, allow_compounds=True) -> tuple:
+        """Key of a word in the word cache, with every setting that changes its segmentation."""
+        return word, max_chars, unk_token, allow_compounds, self.segment_long_words
+
+    def _tokenize_word_cached(self, word: str, vocab: Vocab, lookup: dict, unk_token, max_chars,
+                              allow_compounds=True) -> Tuple[str, ...]:
+        """Tokenize a single word with `tokenize_word_lookup`, serving repeated words from the word cache.
+
+            The tokens are the tuple held by the cache, so callers can not change the cached tokenization.
+        """
+        key = self._word_cache_key(word, unk_token, max_chars, allow_compounds)
+        tokens = self.word_cache.get(key)
+        if tokens is None:
+            tokens = tuple(self.tokenize_word_lookup(word, vocab, lookup, unk_token, max_chars, allow_compounds))
+            self.word_cache.put(key, tokens)
+        return tokens
+
     def __space_tokenizer(self, words: str):
         return re.findall(r"[\w']+|[.,!?;-]", words)
 
-    def tokenize(self, text: str, vocab: Vocab, lookup, unk_token="[UNK]", max_chars=100) -> List[str]:
+    def _get_basic_tokenizer(self) -> Union[BasicTokenizer, RegexPreTokenizer]:
+        """Returns the basic tokenizer of this object, it is only rebuilt if the special tokens have changed."""
+        special_tokens = (self.unk_token, self.sep_token, self.pad_token, self.cls_token, self.mask_token)
+        if special_tokens != self._basic_tokenizer_special_tokens:
+            pre_tokenizer_class = RegexPreTokenizer if self.pre_tokenizer == "regex" else BasicTokenizer
+            self.basic_tokenizer = pre_tokenizer_class(do_lower_case=self.do_lower_case,
+                                                       never_split=list(special_tokens) + self.never_split,
+                                                       strip_accents=self.strip_accents)
+            self._basic_tokenizer_special_tokens = special_tokens
+        return self.basic_tokenizer
+
+    def pre_tokenize(self, text: str) -> List[str]:
+        """Splits a text into the words, that are tokenized by `tokenize`."""
+        return self._get_basic_tokenizer().tokenize(text)
+
+    def pre_tokenize_with_offsets(self, text: str) -> Tuple[List[str], List[int], List[int]]:
+        """Splits a text into the words of `pre_tokenize` with the start and the end of every word in the text."""
+        basic_tokenizer = self._get_basic_tokenizer()
+        return tokenize_with_offsets(text, self.do_lower_case, basic_tokenizer.never_split,
+                                     basic_tokenizer.tokenize_chinese_chars, self.strip_accents)
+
+    @staticmethod
+    def _align(tokens: List[List[str]], word_starts: List[int], word_ends: List[int]) -> Alignment:
+        """Aligns the tokens of every word with the index and the character span of the word."""
+        word_ids = []
+        starts = []
+        ends = []
+        for i, (word_tokens, start, end) in enumerate(zip(tokens, word_starts, word_ends)):
+            num_tokens = len(word_tokens)
+            if num_tokens == 1:
+                word_ids.append(i)
+                starts.append(start)
+                ends.append(end)
+            else:
+                word_ids.extend([i] * num_tokens)
+                starts.extend([start] * num_tokens)
+                ends.extend([end] * num_tokens)
+        return Alignment([token for word_tokens in tokens for token in word_tokens], array("i", word_ids),
+                         array("i", starts), array("i", ends))
+
+    def tokenize(self, text: str, vocab: Optional[Vocab] = None, lookup=None, unk_token: Optional[str] = None,
+                 max_chars=MAX_CHARS, return_alignment: bool = False) -> Union[List[str], Alignment]:
         """Default tokenization function. 
 
             Uses a basic tokenizer to split the text at whitespaces and punctuation. 
@@ -313,52 +643,281 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
             Args:
                 text(`str`):
                     Text that should be tokenized.
-                vocab(`Vocab`):
-                    Vocab object, that consists of the vocabulary and the splitted vocabulary
-                lookup('Dict[str, List[str]]'):
-                    A dictionary that catches all specified special cases.
-                unk_token(`str`):
+                vocab(`Vocab`, *optional*):
+                    Vocab object, that consists of the vocabulary and the splitted vocabulary, the vocab of this
+                    tokenizer if not set.
+                lookup('Dict[str, List[str]]', *optional*):
+                    A dictionary that catches all specified special cases, the lookup of this tokenizer if not set.
+                unk_token(`str`, *optional*):
                     The unknown token. A token that is not in the vocabulary cannot be converted to an ID and is set to be this
-                    token instead.  
-                max_chars(`int`):
+                    token instead. The unknown token of this tokenizer if not set.
+                max_chars(`int`, *optional*, defaults to `100`):
                     The maximum length of a word, that can be tokenized. 
-                allow_compounds(`bool`, *optional*, defaults to `True`):
-                    Whether or not allow compounds in the tokenization process.
+                return_alignment(`bool`, *optional*, defaults to `False`):
+                    Whether to return the index of the word and the character span of the word for every token.
             Returns: 
-                `List[str]`: 
-                    List of tokens of the word
+                `List[str]` or `Alignment`:
+                    List of tokens of the text, or an `Alignment` of the tokens with the parallel int arrays
+                    `word_ids`, `starts` and `ends`.
 
         """
+        if vocab is None:
+            vocab = self.vocab
+        if lookup is None:
+            lookup = self.lookup
+        if unk_token is None:
+            unk_token = self.unk_token
+        if self.profile is not None:
+            return self._tokenize_profiled(text, vocab, lookup, unk_token, max_chars, return_alignment)
         is_cased = vocab.is_cased
         #if is_cased:
         #    text = text.lower()
 
         #word_list = self.__space_tokenizer(text)
-        basic_tokenizer= BasicTokenizer(never_split=[self.unk_token, self.sep_token, self.pad_token, self.cls_token,self.mask_token])
-        word_list=basic_tokenizer.tokenize(text)
-        tokens = [self.tokenize_word_lookup(word, vocab, lookup, unk_token, max_chars) for word in word_list]
+        if return_alignment:
+            word_list, word_starts, word_ends = self.pre_tokenize_with_offsets(text)
+        else:
+            word_list = self.pre_tokenize(text)
+        # the cache only holds tokenizations based on the vocabulary and lookup of this tokenizer
+        if self.word_cache is not None and vocab is self.vocab and lookup is self.lookup:
+            tokens = [self._tokenize_word_cached(word, vocab, lookup, unk_token, max_chars) for word in word_list]
+        else:
+            tokens = [self.tokenize_word_lookup(word, vocab, lookup, unk_token, max_chars) for word in word_list]
+        if return_alignment:
+            return self._align(tokens, word_starts, word_ends)
         # flatten the list
         if tokens == [] or isinstance(tokens[0], str):
             return tokens
         return [token for tokens_word in tokens for token in tokens_word]
 
+    def _tokenize(self, text: str, **kwargs) -> List[str]:
+        """Tokenizes a text with the vocabulary and lookup of this tokenizer, used by `PreTrainedTokenizer`."""
+        return self.tokenize(text)
+
+    def _tokenize_profiled(self, text: str, vocab: Vocab, lookup, unk_token, max_chars,
+                           return_alignment: bool) -> Union[List[str], Alignment]:
+        """`tokenize` with the timers and counters of the profile, the tokens are the same."""
+        profile = self.profile
+        start = perf_counter()
+        if return_alignment:
+            word_list, word_starts, word_ends = self.pre_tokenize_with_offsets(text)
+        else:
+            word_list = self.pre_tokenize(text)
+        profile.add_time("pre_tokenize", perf_counter() - start)
+        profile.count("texts")
+        profile.count("words", len(word_list))
+        word_cache = self.word_cache if vocab is self.vocab and lookup is self.lookup else None
+        vocabulary = vocab.inventory.vocabulary
+        tokens = []
+        for word in word_list:
+            start = perf_counter()
+            key = self._word_cache_key(word, unk_token, max_chars)
+            word_tokens = word_cache.get(key) if word_cache is not None else None
+            if word_tokens is not None:
+                profile.count("cache_hits")
+            elif word in vocabulary:
+                word_tokens = [word]
+                profile.count("vocab_hits")
+            elif word in lookup:
+                word_tokens = lookup[word].split(" ")
+                profile.count("lookup_hits")
+            if word_tokens is not None:
+                profile.add_time("lookup", perf_counter() - start)
+            else:
+                word_tokens = self.tokenize_word_bidirectional(word, vocab.inventory, unk_token, max_chars)
+                seconds = perf_counter() - start
+                profile.add_time("segmentation", seconds)
+                profile.count("segmented_words")
+                profile.observe_segmentation(len(word), seconds)
+            if word_cache is not None and key not in word_cache:
+                word_cache.put(key, tuple(word_tokens))
+            if unk_token in word_tokens:
+                profile.count("unks")
+            tokens.append(word_tokens)
+        if return_alignment:
+            return self._align(tokens, word_starts, word_ends)
+        return [token for word_tokens in tokens for token in word_tokens]
+
+    def enable_profiling(self) -> TokenizerProfile:
+        """Starts recording timers, counters and latency histograms of the tokenization.
+
+            `tokenize` then runs a separate, instrumented path. Without a profile the only overhead is one check per
+            call of `tokenize` and `convert_tokens_to_ids`.
+
+            Returns:
+                `TokenizerProfile`:
+                    The profile, that is updated by the following calls. An enabled profile is kept.
+        """
+        if self.profile is None:
+            self.profile = TokenizerProfile()
+        return self.profile
+
+    def disable_profiling(self) -> Optional[TokenizerProfile]:
+        """Stops the profiling and returns the recorded profile."""
+        profile, self.profile = self.profile, None
+        return profile
+
+    def worker_pool(self, num_workers: Optional[int] = None) -> Pool:
+        """Starts a pool of worker processes, that hold this tokenizer, to be reused by `tokenize_batch`."""
+        return Pool(num_workers, initializer=_init_worker, initargs=(self,))
+
+    def tokenize_batch(self, texts: Iterable[str], num_workers: Optional[int] = None, chunksize: Optional[int] = None,
+                       unk_token: Optional[str] = None, max_chars=MAX_CHARS, pool: Optional[Pool] = None,
+                       return_alignment: bool = False) -> List[Union[List[str], Alignment]]:
+        """Tokenizes many texts, in parallel if more than one worker is used.
+
+            The tokenizer (with its vocabulary and lookup) is passed to every worker process once through the pool
+            initializer, on platforms that fork it is inherited without pickling.
+
+            Args:
+                texts(`Iterable[str]`):
+                    Texts that should be tokenized.
+                num_workers(`int`, *optional*, defaults to the number of CPUs):
+                    Number of worker processes. The texts are tokenized in this process, if it is `1` or less.
+                chunksize(`int`, *optional*):
+                    Number of texts sent to a worker at once, chosen by `Pool.map` if not set.
+                unk_token(`str`, *optional*):
+                    The unknown token, the unknown token of this tokenizer if not set.
+                max_chars(`int`, *optional*, defaults to `100`):
+                    The maximum length of a word, that can be tokenized.
+                pool(`Pool`, *optional*):
+                    Pool created by `worker_pool`, that is used instead of starting new worker processes.
+                return_alignment(`bool`, *optional*, defaults to `False`):
+                    Whether to return an `Alignment` for every text, see `tokenize`.
+            Returns:
+                `List[List[str]]` or `List[Alignment]`:
+                    List of tokens (or alignments) for every text, in the order of the input.
+        """
+        if unk_token is None:
+            unk_token = self.unk_token
+        return self._map_workers(lambda text: self.tokenize(text, self.vocab, self.lookup, unk_token, max_chars,
+                                                            return_alignment),
+                                 partial(_worker_tokenize, unk_token=unk_token, max_chars=max_chars,
+                                         return_alignment=return_alignment), texts,
+                                 num_workers, chunksize, pool)
+
+    def tokenize_words(self, words: Iterable[str], num_workers: Optional[int] = None, chunksize: Optional[int] = None,
+                       unk_token: Optional[str] = None, max_chars=MAX_CHARS, pool: Optional[Pool] = None,
+                       vectorized: bool = False) -> List[List[str]]:
+        """Tokenizes many words, that are already split by the basic tokenizer, like `tokenize_batch`.
+
+            Args:
+                words(`Iterable[str]`):
+                    Words that should be tokenized, for example the distinct words of a corpus.
+                num_workers(`int`, *optional*, defaults to the number of CPUs):
+                    Number of worker processes. The words are tokenized in this process, if it is `1` or less.
+                chunksize(`int`, *optional*):
+                    Number of words sent to a worker at once, chosen by `Pool.map` if not set.
+                unk_token(`str`, *optional*):
+                    The unknown token, the unknown token of this tokenizer if not set.
+                max_chars(`int`, *optional*, defaults to `100`):
+                    The maximum length of a word, that can be tokenized.
+                pool(`Pool`, *optional*):
+                    Pool created by `worker_pool`, that is used instead of starting new worker processes.
+                vectorized(`bool`, *optional*, defaults to `False`):
+                    Whether to segment the words, that are neither in the vocabulary nor in the lookup, together with
+                    `segment_words` in this process instead, `num_workers` and `pool` are not used then. Faster for
+                    many distinct words, the tokens are the same.
+            Returns:
+                `List[List[str]]`:
+                    List of tokens for every word, in the order of the input.
+        """
+        if unk_token is None:
+            unk_token = self.unk_token
+        if vectorized:
+            return self._tokenize_words_vectorized(list(words), unk_token, max_chars)
+        if self.word_cache is not None:
+            # copies, so the caller can change the lists without changing the cache
+            def tokenize_word(*args):
+                return list(self._tokenize_word_cached(*args))
+        else:
+            tokenize_word = self.tokenize_word_lookup
+        return self._map_workers(lambda word: tokenize_word(word, self.vocab, self.lookup, unk_token, max_chars),
+                                 partial(_worker_tokenize_word, unk_token=unk_token, max_chars=max_chars), words,
+                                 num_workers, chunksize, pool)
+
+    def _tokenize_words_vectorized(self, words: List[str], unk_token, max_chars) -> List[List[str]]:
+        vocabulary, lookup = self.vocab.inventory.vocabulary, self.lookup
+        compiled = self.compiled_lookup
+        tokens: List[Optional[List[str]]] = [None] * len(words)
+        rest = []
+        for i, word in enumerate(words):
+            if word in vocabulary:
+                tokens[i] = [word]
+                continue
+            breakdown = compiled.tokens(word)
+            if breakdown is not None:
+                tokens[i] = list(breakdown)
+            elif word == "":
+                tokens[i] = self.tokenize_word_lookup(word, self.vocab, lookup, unk_token, max_chars)
+            else:
+                rest.append(i)
+        segments = self.segment_words([words[i] for i in rest], self.vocab.inventory, unk_token, max_chars)
+        for i, segment in zip(rest, segments):
+            tokens[i] = segment
+        return tokens
+
+    def pre_tokenize_batch(self, texts: Iterable[str], num_workers: Optional[int] = None,
+                           chunksize: Optional[int] = None, pool: Optional[Pool] = None) -> List[List[str]]:
+        """Splits many texts into words with `pre_tokenize`, in parallel like `tokenize_batch`."""
+        return self._map_workers(self.pre_tokenize, _worker_pre_tokenize, texts, num_workers, chunksize, pool)
+
+    def _map_workers(self, function, worker_function, items: Iterable, num_workers: Optional[int],
+                     chunksize: Optional[int], pool: Optional[Pool]) -> list:
+        """Applies `function` to all items in this process or `worker_function` in worker processes."""
+        items = list(items)
+        if pool is not None:
+            return pool.map(worker_function, items, chunksize)
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        num_workers = min(num_workers, len(items))
+        if num_workers <= 1:
+            return [function(item) for item in items]
+        with self.worker_pool(num_workers) as pool:
+            return pool.map(worker_function, items, chunksize)
+
+    def extend_lookup(self, breakdowns: Mapping[str, str]) -> None:
+        """Adds breakdowns of words, for example a breakdown index (see `breakdown_index.py`), to the lookup.
+
+            Words that are already in the lookup keep their breakdown. A read-only lookup (like a `MappedLookup`) is
+            chained with the new breakdowns instead of being changed. Pools created by `worker_pool` before hold the
+            old lookup. The cached tokenizations are cleared.
+
+            Args:
+                breakdowns(`Mapping[str, str]`):
+                    Space separated tokens of every word.
+        """
+        if isinstance(self.lookup, MutableMapping):
+            lookup = self.lookup
+            lookup.update((word, breakdown) for word, breakdown in breakdowns.items() if word not in lookup)
+        else:
+            self.lookup = ChainMap(self.lookup, breakdowns)
+        self.clear_cache()
+
+    def clear_cache(self) -> None:
+        """Clears the word cache and the compiled lookup, needed after the lookup was changed in place."""
+        if self.word_cache is not None:
+            self.word_cache.clear()
+        if self._compiled_lookup is not None:
+            self._compiled_lookup.clear()
+
     # methods for huggingface
 
     def get_added_vocab(self):
         """ Returns the vocabulary of the `Vocab` object from this object
             Returns: 
                 `Dict[str, int]`: 
-                    Dictionary of vocabularies with their correspondig ids.
+                    Dictionary of vocabularies with their correspondig ids, a copy that can be changed.
         """
-        vocab_dic = {}
-        vocab_tmp = self.vocab.vocabulary
-        for i in range(len(vocab_tmp)):
-            vocab_dic[vocab_tmp[i]] = i + 1
-        return vocab_dic
+        return dict(self.vocab.token_to_id)
 
     def _convert_token_to_id(self, token: str):
-        """ Returns the ID to a token"""
-        return self.vocab.vocabulary.index(token) + 1
+        """ Returns the ID to a token, unknown tokens are mapped to the ID of the unknown token"""
+        token_to_id = self.vocab.token_to_id
+        token_id = token_to_id.get(token)
+        if token_id is None:
+            return token_to_id.get(self.unk_token)
+        return token_id
 
     def convert_tokens_to_ids(self, tokens):
         """Returns all IDs to the provided tokens.
@@ -371,11 +930,18 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
         """
         if isinstance(tokens, str):
             return self._convert_token_to_id(tokens)
-        return [self._convert_token_to_id(token) for token in tokens]
+        token_to_id = self.vocab.token_to_id
+        unk_id = token_to_id.get(self.unk_token)
+        if self.profile is not None:
+            start = perf_counter()
+            ids = [token_to_id.get(token, unk_id) for token in tokens]
+            self.profile.add_time("id_conversion", perf_counter() - start)
+            return ids
+        return [token_to_id.get(token, unk_id) for token in tokens]
 
     def _convert_id_to_token(self, id):
         """ Returns the token to an ID"""
-        return self.vocab.vocabulary[id - 1]
+        return self.vocab.id_to_token[id - 1]
 
     def convert_ids_to_tokens(self, ids: list):
         """Returns all tokens to the provided IDs.
@@ -386,12 +952,16 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
                 `List[str]`:
                     List with all corresponding tokens from the IDs.
         """
-        return [self._convert_id_to_token(id) for id in ids]
+        id_to_token = self.vocab.id_to_token
+        return [id_to_token[id - 1] for id in ids]
 
     def convert_tokens_to_string(self, tokens: list)-> str:
         """Reconcatenates all tokens to a continuous text.
 
             Problems with irregular tokenization catched by the lookup.
+            Prefixes (`"x##"`) are joined with the next token, suffixes (`"##x"`) with the previous token and a compound
+            marker (`"##"`) joins the tokens around it. Markers without a neighbouring token are kept, `tokens` is not
+            changed.
             Args:
                 tokens(`List[str]`):
                     Tokens extracted by the tokenization process of this class.
@@ -399,32 +969,85 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
                 `str`:
                     Concatenated string of all tokens.
         """
-        concatenat_compounds = tokens
-        for token in concatenat_compounds:
-            if token == '##':
-                token_id = concatenat_compounds.index(token)
-                first = token_id - 1
-                second = token_id + 1
-                concatenat_compounds.remove(token)
-                concatenat_compounds[first:second] = ["".join(concatenat_compounds[first:second])]
-        out_string = " ".join(concatenat_compounds).replace(" ##", "").replace("## ", "").strip()
-        return out_string
-
-    def decode(self, ids: list) -> str:
+        pieces = []
+        # whether the next token is joined to the last piece without a space
+        join_next = False
+        last = len(tokens) - 1
+        for i, token in enumerate(tokens):
+            if token == "##":
+                if pieces and i < last:
+                    join_next = True
+                    continue
+                # a compound marker at the start or the end is kept as a word of its own
+                if pieces and not join_next:
+                    pieces.append(" ")
+                pieces.append(token)
+                join_next = False
+                continue
+            if pieces:
+                if token.startswith("##"):
+                    token = token[2:]
+                    join_next = True
+                if pieces[-1].endswith("##") and pieces[-1] != "##":
+                    pieces[-1] = pieces[-1][:-2]
+                    join_next = True
+                if not join_next:
+                    pieces.append(" ")
+            pieces.append(token)
+            join_next = False
+        return "".join(pieces).strip()
+
+    def _special_ids(self) -> List[int]:
+        token_to_id = self.vocab.token_to_id
+        return [token_to_id[token] for token in self.all_special_tokens if token in token_to_id]
+
+    def decode(self, ids: list, skip_special_tokens: bool = False, **kwargs) -> str:
         """ Constructs encoded list of IDs to a continous text.
             Args:
                 ids(`List[int]`):
                     IDs extracted by the encode functionality of this class.
+                skip_special_tokens(`bool`, *optional*, defaults to `False`):
+                    Whether or not to remove special tokens like padding from the text.
             Returns: 
                 `str`:
                     Concatenated string of all IDs.
         """
+        if skip_special_tokens:
+            special_ids = set(self._special_ids())
+            ids = [id for id in ids if id not in special_ids]
         return self.convert_tokens_to_string(self.convert_ids_to_tokens(ids))
 
+    def _token_array(self) -> np.ndarray:
+        """Tokens of the vocabulary as an object array, to map an array of IDs at once."""
+        if getattr(self, "_token_array_vocab", None) is not self.vocab:
+            self._token_array_cache = np.array(list(self.vocab.id_to_token), dtype=object)
+            self._token_array_vocab = self.vocab
+        return self._token_array_cache
+
     def batch_decode(self, sequences: Union[List[int], List[List[int]], "np.ndarray", "torch.Tensor", "tf.Tensor"],
                      skip_special_tokens: bool = False, clean_up_tokenization_spaces: bool = True, **kwargs) -> List[
         str]:
-        return [self.decode(sentence) for sentence in sequences]
+        """Decodes many sequences of IDs.
+
+            Arrays and tensors of shape `(batch_size, length)` are mapped to tokens at once, lists of sequences are
+            decoded one by one.
+            Args:
+                sequences(`List[List[int]]`, `np.ndarray`, `torch.Tensor` or `tf.Tensor`):
+                    Sequences of IDs, for example the `input_ids` of `batch_encode` or generated sequences.
+                skip_special_tokens(`bool`, *optional*, defaults to `False`):
+                    Whether or not to remove special tokens like padding from the texts.
+            Returns:
+                `List[str]`:
+                    Text of every sequence.
+        """
+        if isinstance(sequences, (list, tuple)):
+            return [self.decode(sequence, skip_special_tokens) for sequence in sequences]
+        ids = np.atleast_2d(np.asarray(sequences))
+        tokens = self._token_array()[ids - 1]
+        if not skip_special_tokens:
+            return [self.convert_tokens_to_string(row) for row in tokens.tolist()]
+        keep = ~np.isin(ids, self._special_ids())
+        return [self.convert_tokens_to_string(row[row_keep]) for row, row_keep in zip(tokens, keep)]
 
     def encode(self, text: str):
         """ 
@@ -437,5 +1060,241 @@ class MorphemepieceTokenizer(PreTrainedTokenizer):
                 `List[int]`:
                     Corresponding IDs to the tokens of the input text. 
         """
-        tokens = self.tokenize(text, self.vocab, self.lookup)
-        return self.convert_tokens_to_ids(tokens)
+        if self.profile is not None:
+            return self.convert_tokens_to_ids(self.tokenize(text, self.vocab, self.lookup))
+        return self._encode_words(self.pre_tokenize(text))
+
+    def _encode_words(self, words: Iterable[str]) -> List[int]:
+        """IDs of the tokens of the words, like `tokenize_word_lookup` and `convert_tokens_to_ids`.
+
+            The IDs of words in the lookup are taken from the compiled lookup, only the segmented words are mapped
+            token by token.
+        """
+        vocab = self.vocab
+        vocabulary, token_to_id = vocab.inventory.vocabulary, vocab.token_to_id
+        compiled = self.compiled_lookup
+        unk_id = compiled.unk_id
+        ids = []
+        for word in words:
+            if word in vocabulary:
+                ids.append(token_to_id.get(word, unk_id))
+                continue
+            word_ids = compiled.ids(word)
+            if word_ids is None:
+                if self.word_cache is not None:
+                    tokens = self._tokenize_word_cached(word, vocab, self.lookup, self.unk_token, self.MAX_CHARS)
+                else:
+                    tokens = self.tokenize_word_bidirectional(word, vocab.inventory, self.unk_token, self.MAX_CHARS)
+                word_ids = [token_to_id.get(token, unk_id) for token in tokens]
+            ids.extend(word_ids)
+        return ids
+
+    def batch_encode(self, texts: Iterable[str], max_length: Optional[int] = None,
+                     padding: Union[bool, str, PaddingStrategy] = True, truncation: bool = False,
+                     return_tensors: Optional[Union[str, TensorType]] = "np", num_workers: Optional[int] = 1,
+                     pool: Optional[Pool] = None, return_alignment: bool = False) -> BatchEncoding:
+        """Encodes many texts to padded arrays of IDs.
+
+            The tokens of all texts are mapped to IDs at once and scattered into the padded arrays, no list is built
+            per text. No special tokens are added, like in `__call__`.
+
+            Args:
+                texts(`Iterable[str]`):
+                    Texts that should be encoded.
+                max_length(`int`, *optional*):
+                    Maximum length of the sequences for truncation and for `padding="max_length"`.
+                padding(`bool`, `str` or `PaddingStrategy`, *optional*, defaults to `True`):
+                    `True` or `"longest"` pads to the longest sequence, `"max_length"` to `max_length`, `False` or
+                    `"do_not_pad"` returns sequences of different lengths (only if `return_tensors` is `None`).
+                truncation(`bool`, *optional*, defaults to `False`):
+                    Whether or not to cut the sequences to `max_length` tokens, on the `truncation_side` of the
+                    tokenizer.
+                return_tensors(`str` or `TensorType`, *optional*, defaults to `"np"`):
+                    `"np"` for NumPy arrays, `"pt"` for PyTorch tensors, `None` for lists.
+                num_workers(`int`, *optional*, defaults to `1`):
+                    Number of worker processes for the tokenization, see `tokenize_batch`.
+                pool(`Pool`, *optional*):
+                    Pool created by `worker_pool`, that is used for the tokenization.
+                return_alignment(`bool`, *optional*, defaults to `False`):
+                    Whether to add the index of the word of every token (`word_ids`, `-1` for padding) and the
+                    character span of the word (`offset_mapping`, `(0, 0)` for padding), see `tokenize`.
+            Returns:
+                `BatchEncoding`:
+                    `input_ids`, `attention_mask` and `token_type_ids`, as contiguous int32 arrays of shape
+                    `(len(texts), length)` if the sequences are padded.
+        """
+        padding_strategy = PaddingStrategy(padding) if isinstance(padding, str) else \
+            PaddingStrategy.LONGEST if padding else PaddingStrategy.DO_NOT_PAD
+        if (truncation or padding_strategy == PaddingStrategy.MAX_LENGTH) and max_length is None:
+            raise ValueError("max_length is needed for truncation and for padding to max_length")
+        tokens = self.tokenize_batch(texts, num_workers=num_workers, pool=pool, return_alignment=return_alignment)
+        alignments = tokens if return_alignment else None
+        if return_alignment:
+            tokens = [alignment.tokens for alignment in alignments]
+
+        token_to_id = self.vocab.token_to_id
+        unk_id = token_to_id.get(self.unk_token)
+        lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        total = int(lengths.sum())
+        start = perf_counter()
+        # flat values of all tokens with the value used for padding
+        flat = {"input_ids": (np.fromiter(map(token_to_id.get, chain.from_iterable(tokens), repeat(unk_id)),
+                                          dtype=np.int32, count=total), token_to_id.get(self.pad_token))}
+        if self.profile is not None:
+            self.profile.add_time("id_conversion", perf_counter() - start)
+        if return_alignment:
+            def flatten(field):
+                return np.fromiter(chain.from_iterable(getattr(alignment, field) for alignment in alignments),
+                                   dtype=np.int32, count=total)
+            flat["word_ids"] = (flatten("word_ids"), -1)
+            flat["offset_mapping"] = (np.stack([flatten("starts"), flatten("ends")], axis=1), 0)
+        if truncation:
+            # position of every token in its sequence, tokens behind max_length (or before the last max_length
+            # tokens) are dropped
+            starts = np.cumsum(lengths) - lengths
+            positions = np.arange(total) - np.repeat(starts, lengths)
+            if self.truncation_side == "left":
+                keep = positions >= np.repeat(lengths - max_length, lengths)
+            else:
+                keep = positions < max_length
+            flat = {key: (values[keep], pad_value) for key, (values, pad_value) in flat.items()}
+            lengths = np.minimum(lengths, max_length)
+
+        if padding_strategy == PaddingStrategy.DO_NOT_PAD:
+            if return_tensors is not None and len(lengths) and (lengths != lengths[0]).any():
+                raise ValueError("sequences of different lengths can only be returned as tensors with padding")
+            width = int(lengths[0]) if len(lengths) else 0
+        elif padding_strategy == PaddingStrategy.MAX_LENGTH:
+            width = max(max_length, int(lengths.max(initial=0)))
+        else:
+            width = int(lengths.max(initial=0))
+
+        if padding_strategy == PaddingStrategy.DO_NOT_PAD and return_tensors is None:
+            bounds = np.cumsum(lengths).tolist()
+            data = {}
+            for key, (values, _) in flat.items():
+                values = values.tolist()
+                data[key] = [values[end - length:end] for end, length in zip(bounds, lengths.tolist())]
+            data["token_type_ids"] = [[0] * len(sequence) for sequence in data["input_ids"]]
+            data["attention_mask"] = [[1] * len(sequence) for sequence in data["input_ids"]]
+            return BatchEncoding(data)
+
+        positions = np.arange(width)
+        if self.padding_side == "left":
+            attention_mask = positions >= (width - lengths)[:, None]
+        else:
+            attention_mask = positions < lengths[:, None]
+        data = {}
+        for key, (values, pad_value) in flat.items():
+            padded = np.full((len(lengths), width) + values.shape[1:], pad_value, dtype=np.int32)
+            # the mask selects the positions of the tokens in row-major order, the order of the flat values
+            padded[attention_mask] = values
+            data[key] = padded
+        data["token_type_ids"] = np.zeros((len(lengths), width), dtype=np.int32)
+        data["attention_mask"] = attention_mask.astype(np.int32)
+        if return_tensors is None:
+            return BatchEncoding({key: value.tolist() for key, value in data.items()})
+        return BatchEncoding(data, tensor_type=return_tensors)
+
+    def _batch_encode_plus(self, batch_text_or_text_pairs, add_special_tokens: bool = True,
+                           padding_strategy: PaddingStrategy = PaddingStrategy.DO_NOT_PAD,
+                           truncation_strategy: TruncationStrategy = TruncationStrategy.DO_NOT_TRUNCATE,
+                           max_length: Optional[int] = None, stride: int = 0, is_split_into_words: bool = False,
+                           pad_to_multiple_of: Optional[int] = None,
+                           return_tensors: Optional[Union[str, TensorType]] = None,
+                           return_token_type_ids: Optional[bool] = None, return_attention_mask: Optional[bool] = None,
+                           return_overflowing_tokens: bool = False, return_special_tokens_mask: bool = False,
+                           return_offsets_mapping: bool = False, return_length: bool = False, verbose: bool = True,
+                           **kwargs) -> BatchEncoding:
+        """Encodes a batch of texts for `__call__` and `batch_encode_plus` in one pass.
+
+            The texts are tokenized (with the `vocab` and `lookup` keyword arguments, or those of this tokenizer) and
+            mapped to IDs, the words of the own lookup directly with `compiled_lookup`. The sequences are truncated
+            (with the overflowing tokens) and padded with list operations, instead of `prepare_for_model` and `pad` per
+            text. No special tokens are added, like in `prepare_for_model`, so the results are those of
+            `PreTrainedTokenizer._batch_encode_plus`. Pairs of texts, pre-tokenized or encoded inputs and the truncation
+            of the second sequence are passed on to it.
+        """
+        texts = batch_text_or_text_pairs
+        if (kwargs.keys() - {"vocab", "lookup"} or is_split_into_words or return_offsets_mapping or not texts
+                or not all(isinstance(text, str) for text in texts)
+                or truncation_strategy not in (TruncationStrategy.DO_NOT_TRUNCATE, TruncationStrategy.LONGEST_FIRST,
+                                               TruncationStrategy.ONLY_FIRST)
+                or (max_length is None
+                    and (return_overflowing_tokens or padding_strategy == PaddingStrategy.MAX_LENGTH))
+                or (return_token_type_ids and not add_special_tokens)):
+            return super()._batch_encode_plus(
+                batch_text_or_text_pairs, add_special_tokens=add_special_tokens, padding_strategy=padding_strategy,
+                truncation_strategy=truncation_strategy, max_length=max_length, stride=stride,
+                is_split_into_words=is_split_into_words, pad_to_multiple_of=pad_to_multiple_of,
+                return_tensors=return_tensors, return_token_type_ids=return_token_type_ids,
+                return_attention_mask=return_attention_mask, return_overflowing_tokens=return_overflowing_tokens,
+                return_special_tokens_mask=return_special_tokens_mask, return_offsets_mapping=return_offsets_mapping,
+                return_length=return_length, verbose=verbose, **kwargs)
+        if return_token_type_ids is None:
+            return_token_type_ids = "token_type_ids" in self.model_input_names
+        if return_attention_mask is None:
+            return_attention_mask = "attention_mask" in self.model_input_names
+
+        vocab, lookup = kwargs.get("vocab"), kwargs.get("lookup")
+        if vocab is None:
+            vocab = self.vocab
+        if lookup is None:
+            lookup = self.lookup
+        if self.profile is None and vocab is self.vocab and lookup is self.lookup:
+            sequences = [self._encode_words(self.pre_tokenize(text)) for text in texts]
+        else:
+            tokens = [self.tokenize(text, vocab, lookup) for text in texts]
+            flat_ids = self.convert_tokens_to_ids(list(chain.from_iterable(tokens)))
+            sequences = []
+            end = 0
+            for text_tokens in tokens:
+                start, end = end, end + len(text_tokens)
+                sequences.append(flat_ids[start:end])
+
+        data = {}
+        lengths = [len(ids) for ids in sequences]
+        if truncation_strategy != TruncationStrategy.DO_NOT_TRUNCATE and max_length:
+            overflowing = []
+            left = self.truncation_side == "left"
+            for i, ids in enumerate(sequences):
+                remove = len(ids) - max_length
+                if remove <= 0:
+                    overflowing.append([])
+                    continue
+                # the overflowing tokens include `stride` tokens of the kept sequence
+                window = min(len(ids), stride + remove)
+                overflowing.append(ids[:window] if left else ids[-window:])
+                sequences[i] = ids[remove:] if left else ids[:-remove]
+        else:
+            overflowing = [[] for _ in sequences]
+        if return_overflowing_tokens:
+            data["overflowing_tokens"] = overflowing
+            data["num_truncated_tokens"] = [length - max_length for length in lengths]
+        lengths = [len(ids) for ids in sequences]
+        self._eventual_warn_about_too_long_sequence(sequences[lengths.index(max(lengths))], max_length, verbose)
+
+        data["input_ids"] = sequences
+        if return_token_type_ids:
+            data["token_type_ids"] = [[0] * length for length in lengths]
+        if return_special_tokens_mask:
+            data["special_tokens_mask"] = [[0] * length for length in lengths]
+        if return_length:
+            data["length"] = lengths
+        if return_attention_mask:
+            data["attention_mask"] = [[1] * length for length in lengths]
+
+        width = max(lengths) if padding_strategy == PaddingStrategy.LONGEST else max_length
+        if padding_strategy != PaddingStrategy.DO_NOT_PAD:
+            if pad_to_multiple_of is not None and width % pad_to_multiple_of != 0:
+                width = (width // pad_to_multiple_of + 1) * pad_to_multiple_of
+            pad_values = {"input_ids": self.pad_token_id, "token_type_ids": self.pad_token_type_id,
+                          "special_tokens_mask": 1, "attention_mask": 0}
+            for key, pad_value in pad_values.items():
+                if key not in data:
+                    continue
+                if self.padding_side == "left":
+                    data[key] = [[pad_value] * (width - len(values)) + values for values in data[key]]
+                else:
+                    data[key] = [values + [pad_value] * (width - len(values)) for values in data[key]]
+        return BatchEncoding(data, tensor_type=return_tensors)
@@ -0,0 +1,306 @@
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from tokenizers import NormalizedString, PreTokenizedString, Regex, Tokenizer, normalizers
+from tokenizers.decoders import Decoder, WordPiece as WordPieceDecoder
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import BertPreTokenizer, PreTokenizer, Sequence, WhitespaceSplit
+from tokenizers.processors import BertProcessing
+from transformers import PreTrainedTokenizerFast
+
+from base_tokenizer import BaseTokenizer
+from tokenizer import MorphemepieceTokenizer
+from vocab import Vocab
+from word_cache import WordCache
+
+# a span of a word, the text of the token is built from it by adding markers or by replacing the characters
+Piece = Tuple[int, int, str, str, Optional[str]]
+
+# punctuation of the basic tokenizer: all non-letter/number ASCII characters and the Unicode punctuation
+_PUNCTUATION = Regex(r"[\p{P}!-/:-@\[-`{-~]")
+
+
+def _surface(token: str) -> str:
+    """Text of a token without the markers of prefixes and suffixes."""
+    if token.startswith("##"):
+        token = token[2:]
+    if token.endswith("##"):
+        token = token[:-2]
+    return token
+
+
+def _token_pieces(word: str, tokens: List[str]) -> List[Piece]:
+    """Maps the tokens of a word to spans of the word.
+
+        Tokens, whose text is found at the current position, get its span. Other tokens (irregular breakdowns of the
+        lookup, the unknown token) get the characters up to the text of the next token, a compound marker gets the
+        character it is placed before.
+    """
+    pieces = []
+    length = len(word)
+    position = 0
+    for i, token in enumerate(tokens):
+        surface = _surface(token)
+        if surface and word.startswith(surface, position):
+            end = position + len(surface)
+            pieces.append((position, end, "##" if token.startswith("##") else "",
+                           "##" if token.endswith("##") else "", None))
+            position = end
+            continue
+        start = min(position, length - 1)
+        if not surface:
+            pieces.append((start, start + 1, "", "", token))
+            continue
+        following = [_surface(next_token) for next_token in tokens[i + 1:] if _surface(next_token)]
+        if not following:
+            end = length
+        else:
+            end = word.find(following[0], start + 1)
+            if end < 0:
+                end = start + 1
+        pieces.append((start, end, "", "", token))
+        position = end
+    return pieces
+
+
+def _replace(piece: NormalizedString, token: str) -> None:
+    """Replaces the text of `piece` by `token`, so the token is aligned with the first and the last character."""
+    size, length = len(piece.normalized), len(token)
+    if length >= size:
+        chars = iter(token[:size])
+        piece.map(lambda _: next(chars))
+        if length > size:
+            piece.append(token[size:])
+    else:
+        # the characters in between are dropped
+        chars = iter(token[:length - 1] + "\0" * (size - length) + token[-1])
+        piece.map(lambda _: next(chars))
+        piece.filter(lambda char: char != "\0")
+
+
+class MorphemeSplitter(object):
+    """Pre-tokenizer, that splits every whitespace token into words and the words into their morphemes with a
+        `MorphemepieceTokenizer`.
+
+        Like the basic tokenizer, tokens of `never_split` (the special tokens) are kept, other tokens are lowercased
+        and stripped of accents as a whole (so a final sigma stays final) and split at punctuation. The morphemes
+        become the pre-tokens, that are mapped to IDs by the `WordLevel` model. Words in the vocabulary are passed on
+        unchanged, the pieces of other words are cached.
+
+        Args:
+            tokenizer(`MorphemepieceTokenizer`):
+                Tokenizer with the vocabulary and lookup used for the segmentation.
+            max_chars(`int`, *optional*, defaults to `100`):
+                The maximum length of a word, that can be tokenized.
+            cache_size(`int`, *optional*, defaults to `100000`):
+                Maximum number of words, whose pieces are cached.
+    """
+
+    def __init__(self, tokenizer: MorphemepieceTokenizer, max_chars: int = 100, cache_size: int = 100000) -> None:
+        self.tokenizer = tokenizer
+        self.max_chars = max_chars
+        self.cache = WordCache(cache_size)
+        self._vocabulary = tokenizer.vocab.inventory.vocabulary
+        basic_tokenizer = tokenizer._get_basic_tokenizer()
+        self.never_split = set(basic_tokenizer.never_split)
+        self.do_lower_case = tokenizer.do_lower_case
+        self.strip_accents = bool(tokenizer.strip_accents
+                                  or (tokenizer.do_lower_case and tokenizer.strip_accents is not False))
+
+    def pieces(self, word: str) -> List[Piece]:
+        pieces = self.cache.get(word)
+        if pieces is None:
+            tokenizer = self.tokenizer
+            tokens = tokenizer.tokenize_word_lookup(word, tokenizer.vocab, tokenizer.lookup, tokenizer.unk_token,
+                                                    self.max_chars)
+            pieces = _token_pieces(word, tokens)
+            self.cache.put(word, pieces)
+        return pieces
+
+    def _normalize(self, token: str) -> str:
+        if self.do_lower_case:
+            token = token.lower()
+        if self.strip_accents:
+            token = "".join(char for char in unicodedata.normalize("NFD", token) if unicodedata.category(char) != "Mn")
+        return token
+
+    def split(self, i: int, normalized: NormalizedString) -> List[NormalizedString]:
+        token = normalized.normalized
+        if token in self.never_split:
+            return [normalized]
+        target = token.lower() if self.do_lower_case and token.isascii() else self._normalize(token)
+        if not target:
+            return []
+        if target != token:
+            _replace(normalized, target)
+            # a token of never_split is kept after the normalization as well
+            if target in self.never_split:
+                return [normalized]
+        if target.isascii() and target.isalnum():
+            return self.split_word(normalized)
+        splits = []
+        for word in normalized.split(_PUNCTUATION, "isolated"):
+            if word.normalized:
+                splits.extend(self.split_word(word))
+        return splits
+
+    def split_word(self, normalized: NormalizedString) -> List[NormalizedString]:
+        word = normalized.normalized
+        if word in self._vocabulary:
+            return [normalized]
+        splits = []
+        for start, end, before, after, replacement in self.pieces(word):
+            piece = normalized[start:end]
+            if replacement is not None:
+                _replace(piece, replacement)
+            else:
+                if before:
+                    piece.prepend(before)
+                if after:
+                    piece.append(after)
+            splits.append(piece)
+        return splits
+
+    def pre_tokenize(self, pretok: PreTokenizedString) -> None:
+        pretok.split(self.split)
+
+
+class MorphemeDecoder(object):
+    """Decoder, that joins the tokens like `MorphemepieceTokenizer.convert_tokens_to_string`."""
+
+    def __init__(self, tokenizer: MorphemepieceTokenizer) -> None:
+        self.tokenizer = tokenizer
+
+    def decode_chain(self, tokens: List[str]) -> List[str]:
+        return [self.tokenizer.convert_tokens_to_string(tokens)]
+
+
+class MorphemepieceTokenizerFast(BaseTokenizer):
+    """Morphemepiece tokenizer on the runtime of the `tokenizers` library.
+
+        The text is normalized (NFC and cleaning like the basic tokenizer) and split at whitespace by the native
+        components, then a `MorphemeSplitter` lowercases, strips and splits every whitespace token into words and
+        the words into their morphemes, that are mapped to the (1-based) IDs of the vocabulary by a `WordLevel`
+        model. Padding, truncation, offsets and `encode_batch` are those of the runtime. `[CLS]` and `[SEP]` are added
+        by the post-processor, without them (`add_special_tokens=False`) the IDs are those of
+        `MorphemepieceTokenizer.encode`. Like in the basic tokenizer, special tokens in the text are only kept if
+        they are separated by whitespace, they are not added tokens of the runtime.
+
+        Every whitespace token is split in Python, so `encode_batch` holds the GIL and is not faster than
+        `MorphemepieceTokenizer.encode` (with the regex pre-tokenizer it is slower). Every morpheme is a pre-token, so
+        `Encoding.word_ids` counts morphemes, the offsets of a morpheme are its characters in the text.
+
+        Args:
+            vocab(`Vocab`, *optional*):
+                Vocab object, the bundled vocabulary is used if neither `vocab` nor `lookup` is set.
+            lookup(`Dict[str, str]`, *optional*):
+                Lookup for the tokenization process.
+            do_lower_case(`bool`, *optional*, defaults to `True`):
+                Whether or not to lowercase the input when tokenizing.
+            strip_accents(`bool`, *optional*):
+                Whether or not to strip all accents, determined by `do_lower_case` if not set.
+            tokenize_chinese_chars(`bool`, *optional*, defaults to `True`):
+                Whether or not to split Chinese characters, the basic tokenizer of `MorphemepieceTokenizer` does.
+            max_chars(`int`, *optional*, defaults to `100`):
+                The maximum length of a word, that can be tokenized.
+            cache_size(`int`, *optional*, defaults to `100000`):
+                Maximum number of words, whose segmentation is cached.
+            tokenizer(`MorphemepieceTokenizer`, *optional*):
+                Tokenizer used for the segmentation, instead of creating one from `vocab` and `lookup`.
+    """
+
+    def __init__(self, vocab: Optional[Vocab] = None, lookup: Optional[Dict[str, str]] = None,
+                 do_lower_case: bool = True, strip_accents: Optional[bool] = None,
+                 tokenize_chinese_chars: bool = True, unk_token: str = "[UNK]", sep_token: str = "[SEP]",
+                 cls_token: str = "[CLS]", pad_token: str = "[PAD]", mask_token: str = "[MASK]", max_chars: int = 100,
+                 cache_size: int = 100000, tokenizer: Optional[MorphemepieceTokenizer] = None) -> None:
+        if tokenizer is None:
+            tokenizer = MorphemepieceTokenizer(vocab, lookup, do_lower_case=do_lower_case, unk_token=unk_token,
+                                               sep_token=sep_token, pad_token=pad_token, cls_token=cls_token,
+                                               mask_token=mask_token, strip_accents=strip_accents)
+        self.morphemepiece = tokenizer
+        self.special_tokens = {"unk_token": unk_token, "sep_token": sep_token, "cls_token": cls_token,
+                               "pad_token": pad_token, "mask_token": mask_token}
+
+        # vocabularies read by pandas without `keep_default_na=False` contain NaN instead of some tokens
+        token_to_id = {token: token_id for token, token_id in tokenizer.vocab.token_to_id.items()
+                       if isinstance(token, str)}
+        native = Tokenizer(WordLevel(token_to_id, unk_token=unk_token))
+        self._special_ids = {native.token_to_id(token) for token in self.special_tokens.values()} - {None}
+        # `BertNormalizer` lowercases character by character and is only the serializable placeholder, the splitter
+        # lowercases and strips whole tokens like the basic tokenizer
+        native.normalizer = self._placeholder_normalizer = normalizers.Sequence([
+            normalizers.NFC(),
+            normalizers.BertNormalizer(clean_text=True, handle_chinese_chars=tokenize_chinese_chars,
+                                       strip_accents=strip_accents, lowercase=do_lower_case)])
+        self._normalizer = normalizers.Sequence([
+            normalizers.NFC(),
+            normalizers.BertNormalizer(clean_text=True, handle_chinese_chars=tokenize_chinese_chars,
+                                       strip_accents=False, lowercase=False)])
+        native.pre_tokenizer = BertPreTokenizer()
+        native.decoder = WordPieceDecoder()
+        sep_id, cls_id = native.token_to_id(sep_token), native.token_to_id(cls_token)
+        if sep_id is not None and cls_id is not None:
+            native.post_processor = BertProcessing((sep_token, sep_id), (cls_token, cls_id))
+
+        parameters = {"model": "Morphemepiece", "do_lower_case": do_lower_case, "strip_accents": strip_accents,
+                      "tokenize_chinese_chars": tokenize_chinese_chars, "max_chars": max_chars}
+        super().__init__(native, parameters)
+        self.splitter = MorphemeSplitter(tokenizer, max_chars, cache_size)
+        self._attach(self._tokenizer)
+
+    def _attach(self, native: Tokenizer) -> None:
+        """Replaces the serializable placeholders by the normalizer, morpheme splitter and decoder."""
+        native.normalizer = self._normalizer
+        native.pre_tokenizer = Sequence([WhitespaceSplit(), PreTokenizer.custom(self.splitter)])
+        native.decoder = Decoder.custom(MorphemeDecoder(self.morphemepiece))
+
+    def decode(self, ids: List[int], skip_special_tokens: Optional[bool] = True) -> str:
+        """Decode the given list of ids to a string sequence, see `BaseTokenizer.decode`."""
+        if skip_special_tokens:
+            ids = [token_id for token_id in ids if token_id not in self._special_ids]
+        return super().decode(ids, skip_special_tokens)
+
+    def decode_batch(self, sequences: List[List[int]], skip_special_tokens: Optional[bool] = True) -> List[str]:
+        """Decode the list of sequences to a list of string sequences, see `BaseTokenizer.decode_batch`."""
+        if skip_special_tokens:
+            sequences = [[token_id for token_id in ids if token_id not in self._special_ids] for ids in sequences]
+        return super().decode_batch(sequences, skip_special_tokens)
+
+    def enable_padding(self, direction: Optional[str] = "right", pad_to_multiple_of: Optional[int] = None,
+                       pad_id: Optional[int] = None, pad_type_id: Optional[int] = 0, pad_token: Optional[str] = None,
+                       length: Optional[int] = None):
+        """Change the padding strategy, see `BaseTokenizer.enable_padding`. Pads with the padding token by default."""
+        pad_token = pad_token if pad_token is not None else self.special_tokens["pad_token"]
+        pad_id = pad_id if pad_id is not None else self._tokenizer.token_to_id(pad_token)
+        return super().enable_padding(direction, pad_to_multiple_of, pad_id, pad_type_id, pad_token, length)
+
+    def to_pretrained_fast(self, **kwargs) -> PreTrainedTokenizerFast:
+        """Wraps the tokenizer as a `PreTrainedTokenizerFast` of the transformers library.
+
+            The morpheme splitter and decoder can not be serialized by the `tokenizers` library, so they are attached
+            after the wrapper has copied the pipeline. Files written by `save_pretrained` contain the BERT normalizer
+            and pre-tokenizer instead and load a tokenizer without the morpheme segmentation. The special tokens are
+            added tokens of the wrapper, like in other tokenizers of transformers, so they are found anywhere in the
+            text and removed by `skip_special_tokens`.
+
+            Args:
+                kwargs:
+                    Further arguments of `PreTrainedTokenizerFast`, for example `model_max_length`.
+            Returns:
+                `PreTrainedTokenizerFast`:
+                    Tokenizer with the same pipeline, that shares the segmentation (and its cache) with this one.
+        """
+        native = self._tokenizer
+        normalizer, pre_tokenizer, decoder = native.normalizer, native.pre_tokenizer, native.decoder
+        native.normalizer = self._placeholder_normalizer
+        native.pre_tokenizer = BertPreTokenizer()
+        native.decoder = WordPieceDecoder()
+        try:
+            fast = PreTrainedTokenizerFast(tokenizer_object=native, **self.special_tokens, **kwargs)
+        finally:
+            native.normalizer, native.pre_tokenizer, native.decoder = normalizer, pre_tokenizer, decoder
+        fast._tokenizer.add_special_tokens([token for token in self.special_tokens.values()
+                                            if fast._tokenizer.token_to_id(token) is not None])
+        self._attach(fast._tokenizer)
+        return fast
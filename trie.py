@@ -0,0 +1,87 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# flags of the morpheme classes, a node can belong to several classes
+PREFIX = 1
+WORD = 2
+SUFFIX = 4
+
+# key of the class flags in a node, it can not collide with a character
+_FLAGS = ""
+
+
+class MorphemeTrie(object):
+    """Character trie over the prefixes, words and suffixes of a vocabulary.
+
+        Every node is a dictionary mapping the next character to the child node, the flags of the morpheme classes
+        ending in a node are stored under the empty string. A single walk from one position of a word yields all
+        morphemes starting (or, for a reversed trie, ending) there, without slicing any substrings.
+
+        Args:
+            prefixes(`Iterable[str]`):
+                Prefixes of the vocabulary.
+            words(`Iterable[str]`):
+                Complete words of the vocabulary.
+            suffixes(`Iterable[str]`):
+                Suffixes of the vocabulary.
+            reverse(`bool`, *optional*, defaults to `False`):
+                Whether the morphemes are inserted back to front, to search from the end of a word.
+    """
+
+    def __init__(self, prefixes: Iterable[str], words: Iterable[str], suffixes: Iterable[str],
+                 reverse: bool = False) -> None:
+        self.reverse = reverse
+        self.root: Dict = {}
+        for flag, morphemes in ((PREFIX, prefixes), (WORD, words), (SUFFIX, suffixes)):
+            for morpheme in morphemes:
+                # skip missing values of the vocabulary files
+                if not isinstance(morpheme, str) or morpheme == "":
+                    continue
+                self._insert(morpheme[::-1] if reverse else morpheme, flag)
+
+    def _insert(self, key: str, flag: int) -> None:
+        node = self.root
+        for char in key:
+            child = node.get(char)
+            if child is None:
+                child = node[char] = {}
+            node = child
+        node[_FLAGS] = node.get(_FLAGS, 0) | flag
+
+    def matches_from(self, word: str, start: int, limit: Optional[int] = None) -> List[Tuple[int, int, int]]:
+        """Returns all morphemes of `word` starting at `start`, at most `limit` characters long if it is set.
+
+            Returns:
+                `List[Tuple[int, int, int]]`:
+                    Start position, (exclusive) end position and class flags of the matches, ordered from the shortest
+                    match to the longest match.
+        """
+        matches = []
+        node = self.root
+        stop = len(word) if limit is None else min(len(word), start + limit)
+        for end in range(start, stop):
+            node = node.get(word[end])
+            if node is None:
+                break
+            flags = node.get(_FLAGS)
+            if flags:
+                matches.append((start, end + 1, flags))
+        return matches
+
+    def matches_until(self, word: str, end: int) -> List[Tuple[int, int, int]]:
+        """Returns all morphemes of `word` ending at (exclusive) `end`, the trie has to be reversed.
+
+            Returns:
+                `List[Tuple[int, int, int]]`:
+                    Start position, (exclusive) end position and class flags of the matches, ordered from the shortest
+                    match to the longest match.
+        """
+        matches = []
+        node = self.root
+        for start in range(end - 1, -1, -1):
+            node = node.get(word[start])
+            if node is None:
+                break
+            flags = node.get(_FLAGS)
+            if flags:
+                matches.append((start, end, flags))
+        return matches
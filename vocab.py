@@ -1,13 +1,88 @@
-from typing import List
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+from trie import MorphemeTrie
+from batch_segmentation import BatchSegmenter
+
+
+class MorphemeInventory(object):
+    """Frozen, hash-indexed morpheme inventory of a `Vocab`.
+
+        Holds the prefixes, words and suffixes of the vocabulary split as well as the full vocabulary as frozensets,
+        so that every membership test during tokenization is O(1) instead of a scan over a list.
+        Supports item access (`inventory['prefixes']`), so it can be used wherever a vocab_split dictionary is expected.
+        The forward and reversed `MorphemeTrie` used by the greedy search and the `BatchSegmenter` are built on first
+        use.
+    """
+    __slots__ = ("prefixes", "words", "suffixes", "vocabulary", "_trie", "_reversed_trie", "_segmenter")
+
+    def __init__(self, prefixes: Iterable[str], words: Iterable[str], suffixes: Iterable[str],
+                 vocabulary: Iterable[str]) -> None:
+        object.__setattr__(self, "prefixes", frozenset(prefixes))
+        object.__setattr__(self, "words", frozenset(words))
+        object.__setattr__(self, "suffixes", frozenset(suffixes))
+        object.__setattr__(self, "vocabulary", frozenset(vocabulary))
+        object.__setattr__(self, "_trie", None)
+        object.__setattr__(self, "_reversed_trie", None)
+        object.__setattr__(self, "_segmenter", None)
+
+    @classmethod
+    def from_containers(cls, prefixes, words, suffixes, vocabulary) -> "MorphemeInventory":
+        """Builds an inventory from read-only containers with fast membership tests, without copying them."""
+        inventory = cls.__new__(cls)
+        for name, container in (("prefixes", prefixes), ("words", words), ("suffixes", suffixes),
+                                ("vocabulary", vocabulary), ("_trie", None), ("_reversed_trie", None),
+                                ("_segmenter", None)):
+            object.__setattr__(inventory, name, container)
+        return inventory
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MorphemeInventory is read-only")
+
+    def __reduce__(self):
+        # the tries and the segmenter are rebuilt on first use after unpickling
+        return MorphemeInventory, (self.prefixes, self.words, self.suffixes, self.vocabulary)
+
+    def __getitem__(self, key: str) -> FrozenSet[str]:
+        if key not in ("prefixes", "words", "suffixes"):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    @property
+    def trie(self) -> MorphemeTrie:
+        """Trie of all morphemes, for the forward search."""
+        if self._trie is None:
+            object.__setattr__(self, "_trie", MorphemeTrie(self.prefixes, self.words, self.suffixes))
+        return self._trie
+
+    @property
+    def reversed_trie(self) -> MorphemeTrie:
+        """Trie of all reversed morphemes, for the backward search."""
+        if self._reversed_trie is None:
+            object.__setattr__(self, "_reversed_trie",
+                               MorphemeTrie(self.prefixes, self.words, self.suffixes, reverse=True))
+        return self._reversed_trie
+
+    @property
+    def segmenter(self) -> BatchSegmenter:
+        """Hash tables of all morphemes, for the vectorized segmentation of many words."""
+        if self._segmenter is None:
+            object.__setattr__(self, "_segmenter", BatchSegmenter(self.prefixes, self.words, self.suffixes))
+        return self._segmenter
 
 
 class Vocab(object):
-    
+
 
     def __init__(self, vocabulary: list, vocab_split, is_cased: bool) -> None:
         self.vocabulary = vocabulary
         self.vocab_split = vocab_split
         self.is_cased = is_cased
+        self.inventory = MorphemeInventory(vocab_split['prefixes'], vocab_split['words'], vocab_split['suffixes'],
+                                           vocabulary)
+        # ids are 1-based, the first occurrence of a token determines its id
+        self.token_to_id: Dict[str, int] = {}
+        for i, token in enumerate(vocabulary):
+            self.token_to_id.setdefault(token, i + 1)
+        self.id_to_token: Tuple[str, ...] = tuple(vocabulary)
 
     def process_vocab(self, raw_vocab):
         pass
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class WordCache(object):
+    """Bounded LRU cache for word level tokenizations.
+
+        Natural text is Zipfian, so most words of a batch have been tokenized before. The cache keeps the tokens of the
+        `max_size` most recently used keys and evicts the least recently used one when it is full. The tokens are
+        stored as tuples, so a caller can not change a cached tokenization.
+
+        Args:
+            max_size(`int`, *optional*, defaults to `100000`):
+                Maximum number of entries held by the cache.
+    """
+
+    def __init__(self, max_size: int = 100000) -> None:
+        if max_size <= 0:
+            raise ValueError("max_size of the word cache must be positive, got %d" % max_size)
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[str, ...]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[Tuple[str, ...]]:
+        """Returns the cached tokens for `key` and marks it as recently used, `None` if it is not cached."""
+        entries = self._entries
+        try:
+            tokens = entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        entries.move_to_end(key)
+        self.hits += 1
+        return tokens
+
+    def put(self, key: Hashable, tokens: Tuple[str, ...]) -> None:
+        """Stores the tokens for `key` and evicts the least recently used entry, if the cache is full."""
+        entries = self._entries
+        entries[key] = tokens
+        entries.move_to_end(key)
+        if len(entries) > self.max_size:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Removes all entries and resets the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """ Returns the counters of the cache.
+            Returns:
+                `Dict[str, float]`:
+                    Size, maximum size, hits, misses, evictions and the hit rate of the cache.
+        """
+        return {"size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hit_rate}